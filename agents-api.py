@@ -1,17 +1,681 @@
-from flask import Flask, request, jsonify
-import requests
-from requests.packages import urllib3
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+import asyncio
+import atexit
+import csv
+import fcntl
+import functools
+import hashlib
 import json
+import logging
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
-import skfuzzy as fuzz
 from flask_cors import CORS
 
-#pip install flask requests numpy scikit-fuzzy
-#pip install scipy
-#pip install packaging
+# o orjson e opcional (pip install orjson); sem ele, ou com AGENTS_JSON=json, usa o json padrao
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#pip install flask numpy
 #pip install flask-cors
+# opcional, serializacao JSON mais rapida:
+#pip install orjson
+# opcional, corpos em messagepack:
+#pip install msgpack
+# opcional, apenas para a verificacao cruzada com AGENTS_FUZZY_VERIFICAR=1:
+#pip install scikit-fuzzy scipy packaging
+
+############## Metricas ##############
+class Histograma:
+    """
+    histograma de latencias com limites fixos (em segundos), no formato do prometheus.
+    """
+
+    LIMITES = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.contagens = [0] * (len(self.LIMITES) + 1)  # o ultimo e o +Inf
+        self.soma = 0.0
+        self.lock = threading.Lock()
+
+    def observar(self, segundos):
+        posicao = bisect_left(self.LIMITES, segundos)
+        with self.lock:
+            self.contagens[posicao] += 1
+            self.soma += segundos
+
+    def exportar(self, nome, rotulos):
+        # linhas _bucket (acumuladas), _sum e _count
+        with self.lock:
+            contagens = list(self.contagens)
+            soma = self.soma
+        linhas = []
+        acumulado = 0
+        for limite, contagem in zip(self.LIMITES + ("+Inf",), contagens):
+            acumulado += contagem
+            linhas.append(f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+        linhas.append(f"{nome}_sum{{{rotulos}}} {soma}")
+        linhas.append(f"{nome}_count{{{rotulos}}} {acumulado}")
+        return linhas
+
+
+class Metricas:
+    """
+    contadores e histogramas do processo: latencia de cada etapa dos agentes (ver etapa),
+    numero de requisicoes por rota, metodo e status e latencia por rota.
+    com varios workers, cada processo tem as suas metricas (o prometheus soma os alvos).
+    """
+
+    def __init__(self):
+        self.etapas = {}
+        self.latencias = {}
+        self.requisicoes = {}
+        self.lock = threading.Lock()
+
+    def histograma_etapa(self, nome):
+        with self.lock:
+            return self.etapas.setdefault(nome, Histograma())
+
+    def observar_requisicao(self, rota, metodo, status, segundos):
+        with self.lock:
+            histograma = self.latencias.get(rota)
+            if histograma is None:
+                histograma = self.latencias[rota] = Histograma()
+            chave = (rota, metodo, status)
+            self.requisicoes[chave] = self.requisicoes.get(chave, 0) + 1
+        histograma.observar(segundos)
+
+    def exportar(self, caches):
+        """
+        retorna todas as metricas no formato de texto do prometheus.
+
+        args:
+            caches: dicionario nome -> CacheResultados, exportados como contadores de hits e misses
+        """
+        with self.lock:
+            requisicoes = dict(self.requisicoes)
+            latencias = dict(self.latencias)
+            etapas = dict(self.etapas)
+
+        linhas = [
+            "# HELP agents_requisicoes_total Requisicoes atendidas por rota, metodo e status.",
+            "# TYPE agents_requisicoes_total counter"
+        ]
+        for (rota, metodo, status), total in sorted(requisicoes.items()):
+            linhas.append(f'agents_requisicoes_total{{rota="{rota}",metodo="{metodo}",status="{status}"}} {total}')
+
+        linhas += [
+            "# HELP agents_requisicao_segundos Latencia das requisicoes por rota.",
+            "# TYPE agents_requisicao_segundos histogram"
+        ]
+        for rota, histograma in sorted(latencias.items()):
+            linhas += histograma.exportar("agents_requisicao_segundos", f'rota="{rota}"')
+
+        linhas += [
+            "# HELP agents_etapa_segundos Latencia de cada etapa dos agentes (etapas aninhadas incluem as internas).",
+            "# TYPE agents_etapa_segundos histogram"
+        ]
+        for nome, histograma in sorted(etapas.items()):
+            linhas += histograma.exportar("agents_etapa_segundos", f'etapa="{nome}"')
+
+        for metrica, campo in [("agents_cache_hits_total", "hits"), ("agents_cache_misses_total", "misses")]:
+            linhas.append(f"# TYPE {metrica} counter")
+            for nome, cache in caches.items():
+                linhas.append(f'{metrica}{{cache="{nome}"}} {cache.estatisticas()[campo]}')
+
+        return "\n".join(linhas) + "\n"
+
+
+# metricas ativadas por padrao; AGENTS_METRICAS=0 desliga tudo (os ganchos nem chegam a ser instalados)
+METRICAS = Metricas() if os.environ.get("AGENTS_METRICAS", "1") != "0" else None
+
+
+def etapa(nome):
+    """
+    decorador que mede a duracao de uma etapa dos agentes no histograma agents_etapa_segundos.
+    com as metricas desligadas devolve a propria funcao, sem nenhum custo por chamada.
+    """
+    def decorador(funcao):
+        if METRICAS is None:
+            return funcao
+        histograma = METRICAS.histograma_etapa(nome)
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                histograma.observar(time.perf_counter() - inicio)
+        return medida
+    return decorador
+
+
+############## Logs ##############
+class FormatadorJson(logging.Formatter):
+    # uma linha json por registro; campos extras vem em extra={"campos": {...}}
+    def format(self, record):
+        linha = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        linha.update(getattr(record, "campos", {}))
+        if record.exc_info:
+            linha["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(linha, ensure_ascii=False, default=str)
+
+
+class ManipuladorFila(QueueHandler):
+    """
+    envia os registros para a fila sem formata-los: a formatacao e a escrita acontecem na thread
+    do QueueListener, fora da requisicao. com a fila cheia o registro e descartado (e contado)
+    em vez de bloquear quem esta registrando.
+    """
+
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+
+def ler_config_por_rota(texto, converter):
+    """
+    le configuracoes no formato "padrao,/rota=valor,..." (ex: "0.01,/gestor=0.1").
+
+    returns:
+        tuple: (valor padrao ou None, dicionario rota -> valor)
+    """
+    padrao, por_rota = None, {}
+    for item in filter(None, (parte.strip() for parte in texto.split(","))):
+        rota, separador, valor = item.rpartition("=")
+        if separador:
+            por_rota[rota] = converter(valor)
+        else:
+            padrao = converter(valor)
+    return padrao, por_rota
+
+
+class Logs:
+    """
+    logs estruturados (uma linha json por evento) escritos por uma thread separada.
+    cada rota tem seu logger ("/avaliador/lote" -> "agents.avaliador.lote"), com nivel proprio,
+    e os logs de acesso e de corpo das requisicoes sao amostrados por rota.
+
+    configuracao (variaveis de ambiente, no formato "padrao,/rota=valor"):
+        AGENTS_LOG_NIVEL: nivel dos logs (padrao: INFO; ex: "WARNING,/avaliador=DEBUG")
+        AGENTS_LOG_AMOSTRAGEM: fracao das requisicoes com log de acesso (padrao: 0, desligado)
+        AGENTS_LOG_PAYLOAD: fracao das requisicoes com o corpo no log (padrao: 0, desligado)
+    """
+
+    def __init__(self, nivel="INFO", amostragem="0", payload="0", tamanho_fila=10000):
+        self.tamanho_fila = tamanho_fila
+        self.loggers = {}
+        self.raiz = logging.getLogger("agents")
+        self.raiz.propagate = False
+        self.manipulador = ManipuladorFila(None)
+        self.raiz.addHandler(self.manipulador)
+
+        nivel_padrao, niveis = ler_config_por_rota(nivel, str.upper)
+        self.raiz.setLevel(nivel_padrao or "INFO")
+        for rota, nivel_rota in niveis.items():
+            self.logger(rota).setLevel(nivel_rota)
+
+        self.amostragem_padrao, self.amostragem = ler_config_por_rota(amostragem, float)
+        self.payload_padrao, self.payload = ler_config_por_rota(payload, float)
+        self.acesso_ativo = bool(self.amostragem_padrao) or any(self.amostragem.values())
+        self.payload_ativo = bool(self.payload_padrao) or any(self.payload.values())
+
+        self.listener = None
+        self.iniciar()
+        # a thread de escrita nao sobrevive ao fork (gunicorn --preload): cada processo filho cria a sua
+        os.register_at_fork(after_in_child=self.iniciar)
+        atexit.register(self.parar)
+
+    def iniciar(self):
+        self.manipulador.queue = queue.Queue(self.tamanho_fila)
+        saida = logging.StreamHandler(sys.stdout)
+        saida.setFormatter(FormatadorJson())
+        self.listener = QueueListener(self.manipulador.queue, saida)
+        self.listener.start()
+
+    def parar(self):
+        # escreve o que ainda estiver na fila antes de encerrar
+        try:
+            self.listener.stop()
+        except queue.Full:
+            pass
+
+    def logger(self, rota):
+        logger = self.loggers.get(rota)
+        if logger is None:
+            logger = self.loggers[rota] = self.raiz.getChild(rota.strip("/").replace("/", ".") or "raiz")
+        return logger
+
+    @staticmethod
+    def sortear(taxa):
+        return taxa > 0 and (taxa >= 1 or random.random() < taxa)
+
+    def amostrar_acesso(self, rota):
+        return self.acesso_ativo and self.sortear(self.amostragem.get(rota, self.amostragem_padrao or 0.0))
+
+    def amostrar_payload(self, rota):
+        return self.payload_ativo and self.sortear(self.payload.get(rota, self.payload_padrao or 0.0))
+
+    def erro(self, rota, excecao):
+        # erros nao sao amostrados; o traceback e formatado na thread de escrita
+        self.logger(rota).error(
+            "Erro ao processar requisição: %s", excecao, exc_info=excecao, extra={"campos": {"rota": rota}}
+        )
+
+
+LOGS = Logs(
+    os.environ.get("AGENTS_LOG_NIVEL", "INFO"),
+    os.environ.get("AGENTS_LOG_AMOSTRAGEM", "0"),
+    os.environ.get("AGENTS_LOG_PAYLOAD", "0")
+)
+
+
+############## Motor fuzzy ##############
+# funcoes de pertinencia implementadas apenas com numpy, reproduzindo passo a passo
+# fuzz.trimf e fuzz.trapmf do scikit-fuzzy (mesmas comparacoes e mesmas divisoes),
+# para que o servidor nao precise importar scikit-fuzzy/scipy na inicializacao.
+def trimf(x, abc):
+    a, b, c = abc
+    y = np.zeros(len(x))
+
+    # lado esquerdo
+    if a != b:
+        idx = np.logical_and(a < x, x < b)
+        y[idx] = (x[idx] - a) / float(b - a)
+
+    # lado direito
+    if b != c:
+        idx = np.logical_and(b < x, x < c)
+        y[idx] = (c - x[idx]) / float(c - b)
+
+    y[x == b] = 1
+    return y
+
+
+def trapmf(x, abcd):
+    a, b, c, d = abcd
+    y = np.ones(len(x))
+
+    idx = x <= b
+    y[idx] = trimf(x[idx], (a, b, b))
+
+    idx = x >= c
+    y[idx] = trimf(x[idx], (c, c, d))
+
+    y[x < a] = 0
+    y[x > d] = 0
+    return y
+
+
+class FuzzyEngine:
+    """
+    motor fuzzy compartilhado entre os agentes.
+    os universos e as funcoes de pertinencia sao construidos uma unica vez (na importacao do modulo)
+    e a avaliacao usa np.interp diretamente sobre os conjuntos ja amostrados, que e exatamente
+    o que fuzz.interp_membership faz, de modo que os resultados sao identicos aos anteriores.
+    aceita tanto escalares quanto arrays numpy, o que permite avaliar varios valores de uma vez.
+    """
+
+    # parametros das funcoes de pertinencia (nome do atributo -> funcao, universo, parametros)
+    CONJUNTOS = {
+        "taxa_baixo": (trapmf, "taxa_universe", [0, 0, 0.3, 0.5]),
+        "taxa_medio": (trimf, "taxa_universe", [0.3, 0.5, 0.7]),
+        "taxa_alto": (trapmf, "taxa_universe", [0.5, 0.7, 1.0, 1.0]),
+        "low_ezness": (trapmf, "accuracy_universe", [0, 0, 25, 60]),  # baixa (dificuldade)
+        "high_ezness": (trapmf, "accuracy_universe", [60, 90, 100, 100])  # alta (facilidade)
+    }
+
+    def __init__(self, verificar=False):
+        # universo do tutor (taxa de acerto de 0 a 1) e do gestor (taxa de acerto de 0 a 100%)
+        self.taxa_universe = np.linspace(0, 1, 100)
+        self.accuracy_universe = np.arange(0, 101, 1)
+
+        for nome, (funcao, universo, parametros) in self.CONJUNTOS.items():
+            setattr(self, nome, funcao(getattr(self, universo), parametros))
+
+        if verificar:
+            self.verificar_scikit_fuzzy()
+
+    def verificar_scikit_fuzzy(self):
+        """
+        compara os conjuntos construidos com numpy com os do scikit-fuzzy.
+        o import e feito aqui para que o scikit-fuzzy (e o scipy) so sejam carregados neste modo.
+        """
+        import skfuzzy as fuzz
+
+        for nome, (funcao, universo, parametros) in self.CONJUNTOS.items():
+            esperado = getattr(fuzz, funcao.__name__)(getattr(self, universo), parametros)
+            if not np.array_equal(getattr(self, nome), esperado):
+                raise RuntimeError(f"conjunto fuzzy {nome} difere do scikit-fuzzy")
+
+    @staticmethod
+    def _interp(universe, conjunto, valor):
+        # equivalente a fuzz.interp_membership (zero fora do universo)
+        return np.interp(valor, universe, conjunto, left=0.0, right=0.0)
+
+    @etapa("fuzzy.pertinencia_taxa")
+    def pertinencia_taxa(self, taxa):
+        """
+        graus de pertinencia (baixo, medio, alto) de uma taxa de acerto entre 0 e 1.
+        """
+        return (
+            self._interp(self.taxa_universe, self.taxa_baixo, taxa),
+            self._interp(self.taxa_universe, self.taxa_medio, taxa),
+            self._interp(self.taxa_universe, self.taxa_alto, taxa)
+        )
+
+    @etapa("fuzzy.pertinencia_facilidade")
+    def pertinencia_facilidade(self, accuracy_rate):
+        """
+        graus de pertinencia (baixa, alta) de facilidade para uma taxa de acerto entre 0 e 100.
+        """
+        return (
+            self._interp(self.accuracy_universe, self.low_ezness, accuracy_rate),
+            self._interp(self.accuracy_universe, self.high_ezness, accuracy_rate)
+        )
+
+
+# instancia unica usada por todos os agentes
+FUZZY = FuzzyEngine(verificar=os.environ.get("AGENTS_FUZZY_VERIFICAR") == "1")
+
+# versao das regras dos agentes: identifica resultados guardados fora do processo (caches compartilhados, ETags)
+REVISAO_REGRAS = 1  # incrementar ao mudar as regras dos agentes (os conjuntos fuzzy ja entram na versao)
+VERSAO_REGRAS = hashlib.blake2b(json.dumps([
+    REVISAO_REGRAS,
+    {nome: [funcao.__name__, universo, parametros] for nome, (funcao, universo, parametros) in FuzzyEngine.CONJUNTOS.items()}
+], sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+############## Memoria compartilhada entre processos ##############
+class RegiaoCompartilhada:
+    """
+    arquivo mapeado em memoria (de preferencia em /dev/shm) visto por todos os processos do host.
+    o primeiro processo cria o arquivo com o tamanho pedido e os demais apenas o mapeiam; as paginas
+    so ocupam memoria quando sao escritas. as escritas sao serializadas por um lock de arquivo
+    (entre processos) e por um lock de thread (dentro do processo).
+    """
+
+    CABECALHO = 64  # assinatura do formato; mantem os dados alinhados
+
+    def __init__(self, caminho, formato, tamanho):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self.fd = os.open(caminho, os.O_RDWR | os.O_CREAT, 0o600)
+        assinatura = b"AGTS" + zlib.crc32(formato.encode()).to_bytes(4, "little")
+        with self.escrita():
+            tamanho_atual = os.fstat(self.fd).st_size
+            if tamanho_atual == 0:
+                os.ftruncate(self.fd, self.CABECALHO + tamanho)
+                os.pwrite(self.fd, assinatura, 0)
+            elif tamanho_atual != self.CABECALHO + tamanho or os.pread(self.fd, len(assinatura), 0) != assinatura:
+                raise RuntimeError(f"{caminho} foi criado com outra configuracao; remova o arquivo para recria-lo")
+        self.mapa = mmap.mmap(self.fd, self.CABECALHO + tamanho)
+        self.dados = memoryview(self.mapa)[self.CABECALHO:]
+
+    @contextmanager
+    def escrita(self):
+        # lockf e por processo (nao e herdado no fork), entao exclui tambem os workers irmaos
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+
+class CacheCompartilhado:
+    """
+    cache de resultados em memoria compartilhada, consultado quando o cache do proprio processo nao
+    tem o resultado; assim um worker novo ja encontra os perfis calculados pelos outros.
+    enderecamento direto: cada chave (as 6 contagens) cai em um slot pelo hash e uma colisao
+    substitui o resultado anterior. cada slot tem um numero de sequencia (seqlock): o escritor o
+    deixa impar enquanto escreve e par ao terminar, e o leitor descarta a leitura se o numero
+    estava impar ou mudou; o checksum descarta slots deixados pela metade.
+    os resultados sao guardados em json (e nao em pickle, que executaria codigo ao ser lido).
+    """
+
+    SLOT = struct.Struct("<IHHI6i")  # seq, tamanho dos dados, (livre), checksum, chave
+    TAMANHO_SLOT = 512
+    LIMITE_INT32 = 2 ** 31
+
+    def __init__(self, caminho, slots):
+        self.slots = slots
+        # a versao das regras tambem entra no nome do arquivo: apos uma mudanca de regras os processos
+        # novos usam outro arquivo e nunca leem resultados calculados com as regras antigas
+        self.regiao = RegiaoCompartilhada(
+            caminho, f"cache:{slots}:{self.TAMANHO_SLOT}:{VERSAO_REGRAS}", slots * self.TAMANHO_SLOT
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def codificar(resultado):
+        if orjson is not None:
+            return orjson.dumps(resultado, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(resultado, default=lambda valor: valor.item()).encode()
+
+    def obter(self, chave):
+        dados = self.regiao.dados
+        posicao = (hash(chave) % self.slots) * self.TAMANHO_SLOT
+        seq, tamanho, _, checksum, *guardada = self.SLOT.unpack_from(dados, posicao)
+        if seq & 1 == 0 and tamanho and tuple(guardada) == chave:
+            inicio = posicao + self.SLOT.size
+            corpo = bytes(dados[inicio:inicio + tamanho])
+            if struct.unpack_from("<I", dados, posicao)[0] == seq and zlib.crc32(corpo) == checksum:
+                self.hits += 1
+                return orjson.loads(corpo) if orjson is not None else json.loads(corpo)
+        self.misses += 1
+        return None
+
+    def guardar(self, chave, resultado):
+        corpo = self.codificar(resultado)
+        if len(corpo) > self.TAMANHO_SLOT - self.SLOT.size or any(abs(valor) >= self.LIMITE_INT32 for valor in chave):
+            return
+        dados = self.regiao.dados
+        posicao = (hash(chave) % self.slots) * self.TAMANHO_SLOT
+        with self.regiao.escrita():
+            seq = struct.unpack_from("<I", dados, posicao)[0]
+            # impar durante a escrita (um slot ja impar foi abandonado no meio de uma escrita)
+            seq = (seq + (2 if seq & 1 else 1)) & 0xFFFFFFFF
+            struct.pack_into("<I", dados, posicao, seq)
+            dados[posicao + self.SLOT.size:posicao + self.SLOT.size + len(corpo)] = corpo
+            self.SLOT.pack_into(dados, posicao, seq, len(corpo), 0, zlib.crc32(corpo), *chave)
+            struct.pack_into("<I", dados, posicao, (seq + 1) & 0xFFFFFFFF)
+
+    def estatisticas(self):
+        return {"slots": self.slots, "hits": self.hits, "misses": self.misses}
+
+
+# memoria compartilhada entre os processos do host, ativada por AGENTS_COMPARTILHADO
+# (prefixo dos arquivos, ex: /dev/shm/agents); AGENTS_COMPARTILHADO_SLOTS define o tamanho dos caches
+COMPARTILHADO = os.environ.get("AGENTS_COMPARTILHADO")
+SLOTS_COMPARTILHADOS = int(os.environ.get("AGENTS_COMPARTILHADO_SLOTS", 16384))
+
+
+############## Cache de resultados ##############
+class CacheResultados:
+    """
+    cache LRU limitado para resultados de funcoes puras (tutor e gestor).
+    a chave e a tupla normalizada das contagens de entrada; ao atingir o limite,
+    o resultado usado ha mais tempo e descartado. os resultados guardados sao
+    compartilhados entre as requisicoes e nao devem ser alterados por quem os recebe.
+    com um CacheCompartilhado, as faltas locais sao procuradas nele antes de recalcular.
+    """
+
+    def __init__(self, tamanho_maximo, compartilhado=None):
+        self.tamanho_maximo = tamanho_maximo
+        self.compartilhado = compartilhado
+        self.itens = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def chave(valores):
+        # so contagens inteiras formam chave; qualquer outro valor nao passa pelo cache
+        chave = tuple(valores)
+        if all(type(valor) is int for valor in chave):
+            return chave
+        return None
+
+    def obter(self, chave):
+        if chave is None or self.tamanho_maximo <= 0:
+            return None
+        with self.lock:
+            resultado = self.itens.get(chave)
+            if resultado is not None:
+                self.itens.move_to_end(chave)
+                self.hits += 1
+                return resultado
+            self.misses += 1
+
+        if self.compartilhado is not None:
+            resultado = self.compartilhado.obter(chave)
+            if resultado is not None:
+                self.guardar_local(chave, resultado)
+        return resultado
+
+    def guardar(self, chave, resultado):
+        if chave is None or self.tamanho_maximo <= 0:
+            return
+        self.guardar_local(chave, resultado)
+        if self.compartilhado is not None:
+            self.compartilhado.guardar(chave, resultado)
+
+    def guardar_local(self, chave, resultado):
+        with self.lock:
+            self.itens[chave] = resultado
+            self.itens.move_to_end(chave)
+            if len(self.itens) > self.tamanho_maximo:
+                self.itens.popitem(last=False)
+
+    def estatisticas(self):
+        with self.lock:
+            estatisticas = {
+                "tamanho": len(self.itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+        if self.compartilhado is not None:
+            estatisticas["compartilhado"] = self.compartilhado.estatisticas()
+        return estatisticas
+
+
+# caches compartilhados (o tamanho pode ser ajustado pela variavel de ambiente AGENTS_CACHE_TAMANHO)
+TAMANHO_CACHE = int(os.environ.get("AGENTS_CACHE_TAMANHO", 10000))
+CACHE_TUTOR = CacheResultados(
+    TAMANHO_CACHE,
+    CacheCompartilhado(f"{COMPARTILHADO}-tutor-{VERSAO_REGRAS}.cache", SLOTS_COMPARTILHADOS) if COMPARTILHADO else None
+)
+CACHE_GESTOR = CacheResultados(
+    TAMANHO_CACHE,
+    CacheCompartilhado(f"{COMPARTILHADO}-gestor-{VERSAO_REGRAS}.cache", SLOTS_COMPARTILHADOS) if COMPARTILHADO else None
+)
+
+
+############## Quadro negro (blackboard) ##############
+class Blackboard:
+    """
+    quadro negro compartilhado pelos agentes durante o processamento de um aluno.
+    cada entrada tem um tipo fixo e so pode ser escrita uma vez, de modo que cada grandeza
+    e calculada por um unico agente e apenas lida pelos demais.
+    """
+
+    # entradas aceitas e seus tipos
+    ENTRADAS = {
+        "submissao": dict,           # dados recebidos (questoes, ou id_prova e respostas)
+        "contagens": dict,           # {"texto": {"acertos": 3, "erros": 1}, ...}
+        "taxas_acerto": dict,        # {"texto": 0.75, ...} (de 0 a 1)
+        "preferencias_fuzzy": dict,  # graus de preferencia calculados pelo tutor
+        "avaliacao": dict,           # resultado do avaliador
+        "recomendacao": dict,        # resultado do tutor
+        "relatorio": dict            # resultado do gestor
+    }
+
+    def __init__(self, **entradas):
+        self.entradas = {}
+        for nome, valor in entradas.items():
+            self.escrever(nome, valor)
+
+    def escrever(self, nome, valor):
+        tipo = self.ENTRADAS.get(nome)
+        if tipo is None:
+            raise KeyError(f"entrada desconhecida no quadro negro: {nome}")
+        if not isinstance(valor, tipo):
+            raise TypeError(f"entrada {nome} deve ser do tipo {tipo.__name__}")
+        if nome in self.entradas:
+            raise ValueError(f"entrada {nome} ja foi escrita no quadro negro")
+        self.entradas[nome] = valor
+
+    def ler(self, nome):
+        return self.entradas[nome]
+
+    def tem(self, nome):
+        return nome in self.entradas
+
+
+def taxas_de_contagens(contagens):
+    # taxas de acerto (0 a 1) a partir das contagens de acertos e erros de cada tipo
+    taxas = {}
+    for tipo, contagem in contagens.items():
+        total = contagem["acertos"] + contagem["erros"]
+        taxas[tipo] = contagem["acertos"] / total if total > 0 else 0
+    return taxas
+
 
 ############## Tutor ##############
+# campos de contagem esperados pelo tutor (na ordem texto, imagem, video)
+CAMPOS_TUTOR = [
+    "nu_acertos_texto", "nu_erros_texto",
+    "nu_acertos_imagem", "nu_erros_imagem",
+    "nu_acertos_video", "nu_erros_video"
+]
+TIPOS_CONTEUDO = ["texto", "imagem", "video"]
+
+# formatos do plano de partes ("partes" e o formato original, com uma chave "parteN" por parte)
+FORMATOS_PARTES = ["partes", "contagens", "rle", "intercalado"]
+MAXIMO_PARTES = 100000
+MAXIMO_PARTES_NUMERADAS = 100  # no formato "partes", cada parte vira uma chave da resposta
+# nos formatos "partes" e "intercalado" a resposta cresce com total_partes (no intercalado, ate um
+# bloco por parte); "contagens" e "rle" tem no maximo 3 itens por aluno. em lote, o total de partes
+# desses formatos (alunos x total_partes) e limitado por AGENTS_PARTES_LOTE
+FORMATOS_EXPANDIDOS = ["partes", "intercalado"]
+MAXIMO_PARTES_LOTE = int(os.environ.get("AGENTS_PARTES_LOTE", 1000000))
+
+
 class TutorAgent:
     """
     agente tutor simplificado
@@ -92,30 +756,24 @@ class TutorAgent:
         if not tem_historico:
             return {"texto": 0.33, "imagem": 0.33, "video": 0.33}
         
-        # criar universo para taxas de acerto (0 a 1)
-        taxa_universe = np.linspace(0, 1, 100)
-        
-        # definir funcoes de pertinencia fuzzy
-        baixo = fuzz.trapmf(taxa_universe, [0, 0, 0.3, 0.5])
-        medio = fuzz.trimf(taxa_universe, [0.3, 0.5, 0.7])
-        alto = fuzz.trapmf(taxa_universe, [0.5, 0.7, 1.0, 1.0])
-        
-        # calcular graus de pertinencia para cada tipo de conteudo
+        # calcular graus de pertinencia de todos os tipos de conteudo de uma vez
+        # (os conjuntos fuzzy ja estao pre-construidos no motor compartilhado)
+        tipos = list(taxas_acerto.keys())
+        taxas = np.array([taxas_acerto[tipo] for tipo in tipos], dtype=float)
+        grau_baixo, grau_medio, grau_alto = FUZZY.pertinencia_taxa(taxas)
+
+        # calcular preferencia baseada nos graus de pertinencia
+        # quanto MAIOR a taxa de acerto, maior a preferencia (priorizar o que o aluno é bom)
+        preferencias = (0.0 * grau_baixo + 0.5 * grau_medio + 1.0 * grau_alto)
+
         graus_pertinencia = {}
-        for tipo, taxa in taxas_acerto.items():
-            # calcular pertinencia para cada conjunto fuzzy
-            grau_baixo = fuzz.interp_membership(taxa_universe, baixo, taxa)
-            grau_medio = fuzz.interp_membership(taxa_universe, medio, taxa)
-            grau_alto = fuzz.interp_membership(taxa_universe, alto, taxa)
-            
-            # calcular preferencia baseada nos graus de pertinencia
-            # quanto MAIOR a taxa de acerto, maior a preferencia (priorizar o que o aluno é bom)
-            preferencia = (0.0 * grau_baixo + 0.5 * grau_medio + 1.0 * grau_alto)
-            
+        for i, tipo in enumerate(tipos):
+            preferencia = preferencias[i]
+
             # se a taxa for zero (nunca acertou), dar baixa preferencia
-            if taxa == 0:
+            if taxas[i] == 0:
                 preferencia = 0.0
-            
+
             graus_pertinencia[tipo] = preferencia
         
         # normalizar os graus para somarem 1
@@ -209,278 +867,2227 @@ class TutorAgent:
         
         return partes
 
-    def calculate_metrics(self): # Processa os dados do aluno e retorna as partes de conteúdo em formato JSON.
-        
-        if not self.data:
+    def calculate_metrics(self): # Processa os dados definidos em set_data (mantido por compatibilidade).
+        return self.process(self.data)
+
+    @etapa("tutor.process")
+    def process(self, data, total_partes=3, formato="partes"): # Processa os dados do aluno e retorna as partes de conteúdo em formato JSON.
+        # nao guarda estado: uma unica instancia pode ser usada por varias threads ao mesmo tempo
+        if not data:
             return None
 
         try:
             # carregar dados
-            dados = self.data
+            dados = data
+
+            # planos fora do padrao (3 partes numeradas) nao passam pelo cache
+            if formato != "partes" or total_partes != 3:
+                return self.planejar_lote(self.contagens_lote([dados]), total_partes, formato)[0]
+
+            # perfis ja vistos sao respondidos pelo cache, sem refazer a inferencia fuzzy
+            chave = CACHE_TUTOR.chave(dados[campo] for campo in CAMPOS_TUTOR)
+            resultado = CACHE_TUTOR.obter(chave)
+            if resultado is not None:
+                return resultado
 
             # calcular taxas de acerto
             taxas_acerto = self.calcular_taxas_acerto(dados)
 
-            # avaliar preferencia de conteudo usando a logica fuzzy real
-            preferencias_fuzzy = self.avaliar_preferencia_conteudo(taxas_acerto)
-            
-            # distribuir partes com base nas preferencias fuzzy
-            partes = self.distribuir_partes(preferencias_fuzzy, taxas_acerto)
-
-            # criar dicionario com partes numeradas
-            partes_numeradas = {}
-            for i, parte in enumerate(partes, 1):
-                partes_numeradas[f"parte{i}"] = parte
-            
-            # adicionar informacoes de diagnostico para depuracao
-            diagnostico = {
-                "taxas_acerto": taxas_acerto,
-                "preferencias_fuzzy": preferencias_fuzzy
-            }
-            
-            return {
-                "partes": partes_numeradas,
-                "diagnostico": diagnostico
-            }
+            resultado = self.recomendar(taxas_acerto)
+            CACHE_TUTOR.guardar(chave, resultado)
+            return resultado
         except Exception as e:
             return {"erro": str(e)}
 
+    @etapa("tutor.recomendar")
+    def recomendar(self, taxas_acerto):
+        """
+        aplica a logica fuzzy e distribui as partes de conteudo a partir das taxas de acerto.
 
-############## Avaliador ##############
-class EvaluatorAgent:
-    """
-    avaliador de exercicios
-    avalia as respostas do aluno, calcula a taxa de acerto e determina se o aluno precisa refazer a aula.
-    caso necessario, utiliza o agente tutor para recomendar metodos de aprendizagem personalizados.
-
-    matricula: 2122130042
-    """
+        args:
+            taxas_acerto: dicionario com taxas de acerto por metodo
 
-    def __init__(self):
-        self.data = None
+        returns:
+            dict: partes numeradas e diagnostico, no formato de calculate_metrics
+        """
+        # avaliar preferencia de conteudo usando a logica fuzzy real
+        preferencias_fuzzy = self.avaliar_preferencia_conteudo(taxas_acerto)
 
-    def set_data(self, data):
-        # Define os dados recebidos via POST para processamento. #
-        self.data = data
-        return True
+        # distribuir partes com base nas preferencias fuzzy
+        partes = self.distribuir_partes(preferencias_fuzzy, taxas_acerto)
 
-    def calculate_metrics(self): # Avalia as respostas do aluno comparando com as respostas corretas.
-        if not self.data:
-            return None
+        # criar dicionario com partes numeradas
+        partes_numeradas = {}
+        for i, parte in enumerate(partes, 1):
+            partes_numeradas[f"parte{i}"] = parte
 
-        # carregar dados
-        questoes = self.data["questoes"]            
-        if not questoes:
-            return {"erro": "nenhuma questao encontrada no json"}
-        
-        # contadores para cada tipo de questao
-        contadores = {
-            "texto": {"acertos": 0, "total": 0},
-            "imagem": {"acertos": 0, "total": 0},
-            "video": {"acertos": 0, "total": 0}
-        }
-        
-        # avaliar cada questao
-        resultados_questoes = []
-        for i, questao in enumerate(questoes):
-            tipo = questao.get("tipo", "").lower()
-            resposta_correta = questao.get("resposta_correta", "")
-            resposta_aluno = questao.get("resposta_aluno", "")
-            
-            # verificar se o tipo e valido
-            if tipo not in ["texto", "imagem", "video"]:
-                return {"erro": f"tipo de questao invalido na questao {i+1}: {tipo}"}
-            
-            # verificar se acertou (comparacao case-insensitive)
-            acertou = resposta_correta.lower() == resposta_aluno.lower()
-            
-            # atualizar contadores
-            contadores[tipo]["total"] += 1
-            if acertou:
-                contadores[tipo]["acertos"] += 1
-            
-            # adicionar resultado da questao
-            resultados_questoes.append({
-                "numero": i + 1,
-                "tipo": tipo,
-                "acertou": acertou
-            })
-        
-        # calcular totais gerais
-        total_acertos = sum(contador["acertos"] for contador in contadores.values())
-        total_questoes = sum(contador["total"] for contador in contadores.values())
-        
-        # calcular taxas de acerto
-        taxas_acerto = {}
-        for tipo, contador in contadores.items():
-            if contador["total"] > 0:
-                taxas_acerto[tipo] = contador["acertos"] / contador["total"] * 100
-            else:
-                taxas_acerto[tipo] = 0
-        
-        # calcular taxa de acerto geral
-        taxa_acerto_geral = (total_acertos / total_questoes * 100) if total_questoes > 0 else 0
-        
-        # determinar se precisa refazer a aula (taxa de acerto < 70%)
-        precisa_refazer = taxa_acerto_geral < 70
-        
-        # preparar dados para o tutor, se necessario
-        dados_tutor = None
-        recomendacao_tutor = None
-        
-        if precisa_refazer:
-            # preparar dados para o tutor no formato esperado
-            dados_tutor = {
-                "nu_acertos_texto": contadores["texto"]["acertos"],
-                "nu_erros_texto": contadores["texto"]["total"] - contadores["texto"]["acertos"],
-                "nu_acertos_imagem": contadores["imagem"]["acertos"],
-                "nu_erros_imagem": contadores["imagem"]["total"] - contadores["imagem"]["acertos"],
-                "nu_acertos_video": contadores["video"]["acertos"],
-                "nu_erros_video": contadores["video"]["total"] - contadores["video"]["acertos"]
-            }
-            
-            # chamar o tutor para obter recomendacoes
-            agente_tutor = TutorAgent()
-            agente_tutor.set_data(dados_tutor)
-            resultado_tutor = agente_tutor.calculate_metrics()
-            recomendacao_tutor = resultado_tutor
-        
-        # montar resultado final
-        resultado = {
-            "acertos": {
-                "texto": contadores["texto"]["acertos"],
-                "imagem": contadores["imagem"]["acertos"],
-                "video": contadores["video"]["acertos"],
-                "total": total_acertos
-            },
-            "total_questoes": {
-                "texto": contadores["texto"]["total"],
-                "imagem": contadores["imagem"]["total"],
-                "video": contadores["video"]["total"],
-                "total": total_questoes
-            },
+        # adicionar informacoes de diagnostico para depuracao
+        diagnostico = {
             "taxas_acerto": taxas_acerto,
-            "taxa_acerto_geral": taxa_acerto_geral,
-            "precisa_refazer": precisa_refazer,
-            "resultados_questoes": resultados_questoes
+            "preferencias_fuzzy": preferencias_fuzzy
         }
-        
-        # adicionar recomendacao do tutor, se necessario
-        if recomendacao_tutor:
-            resultado["recomendacao_tutor"] = recomendacao_tutor
-        
-        if "erro" in resultado:
-            saida = {"erro": resultado["erro"]}
-        else:
-            saida = {
-                "acertos": {
-                    "texto": resultado["acertos"]["texto"],
-                    "imagem": resultado["acertos"]["imagem"],
-                    "video": resultado["acertos"]["video"]
-                },
-                "erros": {
-                    "texto": resultado["total_questoes"]["texto"] - resultado["acertos"]["texto"],
-                    "imagem": resultado["total_questoes"]["imagem"] - resultado["acertos"]["imagem"],
-                    "video": resultado["total_questoes"]["video"] - resultado["acertos"]["video"]
-                },
-                "nota": round(resultado["taxa_acerto_geral"], 1),
-                "aprovado": not resultado["precisa_refazer"]
-            }
-            
-            # adicionar partes recomendadas, se necessario refazer
-            if resultado["precisa_refazer"] and "recomendacao_tutor" in resultado:
-                saida["partes"] = resultado["recomendacao_tutor"]
-        
-        return saida
 
-############## Gestor ##############
-# autor: fabio melo martins | matricula: 2122130014
-class ManagerAgent:
-    def __init__(self):
-        self.data = None
+        return {
+            "partes": partes_numeradas,
+            "diagnostico": diagnostico
+        }
 
-    def set_data(self, data):
-        # Define os dados recebidos via POST para processamento.
-        self.data = data
-        return True
+    @etapa("tutor.processar_quadro")
+    def processar_quadro(self, quadro):
+        """
+        executa o tutor sobre o quadro negro: le as contagens e as taxas de acerto ja escritas
+        por outro agente e escreve as preferencias fuzzy e a recomendacao.
 
-    def calculate_metrics(self): # calcula medias, facilidades, dificuldades, necessidade de ajuda e desempenho geral.
-        if not self.data:
-            return None
+        args:
+            quadro: Blackboard com a entrada "contagens" (e, opcionalmente, "taxas_acerto")
 
-        performance = self.data["dados"]
-        print(performance)
-        result = {
-            "facilidades": [],
-            "dificuldades": [],
-            "ajuda": False,
-            "desempenho": "",
-            "media": 0.0,
-            "media_por_conteudo": {}
-        }
+        returns:
+            dict: recomendacao no formato de calculate_metrics
+        """
+        contagens = quadro.ler("contagens")
+        if not quadro.tem("taxas_acerto"):
+            quadro.escrever("taxas_acerto", taxas_de_contagens(contagens))
 
-        # inicializa variaveis para calculo da media geral
-        total_correct = 0
-        total_questions = 0
+        # perfis ja vistos sao respondidos pelo cache, sem refazer a inferencia fuzzy
+        chave = CACHE_TUTOR.chave(contagens[tipo][campo] for tipo in TIPOS_CONTEUDO for campo in ["acertos", "erros"])
+        recomendacao = CACHE_TUTOR.obter(chave)
+        if recomendacao is None:
+            recomendacao = self.recomendar(quadro.ler("taxas_acerto"))
+            CACHE_TUTOR.guardar(chave, recomendacao)
 
-        # define universo para taxa de acertos (0 a 100%)
-        accuracy_universe = np.arange(0, 101, 1)
+        quadro.escrever("preferencias_fuzzy", recomendacao["diagnostico"]["preferencias_fuzzy"])
+        quadro.escrever("recomendacao", recomendacao)
+        return recomendacao
 
-        # define funcoes de pertinencia fuzzy para facilidade
-        low_ezness = fuzz.trapmf(accuracy_universe, [0, 0, 25, 60])  # baixa (dificuldade)
-        high_ezness = fuzz.trapmf(accuracy_universe, [60, 90, 100, 100])  # alta (facilidade)
+    ### processamento em lote (turmas inteiras) ###
+    def contagens_lote(self, dados):
+        """
+        converte os dados de varios alunos em uma matriz (N, 6) de contagens, na ordem de CAMPOS_TUTOR.
 
-        # calcula metricas para cada tipo de conteudo
+        args:
+            dados: lista de registros no mesmo formato do /tutor, dicionario colunar
+                   com uma lista por campo (ex: {"nu_acertos_texto": [..], ...})
+                   ou matriz (N, 6) ja pronta
+
+        returns:
+            np.ndarray: matriz de contagens com uma linha por aluno
+        """
+        if isinstance(dados, np.ndarray):
+            return dados.astype(float, copy=False)
+
+        if isinstance(dados, dict):
+            colunas = [np.asarray(dados[campo], dtype=float) for campo in CAMPOS_TUTOR]
+            if len({coluna.shape for coluna in colunas}) != 1:
+                raise ValueError("as colunas devem ter o mesmo tamanho")
+            return np.column_stack(colunas)
+
+        if not dados:
+            return np.zeros((0, len(CAMPOS_TUTOR)))
+        return np.array([[registro[campo] for campo in CAMPOS_TUTOR] for registro in dados], dtype=float)
+
+    def calcular_taxas_acerto_lote(self, contagens):
+        """
+        versao vetorizada de calcular_taxas_acerto.
+
+        args:
+            contagens: matriz (N, 6) de contagens na ordem de CAMPOS_TUTOR
+
+        returns:
+            np.ndarray: matriz (N, 3) com as taxas de acerto de texto, imagem e video
+        """
+        acertos = contagens[:, 0::2]
+        totais = acertos + contagens[:, 1::2]
+        taxas = np.zeros_like(acertos, dtype=float)
+        np.divide(acertos, totais, out=taxas, where=totais > 0)
+        return taxas
+
+    def avaliar_preferencia_conteudo_lote(self, taxas):
+        """
+        versao vetorizada de avaliar_preferencia_conteudo, aplicando as mesmas regras
+        a todos os alunos de uma vez.
+
+        args:
+            taxas: matriz (N, 3) com as taxas de acerto de texto, imagem e video
+
+        returns:
+            np.ndarray: matriz (N, 3) com os graus de preferencia
+        """
+        grau_baixo, grau_medio, grau_alto = FUZZY.pertinencia_taxa(taxas)
+        preferencias = (0.0 * grau_baixo + 0.5 * grau_medio + 1.0 * grau_alto)
+
+        # se a taxa for zero (nunca acertou), dar baixa preferencia
+        preferencias[taxas == 0] = 0.0
+
+        # normalizar os graus para somarem 1 (ou distribuir igualmente se todos forem zero)
+        soma = preferencias[:, 0] + preferencias[:, 1] + preferencias[:, 2]
+        com_soma = soma > 0
+        preferencias[com_soma] /= soma[com_soma, None]
+        preferencias[~com_soma] = 1.0 / preferencias.shape[1]
+
+        # alunos sem historico recebem distribuicao equilibrada
+        sem_historico = ~(taxas > 0).any(axis=1)
+        preferencias[sem_historico] = 0.33
+
+        return preferencias
+
+    @etapa("tutor.calculate_metrics_lote")
+    def calculate_metrics_lote(self, dados, total_partes=3, formato="partes", em_pedacos=False):
+        """
+        processa varios alunos de uma vez e retorna as partes de conteudo de cada um,
+        no mesmo formato de calculate_metrics (ou no formato compacto pedido, ver planejar_lote).
+
+        args:
+            dados: lista de registros ou dicionario colunar (ver contagens_lote)
+            total_partes: numero de partes por aluno
+            formato: um de FORMATOS_PARTES
+            em_pedacos: devolve os resultados pedaco a pedaco (ver executar_em_pedacos)
+
+        returns:
+            list: lista com um resultado por aluno, na ordem de entrada
+        """
+        try:
+            contagens = self.contagens_lote(dados)
+
+            # lotes grandes sao divididos entre processos (ver executar_em_lote)
+            if formato == "partes" and total_partes == 3:
+                funcao = _recomendar_lote
+            else:
+                funcao = functools.partial(_planejar_lote, total_partes=total_partes, formato=formato)
+            if em_pedacos:
+                return executar_em_pedacos(funcao, contagens)
+            return executar_em_lote(funcao, contagens)
+        except Exception as e:
+            return {"erro": str(e)}
+
+    @etapa("tutor.recomendar_lote")
+    def recomendar_lote(self, contagens):
+        """
+        nucleo serial de calculate_metrics_lote: inferencia vetorizada sobre uma matriz de contagens.
+
+        args:
+            contagens: matriz (N, 6) de contagens na ordem de CAMPOS_TUTOR
+
+        returns:
+            list: lista com um resultado por aluno, na ordem de entrada
+        """
+        # perfis repetidos na turma sao calculados uma unica vez
+        contagens, inverso = np.unique(contagens, axis=0, return_inverse=True)
+
+        taxas = self.calcular_taxas_acerto_lote(contagens)
+        preferencias = self.avaliar_preferencia_conteudo_lote(taxas)
+        totais = (contagens[:, 0::2] + contagens[:, 1::2]).tolist()
+
+        resultados = []
+        for linha_taxas, linha_totais, linha_preferencias in zip(taxas.tolist(), totais, preferencias.tolist()):
+            taxas_acerto = self.taxas_por_tipo(linha_taxas, linha_totais)
+            preferencias_fuzzy = dict(zip(TIPOS_CONTEUDO, linha_preferencias))
+
+            # distribuir partes com base nas preferencias fuzzy
+            partes = self.distribuir_partes(preferencias_fuzzy, taxas_acerto)
+
+            resultados.append({
+                "partes": {f"parte{i}": parte for i, parte in enumerate(partes, 1)},
+                "diagnostico": {
+                    "taxas_acerto": taxas_acerto,
+                    "preferencias_fuzzy": preferencias_fuzzy
+                }
+            })
+
+        return [resultados[i] for i in inverso.reshape(-1).tolist()]
+
+    @staticmethod
+    def taxas_por_tipo(linha_taxas, linha_totais):
+        # mesmo formato de calcular_taxas_acerto: 0 (inteiro) nos tipos sem nenhuma questao
+        return {tipo: taxa if total else 0 for tipo, taxa, total in zip(TIPOS_CONTEUDO, linha_taxas, linha_totais)}
+
+    ### plano de partes compacto ###
+    def repartir_lote(self, preferencias, total_partes):
+        """
+        reparte total_partes entre os metodos de cada aluno pelo metodo dos maiores restos:
+        cada metodo recebe a parte inteira da sua cota e as partes que sobram vao para as maiores
+        fracoes (no empate, para o metodo de maior preferencia). a soma de cada linha e sempre
+        exatamente total_partes, qualquer que seja o total.
+
+        args:
+            preferencias: matriz (N, 3) com os graus de preferencia (ver avaliar_preferencia_conteudo_lote)
+            total_partes: numero de partes por aluno
+
+        returns:
+            np.ndarray: matriz (N, 3) de inteiros com o numero de partes de cada metodo
+        """
+        # linhas sem nenhuma preferencia dividem as partes igualmente
+        pesos = np.where(preferencias.sum(axis=1, keepdims=True) > 0, preferencias, 1.0)
+        cotas = pesos / pesos.sum(axis=1, keepdims=True) * total_partes
+
+        contagens = np.floor(cotas).astype(np.int64)
+        restos = total_partes - contagens.sum(axis=1)
+
+        # posicao de cada metodo na disputa pelas partes que sobram
+        ordem = np.lexsort((-pesos, contagens - cotas), axis=1)
+        posicao = np.argsort(ordem, axis=1)
+        contagens += posicao < restos[:, None]
+        return contagens
+
+    def intercalar_lote(self, contagens):
+        """
+        monta a sequencia de partes de cada aluno com os metodos espalhados, em vez de em blocos:
+        a k-esima parte de um metodo com c partes fica na posicao relativa (k + 0.5) / c.
+
+        args:
+            contagens: matriz (N, 3) de partes por metodo (todas as linhas com a mesma soma)
+
+        returns:
+            np.ndarray: matriz (N, total_partes) com o indice em TIPOS_CONTEUDO de cada parte
+        """
+        n, metodos_por_aluno = contagens.shape
+        planas = contagens.ravel()
+        metodos = np.repeat(np.tile(np.arange(metodos_por_aluno), n), planas)
+        linhas = np.repeat(np.arange(n), contagens.sum(axis=1))
+
+        # indice de cada parte dentro do seu metodo
+        indices = np.arange(len(metodos)) - np.repeat(np.cumsum(planas) - planas, planas)
+        posicoes = (indices + 0.5) / np.repeat(planas, planas)
+
+        ordem = np.lexsort((metodos, posicoes, linhas))
+        return metodos[ordem].reshape(n, -1)
+
+    @staticmethod
+    def blocos(sequencia):
+        # [0, 0, 1, 0] -> [["texto", 2], ["imagem", 1], ["texto", 1]]
+        inicios = np.flatnonzero(np.diff(sequencia, prepend=-1))
+        tamanhos = np.diff(inicios, append=len(sequencia))
+        return [[TIPOS_CONTEUDO[m], t] for m, t in zip(sequencia[inicios].tolist(), tamanhos.tolist())]
+
+    @etapa("tutor.planejar_lote")
+    def planejar_lote(self, contagens, total_partes=3, formato="contagens"):
+        """
+        variante de recomendar_lote que reparte as partes com repartir_lote, usada em todo plano fora
+        do padrao (3 partes numeradas). formatos:
+            partes: {"parte1": "texto", ...}, com os metodos em blocos como no rle
+            contagens: {"texto": 5, "imagem": 3, "video": 2}
+            rle: blocos [metodo, quantidade] em ordem de preferencia, ex: [["texto", 5], ["imagem", 3], ["video", 2]]
+            intercalado: blocos no mesmo formato, com os metodos espalhados ao longo da sequencia
+
+        args:
+            contagens: matriz (N, 6) de contagens na ordem de CAMPOS_TUTOR
+            total_partes: numero de partes por aluno
+            formato: um de FORMATOS_PARTES
+
+        returns:
+            list: lista com um resultado por aluno, na ordem de entrada
+        """
+        # perfis repetidos na turma sao calculados uma unica vez
+        contagens, inverso = np.unique(contagens, axis=0, return_inverse=True)
+
+        taxas = self.calcular_taxas_acerto_lote(contagens)
+        preferencias = self.avaliar_preferencia_conteudo_lote(taxas)
+        repartidas = self.repartir_lote(preferencias, total_partes)
+
+        if formato == "contagens":
+            planos = [dict(zip(TIPOS_CONTEUDO, linha)) for linha in repartidas.tolist()]
+        elif formato in ("rle", "partes"):
+            ordem = np.argsort(-preferencias, axis=1, kind="stable")
+            planos = [
+                [[TIPOS_CONTEUDO[m], linha[m]] for m in metodos if linha[m] > 0]
+                for metodos, linha in zip(ordem.tolist(), repartidas.tolist())
+            ]
+            if formato == "partes":
+                planos = [
+                    {f"parte{i}": metodo for i, metodo in enumerate(
+                        (metodo for metodo, quantidade in blocos for _ in range(quantidade)), 1
+                    )}
+                    for blocos in planos
+                ]
+        elif formato == "intercalado":
+            # em pedacos, para limitar a memoria das sequencias (alunos x total_partes)
+            passo = max(1, 2 ** 20 // total_partes)
+            planos = [
+                self.blocos(sequencia)
+                for inicio in range(0, len(repartidas), passo)
+                for sequencia in self.intercalar_lote(repartidas[inicio:inicio + passo])
+            ]
+        else:
+            raise ValueError(f"formato desconhecido: {formato}")
+
+        resultados = [
+            {
+                "partes": plano,
+                "total_partes": total_partes,
+                "formato_partes": formato,
+                "diagnostico": {
+                    "taxas_acerto": self.taxas_por_tipo(linha_taxas, linha_totais),
+                    "preferencias_fuzzy": dict(zip(TIPOS_CONTEUDO, linha_preferencias))
+                }
+            }
+            for plano, linha_taxas, linha_totais, linha_preferencias in zip(
+                planos, taxas.tolist(), (contagens[:, 0::2] + contagens[:, 1::2]).tolist(), preferencias.tolist()
+            )
+        ]
+        return [resultados[i] for i in inverso.reshape(-1).tolist()]
+
+
+# instancia unica compartilhada (os agentes nao guardam estado entre chamadas)
+TUTOR = TutorAgent()
+
+
+############## Avaliador ##############
+class EvaluatorAgent:
+    """
+    avaliador de exercicios
+    avalia as respostas do aluno, calcula a taxa de acerto e determina se o aluno precisa refazer a aula.
+    caso necessario, utiliza o agente tutor para recomendar metodos de aprendizagem personalizados.
+
+    matricula: 2122130042
+    """
+
+    def __init__(self):
+        self.data = None
+
+    def set_data(self, data):
+        # Define os dados recebidos via POST para processamento. #
+        self.data = data
+        return True
+
+    def calculate_metrics(self): # Avalia os dados definidos em set_data (mantido por compatibilidade).
+        return self.process(self.data)
+
+    @etapa("avaliador.process")
+    def process(self, data, prova=None): # Avalia as respostas do aluno comparando com as respostas corretas.
+        # nao guarda estado: uma unica instancia pode ser usada por varias threads ao mesmo tempo
+        if not data:
+            return None
+
+        return self.processar_quadro(Blackboard(submissao=data), prova)
+
+    @etapa("avaliador.processar_quadro")
+    def processar_quadro(self, quadro, prova=None):
+        """
+        corrige a submissao do quadro negro e escreve as contagens, as taxas de acerto e a avaliacao.
+        se o aluno precisar refazer a aula, o tutor e acionado sobre o mesmo quadro e
+        reaproveita as taxas ja calculadas aqui.
+
+        args:
+            quadro: Blackboard com a entrada "submissao" (questoes, tipos/gabarito/respostas
+                    ou id_prova e respostas)
+            prova: ProvaRegistrada do id_prova, se a rota ja a leu (None le do registro)
+
+        returns:
+            dict: acertos, erros, nota, aprovado e, se necessario, as partes recomendadas
+        """
+        submissao = quadro.ler("submissao")
+
+        # prova registrada: o aluno envia apenas as respostas
+        if "id_prova" in submissao:
+            if prova is None:
+                prova = PROVAS.obter(submissao["id_prova"])
+            if prova is None:
+                return {"erro": f"prova nao registrada: {submissao['id_prova']}"}
+            respostas = submissao.get("respostas", [])
+        elif "gabarito" in submissao:
+            # formato colunar: listas paralelas de tipos, gabarito e respostas
+            prova = self.preparar_prova_colunar(submissao.get("tipos", []), submissao["gabarito"])
+            if isinstance(prova, dict):
+                return prova
+            respostas = submissao.get("respostas", [])
+        else:
+            questoes = submissao["questoes"]
+            if not questoes:
+                return {"erro": "nenhuma questao encontrada no json"}
+
+            prova = self.preparar_prova(questoes)
+            if isinstance(prova, dict):
+                return prova
+            respostas = [questao.get("resposta_aluno", "") for questao in questoes]
+
+        try:
+            acertos = self.corrigir_lote(prova, [respostas])[0].tolist()
+        except Exception as e:
+            return {"erro": str(e)}
+        totais = prova.totais.tolist()
+
+        return self.avaliar_contagens(acertos, totais, quadro)
+
+    def avaliar_contagens(self, acertos, totais, quadro=None):
+        """
+        escreve as contagens e as taxas de acerto de um aluno ja corrigido no quadro negro
+        e monta a avaliacao, acionando o tutor se o aluno precisar refazer a aula.
+
+        args:
+            acertos: lista com os acertos de texto, imagem e video
+            totais: lista com o total de questoes de texto, imagem e video
+            quadro: Blackboard do aluno (um novo quadro e criado se nao for informado)
+
+        returns:
+            dict: acertos, erros, nota, aprovado e, se necessario, as partes recomendadas
+        """
+        if quadro is None:
+            quadro = Blackboard()
+
+        contagens = {}
+        for tipo, acerto, total in zip(TIPOS_CONTEUDO, acertos, totais):
+            contagens[tipo] = {"acertos": acerto, "erros": total - acerto}
+        quadro.escrever("contagens", contagens)
+        quadro.escrever("taxas_acerto", taxas_de_contagens(contagens))
+
+        avaliacao = self.montar_saida(acertos, totais)
+
+        # se precisar refazer a aula (taxa de acerto < 70%), anexar a recomendacao do tutor
+        if not avaliacao["aprovado"]:
+            if not quadro.tem("recomendacao"):
+                TUTOR.processar_quadro(quadro)
+            avaliacao["partes"] = quadro.ler("recomendacao")
+
+        quadro.escrever("avaliacao", avaliacao)
+        return avaliacao
+
+    ### correcao com gabarito pre-processado ###
+    @etapa("avaliador.preparar_prova")
+    def preparar_prova(self, questoes):
+        """
+        valida as questoes da prova e converte o gabarito para a forma compacta usada na correcao.
+
+        args:
+            questoes: lista de questoes com "tipo" e "resposta_correta"
+
+        returns:
+            ProvaRegistrada: prova pronta para correcao, ou dicionario {"erro": ...}
+        """
+        tipos = np.empty(len(questoes), dtype=np.int8)
+        gabarito = []
+        for i, questao in enumerate(questoes):
+            tipo = questao.get("tipo", "").lower()
+
+            # verificar se o tipo e valido
+            if tipo not in TIPOS_CONTEUDO:
+                return {"erro": f"tipo de questao invalido na questao {i+1}: {tipo}"}
+
+            tipos[i] = TIPOS_CONTEUDO.index(tipo)
+            gabarito.append(questao.get("resposta_correta", ""))
+
+        return ProvaRegistrada(tipos, gabarito)
+
+    def preparar_prova_colunar(self, tipos, gabarito):
+        """
+        versao colunar de preparar_prova: tipos e respostas corretas chegam em listas paralelas,
+        sem um dicionario por questao, e os tipos vao direto para o array da prova.
+
+        args:
+            tipos: nomes dos tipos, indices em TIPOS_CONTEUDO (0 texto, 1 imagem, 2 video)
+                   ou bytes com um int8 por questao (ex: campo binario do messagepack)
+            gabarito: lista com a resposta correta de cada questao
+
+        returns:
+            ProvaRegistrada: prova pronta para correcao, ou dicionario {"erro": ...}
+        """
+        if isinstance(tipos, (bytes, bytearray)):
+            tipos = np.frombuffer(tipos, dtype=np.int8)
+        elif len(tipos) and isinstance(tipos[0], str):
+            indices = {tipo: i for i, tipo in enumerate(TIPOS_CONTEUDO)}
+            tipos = [indices.get(str(tipo).lower(), -1) for tipo in tipos]
+        tipos = np.asarray(tipos, dtype=np.int64)
+
+        if len(tipos) == 0:
+            return {"erro": "nenhuma questao encontrada no json"}
+        if len(tipos) != len(gabarito):
+            return {"erro": "tipos e gabarito devem ter o mesmo tamanho"}
+        invalidas = np.flatnonzero((tipos < 0) | (tipos >= len(TIPOS_CONTEUDO)))
+        if len(invalidas):
+            return {"erro": f"tipo de questao invalido na questao {invalidas[0] + 1}"}
+
+        return ProvaRegistrada(tipos, gabarito)
+
+    @etapa("avaliador.corrigir_lote")
+    def corrigir_lote(self, prova, respostas):
+        """
+        corrige as respostas de varios alunos de uma vez.
+
+        args:
+            prova: ProvaRegistrada com os tipos e o gabarito
+            respostas: lista com a lista de respostas de cada aluno
+
+        returns:
+            np.ndarray: matriz (N, 3) com os acertos de cada aluno por tipo de conteudo
+        """
+        num_questoes = len(prova.gabarito)
+        matriz = np.full((len(respostas), num_questoes), "", dtype=object)
+        for i, respostas_aluno in enumerate(respostas):
+            if len(respostas_aluno) > num_questoes:
+                raise ValueError(f"aluno {i+1} enviou mais respostas que questoes")
+            # respostas ausentes contam como resposta vazia
+            matriz[i, :len(respostas_aluno)] = respostas_aluno
+
+        # comparacao case-insensitive de todas as respostas de uma vez
+        acertou = np.char.lower(matriz.astype(str)) == prova.gabarito
+
+        return acertou.astype(np.int64) @ prova.por_tipo
+
+    def montar_saida(self, acertos, totais, recomendacao_tutor=None):
+        """
+        monta a resposta de um aluno no mesmo formato de calculate_metrics.
+
+        args:
+            acertos: lista com os acertos de texto, imagem e video
+            totais: lista com o total de questoes de texto, imagem e video
+            recomendacao_tutor: resultado do tutor, se o aluno precisar refazer a aula
+
+        returns:
+            dict: acertos, erros, nota, aprovado e, se necessario, as partes recomendadas
+        """
+        total_acertos = sum(acertos)
+        total_questoes = sum(totais)
+        taxa_acerto_geral = (total_acertos / total_questoes * 100) if total_questoes > 0 else 0
+
+        saida = {
+            "acertos": dict(zip(TIPOS_CONTEUDO, acertos)),
+            "erros": {tipo: total - acerto for tipo, acerto, total in zip(TIPOS_CONTEUDO, acertos, totais)},
+            "nota": round(taxa_acerto_geral, 1),
+            "aprovado": not taxa_acerto_geral < 70
+        }
+        if recomendacao_tutor:
+            saida["partes"] = recomendacao_tutor
+        return saida
+
+    @etapa("avaliador.calculate_metrics_lote")
+    def calculate_metrics_lote(self, dados, em_pedacos=False, prova=None):
+        """
+        corrige as respostas de varios alunos para a mesma prova.
+        os alunos que precisam refazer a aula passam pelo tutor em uma unica chamada em lote.
+
+        args:
+            dados: dicionario com "questoes" (tipo e resposta_correta), "tipos" e "gabarito"
+                   (formato colunar) ou "id_prova" de uma prova registrada, e "alunos"
+                   (lista de listas de respostas, ou de dicionarios com "respostas")
+
+            em_pedacos: devolve os resultados pedaco a pedaco, seguindo os pedacos do tutor
+            prova: ProvaRegistrada do id_prova, se a rota ja a leu (None le do registro)
+
+        returns:
+            list: lista com um resultado por aluno, na ordem de entrada
+        """
+        if "id_prova" in dados:
+            if prova is None:
+                prova = PROVAS.obter(dados["id_prova"])
+            if prova is None:
+                return {"erro": f"prova nao registrada: {dados['id_prova']}"}
+        elif "gabarito" in dados:
+            prova = self.preparar_prova_colunar(dados.get("tipos", []), dados["gabarito"])
+            if isinstance(prova, dict):
+                return prova
+        else:
+            questoes = dados.get("questoes")
+            if not questoes:
+                return {"erro": "nenhuma questao encontrada no json"}
+
+            prova = self.preparar_prova(questoes)
+            if isinstance(prova, dict):
+                return prova
+
+        alunos = dados.get("alunos", [])
+        respostas = [aluno["respostas"] if isinstance(aluno, dict) else aluno for aluno in alunos]
+
+        try:
+            acertos = self.corrigir_lote(prova, respostas)
+        except Exception as e:
+            return {"erro": str(e)}
+        totais = prova.totais
+
+        # determinar quem precisa refazer a aula (taxa de acerto < 70%)
+        reprovados = np.flatnonzero(acertos.sum(axis=1) / totais.sum() * 100 < 70)
+
+        pedacos = self.montar_pedacos(acertos, totais, reprovados, alunos)
+        if em_pedacos:
+            return pedacos
+        return [saida for pedaco in pedacos for saida in pedaco]
+
+    def montar_pedacos(self, acertos, totais, reprovados, alunos):
+        """
+        monta as saidas dos alunos em ordem. o tutor e chamado uma unica vez para todos os reprovados
+        e cada pedaco pronto do tutor libera os alunos ate o proximo reprovado ainda sem recomendacao.
+        """
+        # chamar o tutor uma unica vez para todos os reprovados
+        pedacos_tutor = []
+        if len(reprovados):
+            contagens = np.empty((len(reprovados), len(CAMPOS_TUTOR)))
+            contagens[:, 0::2] = acertos[reprovados]
+            contagens[:, 1::2] = totais - acertos[reprovados]
+            pedacos_tutor = TUTOR.calculate_metrics_lote(contagens, em_pedacos=True)
+            if isinstance(pedacos_tutor, dict):
+                # sem as partes do tutor, cada reprovado recebe o erro no lugar da avaliacao,
+                # como no /avaliador, em que a falha do tutor falha a correcao inteira
+                erro = {"erro": f"falha ao calcular as partes: {pedacos_tutor['erro']}"}
+                pedacos_tutor = [[erro] * len(reprovados)]
+
+        totais = totais.tolist()
+        reprovados = reprovados.tolist()
+        recomendacoes = {}
+        inicio = prontos = 0
+        for parcial in pedacos_tutor:
+            recomendacoes.update(zip(reprovados[prontos:prontos + len(parcial)], parcial))
+            prontos += len(parcial)
+            fim = reprovados[prontos] if prontos < len(reprovados) else len(acertos)
+            yield self.montar_saidas(acertos, totais, recomendacoes, alunos, inicio, fim)
+            inicio = fim
+        if inicio < len(acertos):
+            yield self.montar_saidas(acertos, totais, recomendacoes, alunos, inicio, len(acertos))
+
+    def montar_saidas(self, acertos, totais, recomendacoes, alunos, inicio, fim):
+        # saidas dos alunos inicio..fim-1; as recomendacoes usadas saem do dicionario
+        resultados = []
+        for i, acertos_aluno in enumerate(acertos[inicio:fim].tolist(), inicio):
+            recomendacao = recomendacoes.pop(i, None)
+            if recomendacao is not None and "erro" in recomendacao:
+                saida = dict(recomendacao)
+            else:
+                saida = self.montar_saida(acertos_aluno, totais, recomendacao)
+            if isinstance(alunos[i], dict) and "id_aluno" in alunos[i]:
+                saida = {"id_aluno": alunos[i]["id_aluno"], **saida}
+            resultados.append(saida)
+        return resultados
+
+# instancia unica compartilhada (os agentes nao guardam estado entre chamadas)
+AVALIADOR = EvaluatorAgent()
+
+
+class CorrecaoIncremental:
+    """
+    correcao de um aluno questao a questao, para entradas em streaming.
+    guarda apenas os contadores por tipo, entao a memoria nao cresce com o numero de questoes.
+    com uma prova registrada, cada questao recebida e a proxima do gabarito e basta a resposta do aluno.
+    """
+
+    def __init__(self, prova=None):
+        self.prova = prova
+        self.posicao = 0
+        self.acertos = [0, 0, 0]
+        self.totais = [0, 0, 0]
+
+    def adicionar(self, questao):
+        if self.prova is not None:
+            if self.posicao >= len(self.prova.gabarito):
+                raise ValueError("mais respostas que questoes na prova")
+            indice = int(self.prova.tipos[self.posicao])
+            correta = self.prova.gabarito[self.posicao]
+        else:
+            tipo = questao.get("tipo", "").lower()
+
+            # verificar se o tipo e valido
+            if tipo not in TIPOS_CONTEUDO:
+                raise ValueError(f"tipo de questao invalido na questao {self.posicao + 1}: {tipo}")
+            indice = TIPOS_CONTEUDO.index(tipo)
+            correta = questao.get("resposta_correta", "").lower()
+            self.totais[indice] += 1
+
+        self.posicao += 1
+        if questao.get("resposta_aluno", "").lower() == correta:
+            self.acertos[indice] += 1
+
+    def resultado(self):
+        # com prova registrada, as questoes nao respondidas contam como erro
+        totais = self.prova.totais.tolist() if self.prova is not None else self.totais
+        return AVALIADOR.avaliar_contagens(self.acertos, totais)
+
+
+class ProvaRegistrada:
+    """
+    gabarito de uma prova em forma compacta: tipo de cada questao como indice em TIPOS_CONTEUDO
+    e respostas corretas ja em minusculas, alem dos totais de questoes por tipo.
+    """
+
+    def __init__(self, tipos, gabarito):
+        self.tipos = np.asarray(tipos, dtype=np.int8)
+        self.gabarito = np.char.lower(np.array(gabarito, dtype=str))
+
+        # matriz (Q, 3) indicando o tipo de cada questao
+        self.por_tipo = np.zeros((len(self.tipos), len(TIPOS_CONTEUDO)), dtype=np.int64)
+        self.por_tipo[np.arange(len(self.tipos)), self.tipos] = 1
+        self.totais = self.por_tipo.sum(axis=0)
+
+
+class BancoPorProcesso:
+    """
+    banco SQLite com uma conexao por processo, aberta no primeiro uso.
+    uma conexao SQLite nao pode atravessar um fork (gunicorn --preload importa o modulo antes de criar
+    os workers), entao nada e aberto na importacao e cada processo abre a sua; se uma conexao vier do
+    processo pai, ela nao e usada nem fechada no filho (fechar mexeria nos arquivos do banco do pai).
+    as subclasses criam as suas tabelas em criar_tabelas e usam self.conexao com self.lock.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.lock = threading.Lock()
+        self._conexao = None
+        self.pid = None
+        self.herdadas = []
+        # um lock preso por outra thread no momento do fork nunca seria liberado no filho
+        os.register_at_fork(after_in_child=self.apos_fork)
+
+    def apos_fork(self):
+        self.lock = threading.Lock()
+
+    @property
+    def conexao(self):
+        # sempre usada com self.lock
+        if self.pid != os.getpid():
+            if self._conexao is not None:
+                self.herdadas.append(self._conexao)
+            conexao = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+            if self.caminho != ":memory:":
+                conexao.execute("PRAGMA journal_mode=WAL")
+            self.criar_tabelas(conexao)
+            self._conexao, self.pid = conexao, os.getpid()
+        return self._conexao
+
+    def criar_tabelas(self, conexao):
+        pass
+
+
+class RegistroProvas(BancoPorProcesso):
+    """
+    provas registradas, indexadas pelo id da prova, em uma tabela SQLite, de modo que uma prova
+    registrada em um worker e vista por todos (e continua registrada depois de reiniciar).
+    cada processo guarda as provas ja lidas em um cache LRU limitado; a versao gravada com a prova
+    invalida a copia guardada quando a prova e registrada de novo, em qualquer processo.
+    """
+
+    def __init__(self, caminho, tamanho_cache=256):
+        super().__init__(caminho)
+        self.tamanho_cache = tamanho_cache
+        self.cache = OrderedDict()  # id da prova -> (versao, ProvaRegistrada)
+
+    def criar_tabelas(self, conexao):
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS provas "
+            "(id_prova TEXT PRIMARY KEY, versao INTEGER NOT NULL, tipos BLOB NOT NULL, gabarito TEXT NOT NULL) WITHOUT ROWID"
+        )
+
+    def registrar(self, id_prova, prova):
+        with self.lock:
+            self.conexao.execute(
+                "INSERT INTO provas VALUES (?, 1, ?, ?) ON CONFLICT(id_prova) DO UPDATE SET "
+                "versao = versao + 1, tipos = excluded.tipos, gabarito = excluded.gabarito",
+                (str(id_prova), prova.tipos.tobytes(), json.dumps(prova.gabarito.tolist()))
+            )
+
+    def obter(self, id_prova):
+        if id_prova is None:
+            return None
+        chave = str(id_prova)
+        with self.lock:
+            linha = self.conexao.execute("SELECT versao FROM provas WHERE id_prova = ?", (chave,)).fetchone()
+            if linha is None:
+                return None
+            guardada = self.cache.get(chave)
+            if guardada is not None and guardada[0] == linha[0]:
+                self.cache.move_to_end(chave)
+                return guardada[1]
+
+            versao, tipos, gabarito = self.conexao.execute(
+                "SELECT versao, tipos, gabarito FROM provas WHERE id_prova = ?", (chave,)
+            ).fetchone()
+            prova = ProvaRegistrada(np.frombuffer(tipos, dtype=np.int8), json.loads(gabarito))
+            self.cache[chave] = (versao, prova)
+            self.cache.move_to_end(chave)
+            if len(self.cache) > self.tamanho_cache:
+                self.cache.popitem(last=False)
+            return prova
+
+
+# registro unico compartilhado pelas rotas do avaliador, no mesmo banco do estado dos alunos
+# (AGENTS_ESTADO_DB; em memoria, cada processo tem as suas provas e e preciso registra-las em todos os workers)
+# AGENTS_PROVAS_CACHE: provas decodificadas guardadas em cada processo
+PROVAS = RegistroProvas(os.environ.get("AGENTS_ESTADO_DB", ":memory:"), int(os.environ.get("AGENTS_PROVAS_CACHE", 256)))
+
+############## Gestor ##############
+# autor: fabio melo martins | matricula: 2122130014
+class ManagerAgent:
+    def __init__(self):
+        self.data = None
+
+    def set_data(self, data):
+        # Define os dados recebidos via POST para processamento.
+        self.data = data
+        return True
+
+    def calculate_metrics(self): # calcula o relatorio dos dados definidos em set_data (mantido por compatibilidade).
+        return self.process(self.data)
+
+    @etapa("gestor.process")
+    def process(self, data): # calcula medias, facilidades, dificuldades, necessidade de ajuda e desempenho geral.
+        # nao guarda estado: uma unica instancia pode ser usada por varias threads ao mesmo tempo
+        if not data:
+            return None
+
+        performance = data["dados"]
+
+        # perfis ja vistos sao respondidos pelo cache, sem refazer a inferencia fuzzy
+        chave = CACHE_GESTOR.chave(
+            performance[content_type][campo]
+            for content_type in ["imagem", "video", "texto"]
+            for campo in ["acertos", "erros"]
+        )
+        cached = CACHE_GESTOR.obter(chave)
+        if cached is not None:
+            return cached
+
+        result = self.analisar(performance)
+        CACHE_GESTOR.guardar(chave, result)
+        return result
+
+    @etapa("gestor.processar_quadro")
+    def processar_quadro(self, quadro):
+        """
+        executa o gestor sobre o quadro negro, reaproveitando as contagens e as taxas de acerto
+        ja escritas pelo avaliador, e escreve o relatorio.
+
+        args:
+            quadro: Blackboard com as entradas "contagens" e "taxas_acerto"
+
+        returns:
+            dict: relatorio no formato de calculate_metrics
+        """
+        contagens = quadro.ler("contagens")
+
+        # perfis ja vistos sao respondidos pelo cache, sem refazer a inferencia fuzzy
+        chave = CACHE_GESTOR.chave(
+            contagens[content_type][campo]
+            for content_type in ["imagem", "video", "texto"]
+            for campo in ["acertos", "erros"]
+        )
+        result = CACHE_GESTOR.obter(chave)
+        if result is None:
+            result = self.analisar(contagens, quadro.ler("taxas_acerto"))
+            CACHE_GESTOR.guardar(chave, result)
+
+        quadro.escrever("relatorio", result)
+        return result
+
+    @etapa("gestor.analisar")
+    def analisar(self, performance, taxas_acerto=None): # gera o relatorio a partir das contagens (e das taxas de 0 a 1, se ja calculadas)
+        result = {
+            "facilidades": [],
+            "dificuldades": [],
+            "ajuda": False,
+            "desempenho": "",
+            "media": 0.0,
+            "media_por_conteudo": {}
+        }
+
+        # inicializa variaveis para calculo da media geral
+        total_correct = 0
+        total_questions = 0
+
+        # calcula metricas para cada tipo de conteudo
         for content_type in ["imagem", "video", "texto"]:
             correct = performance[content_type]["acertos"]
             incorrect = performance[content_type]["erros"]
             total = correct + incorrect
 
-            # evita divisao por zero
-            accuracy_rate = (correct / total * 100) if total > 0 else 0.0
+            # evita divisao por zero (e reaproveita a taxa ja calculada, se houver)
+            if total == 0:
+                accuracy_rate = 0.0
+            elif taxas_acerto is not None:
+                accuracy_rate = taxas_acerto[content_type] * 100
+            else:
+                accuracy_rate = correct / total * 100
+
+            # armazena media por tipo de conteudo
+            result["media_por_conteudo"][content_type] = round(accuracy_rate, 2)
+
+            # calcula graus de pertinencia fuzzy
+            low_degree, high_degree = FUZZY.pertinencia_facilidade(accuracy_rate)
+
+            # identifica facilidades e dificuldades com base nos graus de pertinencia
+            if round(high_degree, 2) >= 0.5:
+                result["facilidades"].append({"tipo_conteudo": content_type, "grau_facilidade": round(high_degree, 2)})
+            if round(low_degree, 2) >= 0.29:
+                result["dificuldades"].append({"tipo_conteudo": content_type, "grau_dificuldade": round(low_degree, 2)})
+                result["ajuda"] = True
+
+            # acumula para media geral
+            total_correct += correct
+            total_questions += total
+
+        # calcula media geral
+        result["media"] = round((total_correct / total_questions * 100), 2) if total_questions > 0 else 0.0
+
+        # determina desempenho geral
+        result["desempenho"] = self.classificar_desempenho(result["media"])
+
+        return result
+
+
+    ### processamento em lote (turmas inteiras) ###
+    def contagens_lote(self, dados):
+        """
+        converte os dados de varios alunos em uma matriz (N, 6) de contagens, na ordem de CAMPOS_TUTOR
+        (acertos e erros de texto, imagem e video), a mesma usada pelo tutor.
+
+        args:
+            dados: lista de registros no formato do /gestor ({"dados": {...}} ou apenas o {...}),
+                   dicionario colunar com os campos de CAMPOS_TUTOR ou matriz (N, 6) ja pronta
+
+        returns:
+            np.ndarray: matriz de contagens com uma linha por aluno
+        """
+        if isinstance(dados, (np.ndarray, dict)):
+            return TUTOR.contagens_lote(dados)
+
+        linhas = []
+        for registro in dados:
+            performance = registro.get("dados", registro)
+            linhas.append([performance[tipo][campo] for tipo in TIPOS_CONTEUDO for campo in ["acertos", "erros"]])
+        return np.array(linhas, dtype=float).reshape(-1, len(CAMPOS_TUTOR))
+
+    @etapa("gestor.process_lote")
+    def process_lote(self, dados, em_pedacos=False): # calcula o relatorio de varios alunos, no mesmo formato de process.
+        try:
+            contagens = self.contagens_lote(dados)
+
+            # lotes grandes sao divididos entre processos (ver executar_em_lote)
+            if em_pedacos:
+                return executar_em_pedacos(_analisar_lote, contagens)
+            return executar_em_lote(_analisar_lote, contagens)
+        except Exception as e:
+            return {"erro": str(e)}
+
+    @etapa("gestor.analisar_lote")
+    def analisar_lote(self, contagens): # nucleo serial de process_lote: graus fuzzy de todos os alunos de uma vez.
+        acertos = contagens[:, 0::2]
+        totais = acertos + contagens[:, 1::2]
+        accuracy_rates = np.zeros_like(acertos, dtype=float)
+        np.divide(acertos, totais, out=accuracy_rates, where=totais > 0)
+        accuracy_rates *= 100
+
+        # mesmo arredondamento de round() sobre os escalares numpy do caminho individual
+        low_degrees, high_degrees = FUZZY.pertinencia_facilidade(accuracy_rates)
+        low_degrees = np.round(low_degrees, 2)
+        high_degrees = np.round(high_degrees, 2)
+
+        resultados = []
+        for linha in range(len(contagens)):
+            result = {
+                "facilidades": [],
+                "dificuldades": [],
+                "ajuda": False,
+                "desempenho": "",
+                "media": 0.0,
+                "media_por_conteudo": {}
+            }
+            total_correct = 0
+            total_questions = 0
+
+            for content_type in ["imagem", "video", "texto"]:
+                coluna = TIPOS_CONTEUDO.index(content_type)
+                correct = int(acertos[linha, coluna])
+                total = int(totais[linha, coluna])
+
+                result["media_por_conteudo"][content_type] = round(float(accuracy_rates[linha, coluna]), 2)
+
+                # identifica facilidades e dificuldades com base nos graus de pertinencia
+                if high_degrees[linha, coluna] >= 0.5:
+                    result["facilidades"].append({"tipo_conteudo": content_type, "grau_facilidade": high_degrees[linha, coluna]})
+                if low_degrees[linha, coluna] >= 0.29:
+                    result["dificuldades"].append({"tipo_conteudo": content_type, "grau_dificuldade": low_degrees[linha, coluna]})
+                    result["ajuda"] = True
+
+                total_correct += correct
+                total_questions += total
+
+            result["media"] = round((total_correct / total_questions * 100), 2) if total_questions > 0 else 0.0
+            result["desempenho"] = self.classificar_desempenho(result["media"])
+            resultados.append(result)
+
+        return resultados
+
+    @staticmethod
+    def classificar_desempenho(media):
+        # determina desempenho geral
+        if media >= 90:
+            return "muito alto"
+        elif media >= 80:
+            return "alto"
+        elif media >= 70:
+            return "medio"
+        elif media >= 50:
+            return "baixo"
+        return "muito baixo"
+
+
+# instancia unica compartilhada (os agentes nao guardam estado entre chamadas)
+GESTOR = ManagerAgent()
+
+
+############## Execucao em lote com varios processos ##############
+# configuracao (variaveis de ambiente):
+#   AGENTS_PROCESSOS: numero de processos do pool de cada worker (padrao: CPUs do host divididas entre os workers)
+#   AGENTS_WORKERS: workers do servidor que dividem o host (padrao: WEB_CONCURRENCY ou --workers)
+#   AGENTS_LOTE_CHUNK: alunos por tarefa enviada a cada processo
+#   AGENTS_LOTE_MINIMO: abaixo deste numero de alunos o lote roda no proprio processo
+# os processos do pool importam este modulo pelo nome (como o gunicorn e o uvicorn ja fazem),
+# entao ele precisa estar no sys.path com o nome usado no processo principal
+def processos_lote_padrao(workers=None):
+    # cada worker tem o seu pool; juntos, os pools usam as CPUs do host uma vez so
+    workers = workers or int(os.environ.get("AGENTS_WORKERS") or os.environ.get("WEB_CONCURRENCY") or 1)
+    return max((os.cpu_count() or 1) // max(workers, 1), 1)
+
+
+PROCESSOS_LOTE = int(os.environ.get("AGENTS_PROCESSOS", 0)) or processos_lote_padrao()
+CHUNK_LOTE = int(os.environ.get("AGENTS_LOTE_CHUNK", 5000))
+MINIMO_LOTE_PROCESSOS = int(os.environ.get("AGENTS_LOTE_MINIMO", 20000))
+
+_pool_processos = None
+_pool_lock = threading.Lock()
+
+
+def _aquecer_processo():
+    # inicializador dos processos do pool: executa uma inferencia para que as tabelas
+    # fuzzy e os caminhos de codigo ja estejam prontos antes do primeiro lote
+    TUTOR.recomendar_lote(np.ones((1, len(CAMPOS_TUTOR))))
+    GESTOR.analisar_lote(np.ones((1, len(CAMPOS_TUTOR))))
+
+
+def _recomendar_lote(contagens):
+    return TUTOR.recomendar_lote(contagens)
+
+
+def _planejar_lote(contagens, total_partes, formato):
+    return TUTOR.planejar_lote(contagens, total_partes, formato)
+
+
+def _analisar_lote(contagens):
+    return GESTOR.analisar_lote(contagens)
+
+
+def obter_pool_processos():
+    # o pool e criado na primeira vez que um lote grande aparece e reaproveitado depois.
+    # isso acontece dentro de uma thread de requisicao, com os locks, o sqlite e o mmap do worker
+    # abertos, entao os processos nao sao copiados com fork: saem de um forkserver (ou spawn)
+    global _pool_processos
+    with _pool_lock:
+        if _pool_processos is None:
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool_processos = ProcessPoolExecutor(
+                PROCESSOS_LOTE, mp_context=multiprocessing.get_context(metodo), initializer=_aquecer_processo
+            )
+        return _pool_processos
+
+
+def executar_em_lote(funcao, contagens, tamanho_chunk=None, minimo_processos=None):
+    """
+    executa uma funcao de lote sobre uma matriz de contagens, dividindo-a entre os processos
+    do pool quando o lote e grande o suficiente. os resultados voltam na ordem de entrada.
+
+    args:
+        funcao: funcao de nivel de modulo (serializavel) que recebe uma matriz e devolve uma lista
+        contagens: matriz (N, 6) de contagens
+        tamanho_chunk: alunos por tarefa (padrao: AGENTS_LOTE_CHUNK)
+        minimo_processos: tamanho minimo para usar o pool (padrao: AGENTS_LOTE_MINIMO)
+
+    returns:
+        list: lista com um resultado por aluno, na ordem de entrada
+    """
+    resultados = []
+    for parcial in executar_em_pedacos(funcao, contagens, tamanho_chunk, minimo_processos):
+        resultados.extend(parcial)
+    return resultados
+
+
+def executar_em_pedacos(funcao, contagens, tamanho_chunk=None, minimo_processos=None):
+    """
+    como executar_em_lote, mas devolve os resultados pedaco a pedaco (um por tarefa do pool),
+    na ordem de entrada, assim que cada um fica pronto. as rotas em lote comecam a responder
+    com o primeiro pedaco enquanto os outros ainda estao sendo calculados.
+
+    returns:
+        iterator: listas de resultados; concatenadas, dao a lista de executar_em_lote
+    """
+    tamanho_chunk = tamanho_chunk or CHUNK_LOTE
+    minimo_processos = MINIMO_LOTE_PROCESSOS if minimo_processos is None else minimo_processos
+
+    if len(contagens) < minimo_processos or PROCESSOS_LOTE <= 1:
+        return iter([funcao(contagens)])
+
+    chunks = [contagens[i:i + tamanho_chunk] for i in range(0, len(contagens), tamanho_chunk)]
+    # map envia todas as tarefas de uma vez e devolve os resultados em ordem, conforme terminam
+    return obter_pool_processos().map(funcao, chunks)
+
+
+############## Estado acumulado dos alunos ##############
+class EstadoAlunos(BancoPorProcesso):
+    """
+    contadores acumulados de cada aluno (acertos e erros de texto, imagem e video) em um banco SQLite.
+    cada correcao soma as suas contagens com um unico UPSERT e a leitura e uma busca pela chave
+    primaria, entao /tutor e /gestor podem ser chamados apenas com o id do aluno em tempo constante.
+    guarda tambem a turma em que o aluno esta contado no resumo das turmas.
+    a conexao e aberta no primeiro uso de cada processo (ver BancoPorProcesso).
+    """
+
+    def __init__(self, caminho):
+        super().__init__(caminho)
+        campos = ", ".join(CAMPOS_TUTOR)
+        self.sql_somar = (
+            f"INSERT INTO alunos (id_aluno, {campos}, id_turma) VALUES (?, {', '.join('?' * len(CAMPOS_TUTOR))}, ?) "
+            f"ON CONFLICT(id_aluno) DO UPDATE SET "
+            + ", ".join(f"{campo} = {campo} + excluded.{campo}" for campo in CAMPOS_TUTOR)
+            + ", id_turma = COALESCE(excluded.id_turma, id_turma)"
+        )
+        self.sql_obter = f"SELECT {campos} FROM alunos WHERE id_aluno = ?"
+        self.sql_obter_turma = f"SELECT {campos}, id_turma FROM alunos WHERE id_aluno = ?"
+
+    def criar_tabelas(self, conexao):
+        colunas = ", ".join(f"{campo} INTEGER NOT NULL DEFAULT 0" for campo in CAMPOS_TUTOR)
+        conexao.execute(
+            f"CREATE TABLE IF NOT EXISTS alunos (id_aluno TEXT PRIMARY KEY, {colunas}, id_turma TEXT) WITHOUT ROWID"
+        )
+        # bancos criados antes da coluna id_turma
+        if "id_turma" not in [linha[1] for linha in conexao.execute("PRAGMA table_info(alunos)")]:
+            conexao.execute("ALTER TABLE alunos ADD COLUMN id_turma TEXT")
+
+    def somar(self, id_aluno, contagens, id_turma=None):
+        """
+        soma as contagens de uma correcao ao estado do aluno.
+
+        args:
+            id_aluno: identificador do aluno
+            contagens: lista com as 6 contagens na ordem de CAMPOS_TUTOR
+            id_turma: turma do aluno a partir desta correcao (None mantem a anterior)
+
+        returns:
+            tuple: (contagens antes da soma, turma antes da soma); (None, None) se o aluno ainda nao existia
+        """
+        id_turma = str(id_turma) if id_turma is not None else None
+        # a leitura e a soma formam uma unica transacao de escrita (BEGIN IMMEDIATE toma o lock do
+        # banco ja no inicio), entao outro worker nao soma nada entre elas e o "anterior" e exato
+        with self.lock:
+            conexao = self.conexao
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                anterior = conexao.execute(self.sql_obter_turma, (str(id_aluno),)).fetchone()
+                conexao.execute(self.sql_somar, (str(id_aluno), *contagens, id_turma))
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+            conexao.execute("COMMIT")
+        if anterior is None:
+            return None, None
+        return list(anterior[:-1]), anterior[-1]
+
+    def obter(self, id_aluno):
+        """
+        retorna as contagens acumuladas do aluno no formato do /tutor, ou None se ele nao existir.
+        """
+        with self.lock:
+            linha = self.conexao.execute(self.sql_obter, (str(id_aluno),)).fetchone()
+        if linha is None:
+            return None
+        return dict(zip(CAMPOS_TUTOR, linha))
+
+
+# estado compartilhado (arquivo definido por AGENTS_ESTADO_DB; em memoria, o estado e de cada processo)
+# com as turmas em memoria compartilhada o estado precisa ser um arquivo: a contribuicao anterior de
+# cada aluno tem de ser vista por todos os workers (e depois de reiniciar), senao ele e contado duas vezes
+if COMPARTILHADO and os.environ.get("AGENTS_ESTADO_DB", ":memory:") == ":memory:":
+    raise RuntimeError("AGENTS_COMPARTILHADO exige AGENTS_ESTADO_DB com o caminho de um arquivo SQLite")
+ESTADO = EstadoAlunos(os.environ.get("AGENTS_ESTADO_DB", ":memory:"))
+
+
+def registrar_avaliacao(avaliacao, submissao):
+    """
+    registra o resultado de uma correcao: grava no historico (se ativado), soma ao estado acumulado
+    do aluno (se "id_aluno" foi informado) e atualiza o resumo da turma (se "id_turma" foi informada).
+    com o id do aluno, o resumo da turma reflete o estado acumulado de cada aluno: a contribuicao
+    anterior e retirada da turma em que o aluno estava contado e a nova e somada na turma atual
+    (a ultima informada). sem ele, cada correcao conta como um registro.
+
+    args:
+        avaliacao: resultado do avaliador para um aluno
+        submissao: dados enviados com a correcao (id_aluno, id_turma e id_prova sao opcionais)
+    """
+    if "erro" in avaliacao:
+        return
+    id_aluno = submissao.get("id_aluno")
+    id_turma = submissao.get("id_turma")
+    contagens = [avaliacao[campo][tipo] for tipo in TIPOS_CONTEUDO for campo in ["acertos", "erros"]]
+
+    if HISTORICO is not None:
+        HISTORICO.acrescentar(id_aluno, submissao.get("id_prova"), contagens, avaliacao["nota"], avaliacao["aprovado"])
+
+    id_turma = str(id_turma) if id_turma is not None else None
+    anterior = turma_anterior = None
+    if id_aluno is not None:
+        anterior, turma_anterior = ESTADO.somar(id_aluno, contagens, id_turma)
+        if anterior is not None:
+            contagens = [antes + novo for antes, novo in zip(anterior, contagens)]
+        if id_turma is None:
+            id_turma = turma_anterior
+
+    if id_turma is not None and id_turma == turma_anterior:
+        TURMAS.atualizar(id_turma, relatorio_turma(contagens), relatorio_turma(anterior))
+        return
+    if turma_anterior is not None:
+        TURMAS.retirar(turma_anterior, relatorio_turma(anterior))
+    if id_turma is not None:
+        TURMAS.atualizar(id_turma, relatorio_turma(contagens))
+
+
+def relatorio_de_contagens(contagens):
+    # relatorio do gestor para as 6 contagens na ordem de CAMPOS_TUTOR (passa pelo cache do gestor)
+    return GESTOR.process({"dados": {
+        tipo: {"acertos": contagens[2 * i], "erros": contagens[2 * i + 1]}
+        for i, tipo in enumerate(TIPOS_CONTEUDO)
+    }})
+
+
+def relatorio_turma(contagens):
+    # relatorio do gestor sem as medias dos conteudos que o aluno nunca respondeu (nao contam nas turmas)
+    relatorio = dict(relatorio_de_contagens(contagens))
+    relatorio["media_por_conteudo"] = {
+        tipo: media for tipo, media in relatorio["media_por_conteudo"].items()
+        if contagens[2 * TIPOS_CONTEUDO.index(tipo)] + contagens[2 * TIPOS_CONTEUDO.index(tipo) + 1] > 0
+    }
+    return relatorio
+
+
+############## Agregacao por turma ##############
+NIVEIS_DESEMPENHO = ["muito alto", "alto", "medio", "baixo", "muito baixo"]
+PERCENTIS = [10, 25, 50, 75, 90]
+
+
+class ResumoTurma:
+    """
+    resumo incremental de uma turma, montado a partir dos relatorios do gestor de cada aluno:
+    medias por conteudo, quantos alunos precisam de ajuda, distribuicao do desempenho e
+    histogramas com resolucao de 0,1 ponto (0 a 100) para os percentis. as medias e os percentis
+    de cada conteudo consideram apenas os alunos que responderam questoes daquele conteudo.
+    adicionar e remover um aluno custam O(1) e dois resumos podem ser mesclados (ex: escola inteira),
+    entao consultar a turma nunca exige reler os registros dos alunos.
+    """
+
+    RESOLUCAO = 10  # posicoes do histograma por ponto percentual
+
+    def __init__(self):
+        self.alunos = 0
+        self.ajuda = 0
+        self.soma_media = 0.0
+        self.soma_por_conteudo = {tipo: 0.0 for tipo in TIPOS_CONTEUDO}
+        self.alunos_por_conteudo = {tipo: 0 for tipo in TIPOS_CONTEUDO}
+        self.desempenho = {nivel: 0 for nivel in NIVEIS_DESEMPENHO}
+        self.histograma = np.zeros(100 * self.RESOLUCAO + 1, dtype=np.int64)
+        self.histograma_por_conteudo = {tipo: np.zeros_like(self.histograma) for tipo in TIPOS_CONTEUDO}
+
+    def posicao(self, valor):
+        return int(round(valor * self.RESOLUCAO))
+
+    def aplicar(self, relatorio, sinal):
+        # soma (sinal = 1) ou retira (sinal = -1) o relatorio de um aluno
+        self.alunos += sinal
+        self.ajuda += sinal * relatorio["ajuda"]
+        self.soma_media += sinal * relatorio["media"]
+        self.desempenho[relatorio["desempenho"]] += sinal
+        self.histograma[self.posicao(relatorio["media"])] += sinal
+        for tipo, media in relatorio["media_por_conteudo"].items():
+            self.soma_por_conteudo[tipo] += sinal * media
+            self.alunos_por_conteudo[tipo] += sinal
+            self.histograma_por_conteudo[tipo][self.posicao(media)] += sinal
+
+    def mesclar(self, outro):
+        self.alunos += outro.alunos
+        self.ajuda += outro.ajuda
+        self.soma_media += outro.soma_media
+        for tipo in TIPOS_CONTEUDO:
+            self.soma_por_conteudo[tipo] += outro.soma_por_conteudo[tipo]
+            self.alunos_por_conteudo[tipo] += outro.alunos_por_conteudo[tipo]
+            self.histograma_por_conteudo[tipo] += outro.histograma_por_conteudo[tipo]
+        for nivel in NIVEIS_DESEMPENHO:
+            self.desempenho[nivel] += outro.desempenho[nivel]
+        self.histograma += outro.histograma
+        return self
+
+    def percentis(self, histograma, alunos):
+        if alunos == 0:
+            return None
+        acumulado = np.cumsum(histograma)
+        return {
+            f"p{p}": float(np.searchsorted(acumulado, p / 100 * alunos)) / self.RESOLUCAO
+            for p in PERCENTIS
+        }
+
+    def resumo(self):
+        if self.alunos == 0:
+            return {"alunos": 0}
+        return {
+            "alunos": self.alunos,
+            "media": round(self.soma_media / self.alunos, 2),
+            "media_por_conteudo": {
+                tipo: round(soma / self.alunos_por_conteudo[tipo], 2) if self.alunos_por_conteudo[tipo] else None
+                for tipo, soma in self.soma_por_conteudo.items()
+            },
+            "alunos_por_conteudo": dict(self.alunos_por_conteudo),
+            "percentual_ajuda": round(self.ajuda / self.alunos * 100, 2),
+            "desempenho": dict(self.desempenho),
+            "percentis": self.percentis(self.histograma, self.alunos),
+            "percentis_por_conteudo": {
+                tipo: self.percentis(histograma, self.alunos_por_conteudo[tipo])
+                for tipo, histograma in self.histograma_por_conteudo.items()
+            }
+        }
+
+
+class AgregadorTurmas:
+    """
+    resumos de todas as turmas, atualizados a cada correcao.
+    """
+
+    def __init__(self):
+        self.turmas = {}
+        self.lock = threading.Lock()
+
+    def atualizar(self, id_turma, relatorio, relatorio_anterior=None):
+        with self.lock:
+            resumo = self.turmas.setdefault(id_turma, ResumoTurma())
+            if relatorio_anterior is not None:
+                resumo.aplicar(relatorio_anterior, -1)
+            resumo.aplicar(relatorio, 1)
+
+    def retirar(self, id_turma, relatorio):
+        # retira um aluno que passou para outra turma
+        with self.lock:
+            self.turmas.setdefault(id_turma, ResumoTurma()).aplicar(relatorio, -1)
+
+    def consultar(self, ids_turmas=None):
+        # resumo de uma ou mais turmas mescladas (todas, se nenhuma for informada)
+        with self.lock:
+            ids_turmas = ids_turmas or list(self.turmas)
+            resumo = ResumoTurma()
+            for id_turma in ids_turmas:
+                if id_turma in self.turmas:
+                    resumo.mesclar(self.turmas[id_turma])
+            return resumo.resumo()
+
+
+class TurmasCompartilhadas:
+    """
+    resumos das turmas em memoria compartilhada, para que todos os workers vejam as mesmas turmas.
+    cada processo soma apenas na sua propria linha de contadores de cada turma (um unico escritor
+    por linha) e a consulta soma as linhas de todos os processos. cada linha tem um numero de
+    sequencia (seqlock), entao a consulta nunca ve uma atualizacao pela metade. a linha de um
+    processo que terminou e reaproveitada pelo proximo, com os contadores que ele ja havia somado.
+    """
+
+    TAMANHO_NOME = 64  # 1 byte de tamanho + ate 63 bytes do id da turma em utf-8
+
+    def __init__(self, caminho, max_turmas=256, max_processos=32):
+        posicoes = 100 * ResumoTurma.RESOLUCAO + 1
+        self.tipo_linha = np.dtype([
+            ("seq", np.uint64),
+            ("alunos", np.int64),
+            ("ajuda", np.int64),
+            ("soma_media", np.float64),
+            ("soma_por_conteudo", np.float64, len(TIPOS_CONTEUDO)),
+            ("alunos_por_conteudo", np.int64, len(TIPOS_CONTEUDO)),
+            ("desempenho", np.int64, len(NIVEIS_DESEMPENHO)),
+            ("histograma", np.int32, posicoes),
+            ("histograma_por_conteudo", np.int32, (len(TIPOS_CONTEUDO), posicoes))
+        ])
+        self.max_turmas = max_turmas
+        self.max_processos = max_processos
+        tamanho_nomes = max_turmas * self.TAMANHO_NOME
+        tamanho_pids = max_processos * 8
+        self.regiao = RegiaoCompartilhada(
+            caminho,
+            f"turmas:{max_turmas}:{max_processos}:{self.tipo_linha.descr}",
+            tamanho_nomes + tamanho_pids + max_processos * max_turmas * self.tipo_linha.itemsize
+        )
+        self.nomes = np.frombuffer(self.regiao.dados, np.uint8, tamanho_nomes).reshape(max_turmas, self.TAMANHO_NOME)
+        self.pids = np.frombuffer(self.regiao.dados, np.int64, max_processos, tamanho_nomes)
+        self.linhas = np.frombuffer(
+            self.regiao.dados, self.tipo_linha, max_processos * max_turmas, tamanho_nomes + tamanho_pids
+        ).reshape(max_processos, max_turmas)
+
+        self.indices = {}
+        self.pid = None
+        self.linha_processo = None
+        self.lock = threading.Lock()
+
+    def ler_nomes(self):
+        # atualiza o mapa id da turma -> indice com as turmas criadas por qualquer processo
+        for indice in range(len(self.indices), self.max_turmas):
+            tamanho = int(self.nomes[indice, 0])
+            if tamanho == 0:
+                break
+            self.indices[bytes(self.nomes[indice, 1:1 + tamanho]).decode()] = indice
+
+    def indice(self, id_turma, criar=False):
+        id_turma = str(id_turma)
+        if id_turma not in self.indices:
+            self.ler_nomes()
+        if id_turma not in self.indices and criar:
+            nome = id_turma.encode()
+            if len(nome) >= self.TAMANHO_NOME:
+                raise ValueError(f"id_turma muito longo (maximo {self.TAMANHO_NOME - 1} bytes)")
+            with self.regiao.escrita():
+                self.ler_nomes()
+                if id_turma not in self.indices:
+                    indice = len(self.indices)
+                    if indice >= self.max_turmas:
+                        raise RuntimeError(f"limite de {self.max_turmas} turmas na memoria compartilhada")
+                    # o tamanho e escrito por ultimo: quem le nunca ve um nome incompleto
+                    self.nomes[indice, 1:1 + len(nome)] = np.frombuffer(nome, np.uint8)
+                    self.nomes[indice, 0] = len(nome)
+                    self.indices[id_turma] = indice
+        return self.indices.get(id_turma)
+
+    def linha_do_processo(self):
+        # escolhida no primeiro uso em cada processo (depois do fork dos workers)
+        if self.pid != os.getpid():
+            with self.regiao.escrita():
+                for linha, pid in enumerate(self.pids.tolist()):
+                    if pid == 0 or not processo_ativo(pid):
+                        self.pids[linha] = os.getpid()
+                        break
+                else:
+                    raise RuntimeError(f"limite de {self.max_processos} processos na memoria compartilhada")
+            self.pid, self.linha_processo = os.getpid(), linha
+        return self.linha_processo
+
+    def aplicar(self, linha, relatorio, sinal):
+        # mesmo calculo de ResumoTurma.aplicar, sobre a linha compartilhada
+        linha["alunos"] += sinal
+        linha["ajuda"] += sinal * relatorio["ajuda"]
+        linha["soma_media"] += sinal * relatorio["media"]
+        linha["desempenho"][NIVEIS_DESEMPENHO.index(relatorio["desempenho"])] += sinal
+        linha["histograma"][int(round(relatorio["media"] * ResumoTurma.RESOLUCAO))] += sinal
+        for tipo, media in relatorio["media_por_conteudo"].items():
+            posicao = TIPOS_CONTEUDO.index(tipo)
+            linha["soma_por_conteudo"][posicao] += sinal * media
+            linha["alunos_por_conteudo"][posicao] += sinal
+            linha["histograma_por_conteudo"][posicao, int(round(media * ResumoTurma.RESOLUCAO))] += sinal
+
+    def atualizar(self, id_turma, relatorio, relatorio_anterior=None):
+        with self.lock:
+            linha = self.linhas[self.linha_do_processo(), self.indice(id_turma, criar=True)]
+            linha["seq"] += 1  # impar: atualizacao em andamento
+            if relatorio_anterior is not None:
+                self.aplicar(linha, relatorio_anterior, -1)
+            if relatorio is not None:
+                self.aplicar(linha, relatorio, 1)
+            linha["seq"] += 1
+
+    def retirar(self, id_turma, relatorio):
+        # retira um aluno que passou para outra turma
+        self.atualizar(id_turma, None, relatorio)
+
+    def consultar(self, ids_turmas=None):
+        # resumo de uma ou mais turmas mescladas (todas, se nenhuma for informada), somando todos os processos
+        self.ler_nomes()
+        if ids_turmas:
+            indices = [self.indices[str(id_turma)] for id_turma in ids_turmas if str(id_turma) in self.indices]
+        else:
+            indices = list(self.indices.values())
+
+        # copia as linhas e repete se alguma estava sendo escrita (seq impar ou alterado durante a copia)
+        while True:
+            seq = self.linhas["seq"][:, indices]
+            bloco = self.linhas[:, indices]
+            if not (seq & 1).any() and np.array_equal(seq, self.linhas["seq"][:, indices]):
+                break
+
+        resumo = ResumoTurma()
+        resumo.alunos = int(bloco["alunos"].sum())
+        resumo.ajuda = int(bloco["ajuda"].sum())
+        resumo.soma_media = float(bloco["soma_media"].sum())
+        resumo.soma_por_conteudo = dict(zip(TIPOS_CONTEUDO, bloco["soma_por_conteudo"].sum(axis=(0, 1)).tolist()))
+        resumo.alunos_por_conteudo = dict(zip(TIPOS_CONTEUDO, bloco["alunos_por_conteudo"].sum(axis=(0, 1)).tolist()))
+        resumo.desempenho = dict(zip(NIVEIS_DESEMPENHO, bloco["desempenho"].sum(axis=(0, 1)).tolist()))
+        resumo.histograma = bloco["histograma"].sum(axis=(0, 1), dtype=np.int64)
+        resumo.histograma_por_conteudo = dict(zip(
+            TIPOS_CONTEUDO, bloco["histograma_por_conteudo"].sum(axis=(0, 1), dtype=np.int64)
+        ))
+        return resumo.resumo()
+
+
+def processo_ativo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# resumos compartilhados pelas rotas (entre todos os workers do host, com AGENTS_COMPARTILHADO)
+TURMAS = TurmasCompartilhadas(
+    f"{COMPARTILHADO}-turmas",
+    int(os.environ.get("AGENTS_COMPARTILHADO_TURMAS", 256)),
+    int(os.environ.get("AGENTS_COMPARTILHADO_PROCESSOS", 32))
+) if COMPARTILHADO else AgregadorTurmas()
+
+
+############## Historico de avaliacoes ##############
+class HistoricoAvaliacoes:
+    """
+    log colunar, somente de acrescimo, de todas as avaliacoes.
+    cada coluna e um arquivo binario de largura fixa lido com np.memmap, entao consultas e
+    reprocessamentos leem apenas as colunas de que precisam, sem copiar o arquivo inteiro.
+    os ids de alunos e provas sao guardados uma unica vez em arquivos de texto (uma string json
+    por linha) e as colunas guardam o indice de cada um; um indice em memoria aponta as linhas de cada aluno.
+    varios processos (workers) podem usar o mesmo diretorio: acrescimos e consultas tomam um lock
+    de arquivo e, antes, incorporam os ids e as linhas que os outros processos acrescentaram.
+    """
+
+    # nome da coluna -> (tipo numpy, valores por linha)
+    COLUNAS = {
+        "aluno": (np.int32, 1),
+        "prova": (np.int32, 1),
+        "acertos": (np.int32, 3),  # texto, imagem, video
+        "erros": (np.int32, 3),
+        "nota": (np.float64, 1),
+        "aprovado": (np.uint8, 1),
+        "timestamp": (np.float64, 1)
+    }
+
+    def __init__(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        self.diretorio = diretorio
+        self.lock = threading.Lock()
+        self.fd_lock = os.open(os.path.join(diretorio, "historico.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        self.memmaps = {}
+
+        self.alunos, self.provas = [], []
+        self.codigos_alunos, self.codigos_provas = {}, {}
+        self.posicoes = {"alunos.txt": 0, "provas.txt": 0}  # bytes ja lidos de cada arquivo de ids
+        self.linhas = 0
+        self.linhas_por_aluno = {}
+
+        with self.bloqueio():
+            # descarta o que um processo deixou pela metade ao parar no meio de um acrescimo
+            # (nenhum outro processo escreve enquanto o lock esta tomado)
+            for arquivo in self.posicoes:
+                caminho = os.path.join(diretorio, arquivo)
+                if os.path.exists(caminho):
+                    with open(caminho, "rb+") as ids:
+                        conteudo = ids.read()
+                        ids.truncate(conteudo.rfind(b"\n") + 1)
+            linhas = min(
+                os.path.getsize(self.caminho(nome)) // self.largura(nome) if os.path.exists(self.caminho(nome)) else 0
+                for nome in self.COLUNAS
+            )
+            self.arquivos = {}
+            for nome in self.COLUNAS:
+                # sem buffer: cada coluna de uma linha vai ao arquivo em uma unica escrita, sem flush
+                arquivo = open(self.caminho(nome), "ab", buffering=0)
+                arquivo.truncate(linhas * self.largura(nome))
+                self.arquivos[nome] = arquivo
+            self.sincronizar()
+
+    @contextmanager
+    def bloqueio(self):
+        # lockf exclui os outros processos e o lock de thread, as outras threads deste processo
+        with self.lock:
+            fcntl.lockf(self.fd_lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd_lock, fcntl.LOCK_UN)
+
+    def caminho(self, nome):
+        return os.path.join(self.diretorio, f"{nome}.bin")
+
+    def largura(self, nome):
+        tipo, valores = self.COLUNAS[nome]
+        return np.dtype(tipo).itemsize * valores
+
+    def sincronizar(self):
+        """
+        incorpora os ids e as linhas acrescentados (por este ou por outros processos) desde a ultima leitura.
+        deve ser chamado com o bloqueio tomado.
+        """
+        self.ler_ids_novos("alunos.txt", self.alunos, self.codigos_alunos)
+        self.ler_ids_novos("provas.txt", self.provas, self.codigos_provas)
+
+        linhas = min(os.path.getsize(self.caminho(nome)) // self.largura(nome) for nome in self.COLUNAS)
+        if linhas > self.linhas:
+            codigos = np.fromfile(
+                self.caminho("aluno"), dtype=self.COLUNAS["aluno"][0], count=linhas - self.linhas,
+                offset=self.linhas * self.largura("aluno")
+            )
+            for deslocamento, codigo in enumerate(codigos.tolist()):
+                self.linhas_por_aluno.setdefault(codigo, []).append(self.linhas + deslocamento)
+            self.linhas = linhas
+
+    @staticmethod
+    def codificar_id(valor):
+        # string json em ascii: quebras de linha e separadores unicode do id ficam escapados
+        return json.dumps(valor).encode("ascii") + b"\n"
+
+    @staticmethod
+    def decodificar_id(linha):
+        # linhas sem aspas foram gravadas antes da codificacao em json e sao o proprio id
+        if linha.startswith(b'"'):
+            return json.loads(linha)
+        return linha.decode("utf-8")
+
+    def ler_ids_novos(self, arquivo, ids, codigos):
+        # cada linha do arquivo e um id; o codigo e o numero da linha
+        caminho = os.path.join(self.diretorio, arquivo)
+        if not os.path.exists(caminho):
+            return
+        with open(caminho, "rb") as entrada:
+            entrada.seek(self.posicoes[arquivo])
+            bloco = entrada.read()
+        fim = bloco.rfind(b"\n") + 1
+        # divide apenas em b"\n" (splitlines tambem dividiria em \r, \x85, \u2028...)
+        for linha in bloco[:fim].split(b"\n")[:-1]:
+            valor = self.decodificar_id(linha)
+            codigos[valor] = len(ids)
+            ids.append(valor)
+        self.posicoes[arquivo] += fim
+
+    def codigo(self, valor, ids, codigos, arquivo):
+        # indice do id no arquivo de ids, acrescentando-o se for novo (-1 quando nao informado)
+        if valor is None:
+            return -1
+        valor = str(valor)
+        if valor not in codigos:
+            with open(os.path.join(self.diretorio, arquivo), "ab") as saida:
+                saida.write(self.codificar_id(valor))
+            self.ler_ids_novos(arquivo, ids, codigos)
+        return codigos[valor]
+
+    def acrescentar(self, id_aluno, id_prova, contagens, nota, aprovado):
+        """
+        acrescenta uma avaliacao ao final do log.
+
+        args:
+            id_aluno: id do aluno (ou None)
+            id_prova: id da prova registrada (ou None)
+            contagens: lista com as 6 contagens na ordem de CAMPOS_TUTOR
+            nota: nota da avaliacao
+            aprovado: se o aluno foi aprovado
+        """
+        with self.bloqueio():
+            self.sincronizar()
+            aluno = self.codigo(id_aluno, self.alunos, self.codigos_alunos, "alunos.txt")
+            valores = {
+                "aluno": aluno,
+                "prova": self.codigo(id_prova, self.provas, self.codigos_provas, "provas.txt"),
+                "acertos": contagens[0::2],
+                "erros": contagens[1::2],
+                "nota": nota,
+                "aprovado": aprovado,
+                "timestamp": time.time()
+            }
+            for nome, (tipo, _) in self.COLUNAS.items():
+                self.arquivos[nome].write(np.asarray(valores[nome], dtype=tipo).tobytes())
+            self.linhas_por_aluno.setdefault(aluno, []).append(self.linhas)
+            self.linhas += 1
+
+    def coluna(self, nome):
+        """
+        retorna a coluna inteira como np.memmap somente leitura (sem copiar os dados).
+        """
+        tipo, valores = self.COLUNAS[nome]
+        memmap = self.memmaps.get(nome)
+        if memmap is None or len(memmap) != self.linhas:
+            if self.linhas == 0:
+                return np.zeros((0, valores) if valores > 1 else 0, dtype=tipo)
+            forma = (self.linhas, valores) if valores > 1 else (self.linhas,)
+            memmap = np.memmap(self.caminho(nome), dtype=tipo, mode="r", shape=forma)
+            self.memmaps[nome] = memmap
+        return memmap
+
+    def consultar_aluno(self, id_aluno, colunas, desde=None, ate=None):
+        """
+        le apenas as colunas pedidas, apenas nas linhas do aluno (e no periodo, se informado).
+
+        returns:
+            dict: nome da coluna -> array com os valores de cada avaliacao do aluno
+        """
+        with self.bloqueio():
+            self.sincronizar()
+            codigo = self.codigos_alunos.get(str(id_aluno))
+            linhas = np.array(self.linhas_por_aluno.get(codigo, []), dtype=np.int64)
+            if desde is not None or ate is not None:
+                instantes = self.coluna("timestamp")[linhas]
+                dentro = np.ones(len(linhas), dtype=bool)
+                if desde is not None:
+                    dentro &= instantes >= desde
+                if ate is not None:
+                    dentro &= instantes <= ate
+                linhas = linhas[dentro]
+            return {nome: np.asarray(self.coluna(nome)[linhas]) for nome in colunas}
+
+    def contagens_aluno(self, id_aluno, desde=None, ate=None):
+        # soma das contagens do aluno no periodo, na ordem de CAMPOS_TUTOR (para reprocessar no gestor)
+        dados = self.consultar_aluno(id_aluno, ["acertos", "erros"], desde, ate)
+        contagens = np.empty(len(CAMPOS_TUTOR), dtype=np.int64)
+        contagens[0::2] = dados["acertos"].sum(axis=0)
+        contagens[1::2] = dados["erros"].sum(axis=0)
+        return contagens.tolist()
+
+
+# historico ativado pela variavel de ambiente AGENTS_HISTORICO_DIR (diretorio dos arquivos)
+HISTORICO = HistoricoAvaliacoes(os.environ["AGENTS_HISTORICO_DIR"]) if os.environ.get("AGENTS_HISTORICO_DIR") else None
+
+
+############## Serializacao JSON ##############
+class ProvedorJson(DefaultJSONProvider):
+    """
+    provedor JSON do flask com um codificador trocavel: orjson quando disponivel (bem mais rapido
+    em respostas grandes) ou o json padrao, com o mesmo resultado do provedor original do flask
+    (chaves ordenadas, compacto fora do modo debug). escalares e arrays numpy sao aceitos nos dois.
+    """
+
+    def __init__(self, app, codificador=None):
+        super().__init__(app)
+        self.codificador = codificador or ("orjson" if orjson is not None else "json")
+        if self.codificador == "orjson" and orjson is None:
+            LOGS.raiz.warning("orjson nao instalado; usando o json padrao")
+            self.codificador = "json"
+
+    @staticmethod
+    def default(obj):
+        # tipos que o codificador nao conhece (os numpy, no json padrao; datas, decimais etc. nos dois)
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return DefaultJSONProvider.default(obj)
+
+    def codificar(self, obj, indentar=False):
+        """
+        serializa obj diretamente em bytes (utf-8).
+
+        args:
+            obj: objeto a serializar
+            indentar: indenta com 2 espacos (como o flask em modo debug) em vez do formato compacto
+        """
+        if self.codificador == "orjson":
+            opcoes = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                opcoes |= orjson.OPT_SORT_KEYS
+            if indentar:
+                opcoes |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=opcoes)
+        return json.dumps(
+            obj,
+            default=self.default,
+            ensure_ascii=self.ensure_ascii,
+            sort_keys=self.sort_keys,
+            indent=2 if indentar else None,
+            separators=None if indentar else (",", ":")
+        ).encode()
+
+    def dumps(self, obj, **kwargs):
+        # chamadas com as opcoes do proprio flask passam pelo codificador escolhido
+        if not kwargs.keys() - {"separators", "indent"} and kwargs.get("separators") in (None, (",", ":")):
+            return self.codificar(obj, bool(kwargs.get("indent"))).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.codificador == "orjson" and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # como o DefaultJSONProvider.response, mas sem passar por str
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.codificar(obj, indentar) + b"\n", mimetype=self.mimetype)
+
+
+def resposta_lote(pedacos, tamanho_pedaco=1000):
+    """
+    resposta {"resultados": [...]} das rotas em lote, a partir dos pedacos de resultados dos agentes
+    (ver executar_em_pedacos). o primeiro pedaco e calculado antes de responder, entao erros nele
+    ainda viram 500; os seguintes sao serializados e enviados conforme ficam prontos, sem esperar
+    o lote inteiro nem montar o corpo na memoria.
+    o corpo e o mesmo do jsonify (fora do modo debug, em que a resposta e indentada).
+    """
+    pedacos = iter(pedacos)
+    primeiro = next(pedacos, [])
+    segundo = next(pedacos, None)
+    if segundo is None and len(primeiro) <= tamanho_pedaco:
+        return jsonify({"resultados": primeiro})
+    if app.debug:
+        return jsonify({"resultados": [r for pedaco in (primeiro, segundo, *pedacos) if pedaco for r in pedaco]})
+
+    def todos():
+        yield primeiro
+        yield segundo or []
+        yield from pedacos
+
+    def gerar():
+        yield b'{"resultados":['
+        separador = b""
+        for pedaco in todos():
+            for inicio in range(0, len(pedaco), tamanho_pedaco):
+                yield separador + app.json.codificar(pedaco[inicio:inicio + tamanho_pedaco])[1:-1]
+                separador = b","
+        yield b"]}\n"
+
+    return Response(stream_with_context(gerar()), mimetype=app.json.mimetype)
+
+
+############## API que comanda o sistema multiagente ##############
+# autor: fabio melo martins | matricula: 2122130014
+
+# configuracao do servidor flask
+app = Flask(__name__)
+CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=["ETag"]) 
+app.json = ProvedorJson(app, os.environ.get("AGENTS_JSON"))
+
+
+### metricas das rotas ###
+class ProvedorJsonMedido(ProvedorJson):
+    # mede a decodificacao dos corpos e a serializacao das respostas (flask e ASGI usam app.json)
+    @etapa("json.decodificacao")
+    def loads(self, s, **kwargs):
+        return super().loads(s, **kwargs)
+
+    @etapa("json.serializacao")
+    def codificar(self, obj, indentar=False):
+        return super().codificar(obj, indentar)
+
+
+if METRICAS is not None:
+    app.json = ProvedorJsonMedido(app, app.json.codificador)
+
+
+# os ganchos so sao instalados se houver metricas ou logs de requisicoes a registrar
+if METRICAS is not None or LOGS.acesso_ativo or LOGS.payload_ativo:
+    @app.before_request
+    def iniciar_medicao():
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def registrar_medicao(response):
+        # respostas em streaming sao medidas ate o envio dos cabecalhos
+        duracao = time.perf_counter() - g.inicio_requisicao
+        rota = request.url_rule.rule if request.url_rule is not None else "desconhecida"
+        if METRICAS is not None:
+            METRICAS.observar_requisicao(rota, request.method, response.status_code, duracao)
+        if LOGS.amostrar_acesso(rota):
+            LOGS.logger(rota).info("requisicao", extra={"campos": {
+                "rota": rota, "metodo": request.method, "status": response.status_code, "duracao_ms": round(duracao * 1000, 3)
+            }})
+        if LOGS.amostrar_payload(rota):
+            LOGS.logger(rota).info("payload", extra={"campos": {"rota": rota, "corpo": request.get_json(silent=True)}})
+        return response
+
+### formatos de entrada ###
+# alem do json, as rotas aceitam messagepack (mesma estrutura do json; pip install msgpack)
+# e as rotas em lote do tutor e do gestor aceitam a matriz de contagens empacotada
+TIPOS_MSGPACK = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+TIPO_CONTAGENS = "application/x-agents-contagens"  # int32 little-endian, (N, 6) na ordem de CAMPOS_TUTOR
+
+
+class FormatoNaoSuportado(Exception):
+    # content-type que a rota nao aceita (ou cujo decodificador nao esta instalado): status 415
+    pass
+
+
+class CorpoInvalido(Exception):
+    # corpo com o content-type certo, mas mal formado (ex: contagens com tamanho errado): status 400
+    pass
+
+
+def decodificar_corpo(tipo, corpo, aceita_contagens=False):
+    """
+    decodifica o corpo de uma requisicao conforme o content-type.
+
+    args:
+        tipo: content-type sem parametros (ex: "application/msgpack")
+        corpo: bytes do corpo
+        aceita_contagens: se a rota aceita a matriz de contagens empacotada
+
+    returns:
+        dados no mesmo formato do json; a matriz de contagens vem como {"alunos": np.ndarray (N, 6)}
+    """
+    if tipo in TIPOS_MSGPACK:
+        try:
+            import msgpack
+        except ImportError:
+            raise FormatoNaoSuportado("MessagePack indisponível no servidor (pip install msgpack)")
+        try:
+            dados = msgpack.unpackb(corpo, raw=False)
+        except (ValueError, TypeError) as e:
+            # ExtraData, FormatError, StackError e os demais erros do msgpack derivam de ValueError;
+            # TypeError vem de chaves invalidas (ex: lista como chave de um mapa)
+            raise CorpoInvalido(f"MessagePack inválido: {e}")
+        return colunas_empacotadas(dados)
+
+    if tipo == TIPO_CONTAGENS:
+        if not aceita_contagens:
+            raise FormatoNaoSuportado(f"{TIPO_CONTAGENS} só é aceito em /tutor/lote e /gestor/lote")
+        largura = 4 * len(CAMPOS_TUTOR)
+        if len(corpo) % largura:
+            raise CorpoInvalido(f"o corpo deve ter {len(CAMPOS_TUTOR)} inteiros de 32 bits por aluno")
+        return {"alunos": np.frombuffer(corpo, dtype="<i4").reshape(-1, len(CAMPOS_TUTOR))}
+
+    # qualquer outro tipo e tratado como json, como antes
+    try:
+        return app.json.loads(corpo) if corpo else None
+    except ValueError as e:
+        raise CorpoInvalido(f"JSON inválido: {e}")
+
+
+def colunas_empacotadas(dados):
+    """
+    no messagepack, cada coluna do formato colunar do tutor/gestor pode vir como bin com
+    inteiros de 32 bits little-endian (ex: np.asarray(coluna, "<i4").tobytes()); essas colunas
+    viram arrays do numpy sem passar por uma lista (nem por um dicionario) por aluno.
+    """
+    colunar = dados.get("alunos", dados) if isinstance(dados, dict) else None
+    if not isinstance(colunar, dict) or not all(isinstance(colunar.get(campo), bytes) for campo in CAMPOS_TUTOR):
+        return dados
+    if any(len(colunar[campo]) % 4 for campo in CAMPOS_TUTOR):
+        raise CorpoInvalido("as colunas empacotadas devem ter inteiros de 32 bits")
+    for campo in CAMPOS_TUTOR:
+        colunar[campo] = np.frombuffer(colunar[campo], dtype="<i4")
+    return dados
+
+
+def ler_corpo(aceita_contagens=False):
+    # corpo da requisicao flask; o json continua passando pelo request.get_json, como antes
+    if request.mimetype in TIPOS_MSGPACK or request.mimetype == TIPO_CONTAGENS:
+        return decodificar_corpo(request.mimetype, request.get_data(), aceita_contagens)
+    return request.get_json()
+
+
+def ler_opcoes_partes(*fontes, alunos=1):
+    """
+    le "total_partes" e "formato_partes" da primeira fonte (corpo, query string) que os tiver.
+    alunos e o tamanho do lote, usado no limite de MAXIMO_PARTES_LOTE.
+
+    returns:
+        tuple: (total_partes, formato); ValueError se algum valor for invalido
+    """
+    total_partes = next((fonte["total_partes"] for fonte in fontes if "total_partes" in fonte), 3)
+    formato = next((fonte["formato_partes"] for fonte in fontes if "formato_partes" in fonte), "partes")
 
-            # armazena media por tipo de conteudo
-            result["media_por_conteudo"][content_type] = round(accuracy_rate, 2)
+    if isinstance(total_partes, str) and total_partes.isdigit():
+        total_partes = int(total_partes)
+    if type(total_partes) is not int or not 1 <= total_partes <= MAXIMO_PARTES:
+        raise ValueError(f"total_partes deve ser um inteiro entre 1 e {MAXIMO_PARTES}")
+    if formato not in FORMATOS_PARTES:
+        raise ValueError(f"formato_partes deve ser um de: {', '.join(FORMATOS_PARTES)}")
+    if formato == "partes" and total_partes > MAXIMO_PARTES_NUMERADAS:
+        raise ValueError(
+            f"no formato partes, total_partes deve ser no máximo {MAXIMO_PARTES_NUMERADAS} (use contagens, rle ou intercalado)"
+        )
+    if formato in FORMATOS_EXPANDIDOS and total_partes * alunos > MAXIMO_PARTES_LOTE:
+        raise ValueError(
+            f"no formato {formato}, alunos x total_partes deve ser no máximo {MAXIMO_PARTES_LOTE} "
+            "(divida o lote ou use contagens ou rle)"
+        )
+    return total_partes, formato
 
-            # calcula graus de pertinencia fuzzy
-            low_degree = fuzz.interp_membership(accuracy_universe, low_ezness, accuracy_rate)
-            high_degree = fuzz.interp_membership(accuracy_universe, high_ezness, accuracy_rate)
 
-            # identifica facilidades e dificuldades com base nos graus de pertinencia
-            if round(high_degree, 2) >= 0.5:
-                result["facilidades"].append({"tipo_conteudo": content_type, "grau_facilidade": round(high_degree, 2)})
-            if round(low_degree, 2) >= 0.29:
-                result["dificuldades"].append({"tipo_conteudo": content_type, "grau_dificuldade": round(low_degree, 2)})
-                result["ajuda"] = True
+def numero_alunos(dados):
+    # tamanho de um lote do tutor ou do gestor: lista de registros, matriz ou dicionario colunar
+    if isinstance(dados, dict):
+        return len(dados.get(CAMPOS_TUTOR[0], ()))
+    return len(dados)
 
-            # acumula para media geral
-            total_correct += correct
-            total_questions += total
 
-        # calcula media geral
-        result["media"] = round((total_correct / total_questions * 100), 2) if total_questions > 0 else 0.0
+### validacao e resposta das rotas dos agentes ###
+# usadas tanto pelas rotas flask (WSGI) quanto pelo servidor assincrono (ASGI);
+# devolvem o corpo da resposta e o status HTTP.
+def processar_tutor(data):
+    if not data:
+        return {"error": "Dados inválidos no request POST"}, 400
 
-        # determina desempenho geral
-        if result["media"] >= 90:
-            result["desempenho"] = "muito alto"
-        elif result["media"] >= 80:
-            result["desempenho"] = "alto"
-        elif result["media"] >= 70:
-            result["desempenho"] = "medio"
-        elif result["media"] >= 50:
-            result["desempenho"] = "baixo"
-        else:
-            result["desempenho"] = "muito baixo"
+    try:
+        total_partes, formato = ler_opcoes_partes(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
 
-        return result
+    # apenas o id do aluno: usa as contagens acumuladas pelo avaliador
+    if "id_aluno" in data and CAMPOS_TUTOR[0] not in data:
+        data = ESTADO.obter(data["id_aluno"])
+        if data is None:
+            return {"error": "Aluno sem avaliações registradas"}, 404
 
+    # corpo sem as contagens e erro do cliente (e nunca recebe 304)
+    faltando = [campo for campo in CAMPOS_TUTOR if campo not in data]
+    if faltando:
+        return {"error": f"Campos ausentes: {', '.join(faltando)}"}, 400
 
-############## API que comanda o sistema multiagente ##############
-# autor: fabio melo martins | matricula: 2122130014
+    # Calcula as métricas com a instância compartilhada do agente
+    report = TUTOR.process(data, total_partes, formato)
+    if not report:
+        return {"error": "Falha ao calcular métricas"}, 500
+    if "erro" in report:
+        return {"error": f"Falha ao calcular métricas: {report['erro']}"}, 500
+
+    # Retorna o relatório como resposta ao cliente
+    return report, 200
+
+
+def processar_avaliador(data):
+    if not data or ("questoes" not in data and "respostas" not in data):
+        return {"error": "Dados inválidos no request POST"}, 400
+    # prova registrada: lida uma unica vez aqui e repassada ao avaliador
+    prova = None
+    if "respostas" in data and "gabarito" not in data:
+        prova = PROVAS.obter(data.get("id_prova"))
+        if prova is None:
+            return {"error": f"Prova não registrada: {data.get('id_prova')}"}, 404
+
+    # Calcula as métricas com a instância compartilhada do agente
+    report = AVALIADOR.process(data, prova)
+    if not report:
+        return {"error": "Falha ao calcular métricas"}, 500
+    if "erro" in report:
+        return {"error": f"Falha ao calcular métricas: {report['erro']}"}, 500
+
+    # Acumula o resultado no estado do aluno, se informado
+    registrar_avaliacao(report, data)
+
+    # Retorna o relatório como resposta ao cliente
+    return report, 200
+
+
+def processar_gestor(data):
+    # apenas o id do aluno: usa as contagens acumuladas pelo avaliador
+    if data and "id_aluno" in data and "dados" not in data:
+        contagens = ESTADO.obter(data["id_aluno"])
+        if contagens is None:
+            return {"error": "Aluno sem avaliações registradas"}, 404
+        data = {"dados": {
+            tipo: {"acertos": contagens[f"nu_acertos_{tipo}"], "erros": contagens[f"nu_erros_{tipo}"]}
+            for tipo in ["imagem", "video", "texto"]
+        }}
+
+    if not data or "dados" not in data:
+        return {"error": "Dados inválidos no request POST"}, 400
+
+    # Calcula as métricas com a instância compartilhada do agente
+    report = GESTOR.process(data)
+    if not report:
+        return {"error": "Falha ao calcular métricas"}, 500
+
+    # Retorna o relatório como resposta ao cliente
+    return report, 200
+
+
+### respostas com ETag ###
+# o /tutor e o /gestor sao funcoes puras do corpo: cada resposta e identificada pelo hash da rota,
+# da versao das regras e do corpo canonico (ETag). paineis que repetem a mesma consulta recebem 304
+# quando enviam If-None-Match, e os bytes ja serializados ficam guardados para as demais repeticoes.
+# o 304 so sai para um ETag de uma resposta 200 ao mesmo corpo: guardada, ou recalculada na hora.
+# configuracao (variaveis de ambiente):
+#   AGENTS_ETAG_TAMANHO: respostas guardadas (0 desliga o armazenamento, mas mantem ETag e 304)
+#   AGENTS_ETAG_MAX_BYTES: respostas maiores que isto nao sao guardadas
+#   AGENTS_ETAG_TOTAL_BYTES: total de bytes das respostas guardadas em cada processo
+class CacheRespostas(CacheResultados):
+    """
+    CacheResultados de respostas ja serializadas (bytes), limitado tambem pelo total de bytes:
+    ao passar de qualquer um dos limites, as respostas usadas ha mais tempo sao descartadas.
+    """
+
+    def __init__(self, tamanho_maximo, maximo_bytes):
+        super().__init__(tamanho_maximo)
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+
+    def guardar_local(self, chave, resultado):
+        with self.lock:
+            anterior = self.itens.pop(chave, None)
+            if anterior is not None:
+                self.bytes -= len(anterior)
+            self.itens[chave] = resultado
+            self.bytes += len(resultado)
+            while self.itens and (len(self.itens) > self.tamanho_maximo or self.bytes > self.maximo_bytes):
+                self.bytes -= len(self.itens.popitem(last=False)[1])
+
+    def estatisticas(self):
+        estatisticas = super().estatisticas()
+        with self.lock:
+            estatisticas["bytes"] = self.bytes
+            estatisticas["maximo_bytes"] = self.maximo_bytes
+        return estatisticas
+
+
+ROTAS_ETAG = {"/tutor", "/gestor"}
+RESPOSTAS_ETAG = CacheRespostas(
+    int(os.environ.get("AGENTS_ETAG_TAMANHO", 4096)),
+    int(os.environ.get("AGENTS_ETAG_TOTAL_BYTES", 16 * 2 ** 20))
+)
+MAXIMO_BYTES_ETAG = int(os.environ.get("AGENTS_ETAG_MAX_BYTES", 65536))
+
+
+def etag_requisicao(rota, data):
+    """
+    ETag da resposta a um corpo: hash da rota, da versao das regras e do corpo canonico
+    (chaves ordenadas, sem espacos), de modo que corpos equivalentes tem o mesmo ETag em qualquer processo.
+
+    returns:
+        str: ETag entre aspas, ou None para corpos que dependem do estado acumulado (id_aluno)
+             ou que nao sao json puro
+    """
+    if not isinstance(data, dict) or "id_aluno" in data:
+        return None
+    try:
+        canonico = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, allow_nan=False)
+    except (TypeError, ValueError):
+        return None
+    resumo = hashlib.blake2b(f"{rota}\0{VERSAO_REGRAS}\0{canonico}".encode(), digest_size=16)
+    return f'"{resumo.hexdigest()}"'
+
+
+def etag_confere(if_none_match, etag):
+    # If-None-Match: lista de ETags separadas por virgula (comparacao fraca, ignora o W/).
+    # "*" nao conta: estas rotas sao calculos sobre o corpo e nao ha um recurso que ja exista
+    if not if_none_match:
+        return False
+    return any(item.strip().removeprefix("W/") == etag for item in if_none_match.split(","))
+
+
+def executar_com_etag(caminho, processar, data, if_none_match):
+    """
+    executa a rota de um agente com ETag (apenas nas rotas de ROTAS_ETAG).
+
+    args:
+        caminho: caminho da rota
+        processar: funcao de validacao e resposta da rota (ex: processar_tutor)
+        data: corpo decodificado
+        if_none_match: valor do cabecalho If-None-Match (ou None)
+
+    returns:
+        tuple: (status, corpo, etag); o corpo e o dicionario da resposta quando nao ha ETag,
+               os bytes json compactos quando ha, e None no 304
+    """
+    etag = etag_requisicao(caminho, data) if caminho in ROTAS_ETAG else None
+    if etag is None:
+        body, status = processar(data)
+        return status, body, None
+
+    # resposta guardada: o corpo ja foi validado e respondido com 200 antes
+    corpo = RESPOSTAS_ETAG.obter(etag)
+    if corpo is None:
+        body, status = processar(data)
+        if status != 200:
+            return status, body, None
+        corpo = app.json.codificar(body)
+        if len(corpo) <= MAXIMO_BYTES_ETAG:
+            RESPOSTAS_ETAG.guardar(etag, corpo)
+
+    # o cliente ja tem esta resposta
+    if etag_confere(if_none_match, etag):
+        return 304, None, etag
+    return 200, corpo, etag
+
+
+def responder_com_etag(processar, data):
+    # versao flask de executar_com_etag (mesmo corpo do jsonify fora do modo debug)
+    status, corpo, etag = executar_com_etag(request.path, processar, data, request.headers.get("If-None-Match"))
+    if etag is None:
+        return jsonify(corpo), status
+    return Response(corpo + b"\n" if corpo is not None else b"", status, mimetype=app.json.mimetype, headers={"ETag": etag})
 
-# configuracao do servidor flask
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}}) 
 
 ### endpoint de entrada do tutor ###
 @app.route('/tutor', methods=['POST'])
@@ -497,30 +3104,82 @@ def call_tutor():
             "nu_acertos_video": 8,
             "nu_erros_video": 12
         }
+        Opcionais: "total_partes" (padrão 3) e "formato_partes":
+            "partes" (padrão): {"parte1": "texto", "parte2": "imagem", ...}
+            "contagens": {"texto": 5, "imagem": 3, "video": 2}
+            "rle": [["texto", 5], ["imagem", 3], ["video", 2]] (blocos em ordem de preferência)
+            "intercalado": [["texto", 1], ["imagem", 1], ["texto", 1], ...] (métodos espalhados)
+        Fora do padrão (3 partes no formato "partes"), as partes são repartidas pelo método dos
+        maiores restos; o formato "partes" aceita no máximo 100 partes.
+        """
+        return responder_com_etag(processar_tutor, ler_corpo())
+
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
+
+    except Exception as e:
+        LOGS.erro(request.path, e)
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+
+### endpoint de entrada do tutor em lote ###
+@app.route('/tutor/lote', methods=['POST'])
+def call_tutor_lote():
+    # Processa requisição POST com dados de vários alunos e retorna um relatório por aluno. #
+    try:
+        # Obtém os dados do request POST
+        """ Formato (lista):
+        {
+            "alunos": [
+                {"nu_acertos_texto": 25, "nu_erros_texto": 5, "nu_acertos_imagem": 10,
+                 "nu_erros_imagem": 10, "nu_acertos_video": 8, "nu_erros_video": 12},
+                ...
+            ]
+        }
+        Formato (colunar):
+        {
+            "nu_acertos_texto": [25, 3, ...],
+            "nu_erros_texto": [5, 0, ...],
+            ...
+        }
+        Também aceita Content-Type: application/msgpack (mesma estrutura) e
+        application/x-agents-contagens: inteiros de 32 bits little-endian, 6 por aluno
+        na ordem dos campos acima (ex: np.asarray(matriz, "<i4").tobytes()).
+        "total_partes" e "formato_partes" funcionam como no /tutor, no corpo ou na
+        query string (ex: /tutor/lote?total_partes=200&formato_partes=contagens).
         """
-        data = request.get_json()
+        data = ler_corpo(aceita_contagens=True)
         if not data:
             return jsonify({"error": "Dados inválidos no request POST"}), 400
 
-        # Inicializa o agente
-        agent = TutorAgent()
+        opcoes = data if isinstance(data, dict) else {}
+        if isinstance(data, dict) and "alunos" in data:
+            data = data["alunos"]
+
+        try:
+            total_partes, formato = ler_opcoes_partes(opcoes, request.args, alunos=numero_alunos(data))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Calcula as métricas de todos os alunos
+        reports = TUTOR.calculate_metrics_lote(data, total_partes, formato, em_pedacos=True)
+        if isinstance(reports, dict) and "erro" in reports:
+            return jsonify({"error": f"Falha ao calcular métricas: {reports['erro']}"}), 500
 
-        # Define os dados recebidos e processa
-        if not agent.set_data(data):
-            return jsonify({"error": "Falha ao definir os dados recebidos"}), 500
+        # Retorna os relatórios na mesma ordem de entrada, pedaço a pedaço
+        return resposta_lote(reports), 200
 
-        # Calcula as métricas
-        report = agent.calculate_metrics()
-        if not report:
-            return jsonify({"error": "Falha ao calcular métricas"}), 500
-        if "erro" in report:
-            return jsonify({"error": f"Falha ao calcular métricas: {report['erro']}"}), 500
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Retorna o relatório como resposta ao cliente
-        return jsonify(report), 200
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
 
     except Exception as e:
-        print(f"Erro ao processar requisição: {e}")
+        LOGS.erro(request.path, e)
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
 
@@ -545,31 +3204,257 @@ def call_evaluator():
                 {"tipo": "video", "resposta_correta": "J", "resposta_aluno": "X"}
             ]
         }
+        Formato (prova registrada em /avaliador/provas):
+        {
+            "id_prova": "prova1",
+            "respostas": ["A", "B", "C", "D", "E", "F", "G", "X", "X", "X"]
+        }
+        Formato (colunar; "tipos" também aceita índices 0, 1 e 2):
+        {
+            "tipos": ["texto", "texto", "imagem", "video"],
+            "gabarito": ["A", "B", "D", "F"],
+            "respostas": ["A", "B", "D", "X"]
+        }
+        Também aceita Content-Type: application/msgpack, com a mesma estrutura.
+        Com "id_aluno", o resultado é somado às contagens acumuladas do aluno,
+        que podem ser usadas depois em /tutor e /gestor com {"id_aluno": "123"}.
         """
-        
-        data = request.get_json()
-        if not data or "questoes" not in data:
+        body, status = processar_avaliador(ler_corpo())
+        return jsonify(body), status
+
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
+
+    except Exception as e:
+        LOGS.erro(request.path, e)
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+
+### endpoint de entrada do avaliador em lote ###
+@app.route('/avaliador/lote', methods=['POST'])
+def call_evaluator_lote():
+    # Processa requisição POST com as respostas de vários alunos para a mesma prova. #
+    try:
+        # Obtém os dados do request POST
+        """ Formato:
+        {
+            "questoes": [
+                {"tipo": "texto", "resposta_correta": "A"},
+                {"tipo": "imagem", "resposta_correta": "B"},
+                {"tipo": "video", "resposta_correta": "C"}
+            ],
+            "alunos": [
+                {"id_aluno": "123", "respostas": ["A", "B", "X"]},
+                ["a", "X", "X"]
+            ]
+        }
+        Formato (prova registrada em /avaliador/provas):
+        {
+            "id_prova": "prova1",
+            "alunos": [["A", "B", "X"], ["a", "X", "X"]]
+        }
+        Formato (colunar): "tipos" e "gabarito" no lugar de "questoes", como em /avaliador.
+        Também aceita Content-Type: application/msgpack, com a mesma estrutura.
+        """
+        data = ler_corpo()
+        if not data or ("questoes" not in data and "gabarito" not in data and "id_prova" not in data) or "alunos" not in data:
+            return jsonify({"error": "Dados inválidos no request POST"}), 400
+        prova = PROVAS.obter(data["id_prova"]) if "id_prova" in data else None
+        if "id_prova" in data and prova is None:
+            return jsonify({"error": f"Prova não registrada: {data['id_prova']}"}), 404
+
+        # Corrige as respostas de todos os alunos
+        reports = AVALIADOR.calculate_metrics_lote(data, em_pedacos=True, prova=prova)
+        if isinstance(reports, dict) and "erro" in reports:
+            return jsonify({"error": f"Falha ao calcular métricas: {reports['erro']}"}), 500
+
+        # Acumula os resultados no estado dos alunos identificados, a cada pedaço pronto
+        def registrar(pedacos):
+            alunos = iter(data["alunos"])
+            for pedaco in pedacos:
+                for i, (report, aluno) in enumerate(zip(pedaco, alunos)):
+                    submissao = {"id_turma": data.get("id_turma"), "id_prova": data.get("id_prova")}
+                    if isinstance(aluno, dict):
+                        submissao.update(aluno)
+                    try:
+                        registrar_avaliacao(report, submissao)
+                    except Exception as e:
+                        # a resposta pode ja estar sendo enviada: o aluno recebe um registro de erro e o lote segue
+                        LOGS.erro(request.path, e)
+                        erro = {"erro": f"falha ao registrar a avaliacao: {e}"}
+                        pedaco[i] = {"id_aluno": report["id_aluno"], **erro} if "id_aluno" in report else erro
+                yield pedaco
+
+        # Retorna os relatórios na mesma ordem de entrada, pedaço a pedaço
+        return resposta_lote(registrar(reports)), 200
+
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
+
+    except Exception as e:
+        LOGS.erro(request.path, e)
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+
+### endpoint de entrada do avaliador em streaming (NDJSON) ###
+def corrigir_stream(linhas):
+    """
+    le linhas NDJSON e devolve (gerador) uma linha de resultado por aluno assim que ele termina.
+    as linhas podem ser:
+        - um aluno completo, no formato do /avaliador ({"questoes": [...]} ou {"id_prova", "respostas"});
+        - o inicio de um aluno, {"id_aluno": "123"} (com "id_prova" para usar um gabarito registrado
+          e "id_turma" para a agregacao da turma), seguido de uma linha por questao e,
+          opcionalmente, de {"fim_aluno": true}.
+    a resposta ja foi enviada com status 200, entao nenhuma linha interrompe o stream: linhas
+    invalidas e alunos que falham viram linhas {"erro": ...} e a leitura continua.
+    """
+    aluno = None  # {"cabecalho": linha de inicio do aluno, "correcao": CorrecaoIncremental, "erro": ...}
+
+    def finalizar(aluno):
+        cabecalho = aluno["cabecalho"]
+        try:
+            resultado = {"erro": aluno["erro"]} if aluno["erro"] else aluno["correcao"].resultado()
+            registrar_avaliacao(resultado, cabecalho)
+        except Exception as e:
+            resultado = {"erro": str(e)}
+        if "id_aluno" in cabecalho:
+            resultado = {"id_aluno": cabecalho["id_aluno"], **resultado}
+        return app.json.codificar(resultado) + b"\n"
+
+    def corrigir_completo(item):
+        try:
+            # mesma validacao do /avaliador
+            precisa_prova = "respostas" in item and "gabarito" not in item
+            prova = PROVAS.obter(item.get("id_prova")) if precisa_prova else None
+            if precisa_prova and prova is None:
+                resultado = {"erro": f"prova nao registrada: {item.get('id_prova')}"}
+            else:
+                resultado = AVALIADOR.process(item, prova) or {"erro": "nenhuma questao encontrada no json"}
+                registrar_avaliacao(resultado, item)
+        except Exception as e:
+            resultado = {"erro": str(e)}
+        if "id_aluno" in item:
+            resultado = {"id_aluno": item["id_aluno"], **resultado}
+        return app.json.codificar(resultado) + b"\n"
+
+    for numero, linha in enumerate(linhas, 1):
+        if not linha.strip():
+            continue
+        try:
+            item = app.json.loads(linha)
+        except ValueError:
+            yield app.json.codificar({"erro": f"json invalido na linha {numero}"}) + b"\n"
+            continue
+        if not isinstance(item, dict):
+            yield app.json.codificar({"erro": f"a linha {numero} deve ser um objeto json"}) + b"\n"
+            continue
+
+        # aluno completo em uma linha
+        if "questoes" in item or "respostas" in item:
+            if aluno is not None:
+                yield finalizar(aluno)
+                aluno = None
+            yield corrigir_completo(item)
+            continue
+
+        # inicio de um novo aluno
+        if "id_aluno" in item and "resposta_aluno" not in item:
+            if aluno is not None:
+                yield finalizar(aluno)
+            prova, erro = None, None
+            if "id_prova" in item:
+                try:
+                    prova = PROVAS.obter(item["id_prova"])
+                except TypeError:
+                    prova = None
+                if prova is None:
+                    erro = f"prova nao registrada: {item['id_prova']}"
+            aluno = {"cabecalho": item, "correcao": CorrecaoIncremental(prova), "erro": erro}
+            continue
+
+        # fim explicito do aluno atual
+        if item.get("fim_aluno"):
+            if aluno is not None:
+                yield finalizar(aluno)
+                aluno = None
+            continue
+
+        # questao do aluno atual (questoes sem cabecalho formam um aluno anonimo)
+        if aluno is None:
+            aluno = {"cabecalho": {}, "correcao": CorrecaoIncremental(), "erro": None}
+        if aluno["erro"] is None:
+            try:
+                aluno["correcao"].adicionar(item)
+            except Exception as e:
+                aluno["erro"] = str(e)
+
+    if aluno is not None:
+        yield finalizar(aluno)
+
+
+@app.route('/avaliador/stream', methods=['POST'])
+def call_evaluator_stream():
+    # Corrige as respostas enviadas como NDJSON, linha a linha, sem carregar o corpo inteiro. #
+    """ Formato (uma linha JSON por vez):
+    {"id_aluno": "123", "id_prova": "prova1"}
+    {"resposta_aluno": "A"}
+    {"resposta_aluno": "B"}
+    {"fim_aluno": true}
+    {"id_aluno": "456"}
+    {"tipo": "texto", "resposta_correta": "A", "resposta_aluno": "A"}
+    {"id_aluno": "789", "questoes": [{"tipo": "video", "resposta_correta": "C", "resposta_aluno": "C"}]}
+    """
+    return Response(stream_with_context(corrigir_stream(request.stream)), mimetype="application/x-ndjson")
+
+
+### endpoint de registro de provas ###
+@app.route('/avaliador/provas', methods=['POST'])
+def register_exam():
+    # Registra o gabarito de uma prova para que os alunos enviem apenas as respostas. #
+    try:
+        # Obtém os dados do request POST
+        """ Formato:
+        {
+            "id_prova": "prova1",
+            "questoes": [
+                {"tipo": "texto", "resposta_correta": "A"},
+                {"tipo": "imagem", "resposta_correta": "B"},
+                {"tipo": "video", "resposta_correta": "C"}
+            ]
+        }
+        ou colunar: {"id_prova": "prova1", "tipos": ["texto", "imagem", "video"], "gabarito": ["A", "B", "C"]}
+        Com AGENTS_ESTADO_DB a prova fica gravada no banco e vale para todos os workers;
+        sem ele, cada processo tem o seu registro.
+        """
+        data = ler_corpo()
+        if not data or "id_prova" not in data or not (data.get("questoes") or "gabarito" in data):
             return jsonify({"error": "Dados inválidos no request POST"}), 400
 
-        # Inicializa o agente
-        agent = EvaluatorAgent()
+        # Valida e compacta o gabarito uma única vez
+        if "gabarito" in data:
+            prova = AVALIADOR.preparar_prova_colunar(data.get("tipos", []), data["gabarito"])
+        else:
+            prova = AVALIADOR.preparar_prova(data["questoes"])
+        if isinstance(prova, dict):
+            return jsonify({"error": f"Prova inválida: {prova['erro']}"}), 400
 
-        # Define os dados recebidos e processa
-        if not agent.set_data(data):
-            return jsonify({"error": "Falha ao definir os dados recebidos"}), 500
+        PROVAS.registrar(data["id_prova"], prova)
+        return jsonify({"id_prova": data["id_prova"], "total_questoes": len(prova.tipos)}), 201
 
-        # Calcula as métricas
-        report = agent.calculate_metrics()
-        if not report:
-            return jsonify({"error": "Falha ao calcular métricas"}), 500
-        if "erro" in report:
-            return jsonify({"error": f"Falha ao calcular métricas: {report['erro']}"}), 500
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Retorna o relatório como resposta ao cliente
-        return jsonify(report), 200
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
 
     except Exception as e:
-        print(f"Erro ao processar requisição: {e}")
+        LOGS.erro(request.path, e)
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
 
@@ -588,30 +3473,524 @@ def call_manager():
             }
         }
         """
-        data = request.get_json()
-        if not data or "dados" not in data:
+        return responder_com_etag(processar_gestor, ler_corpo())
+
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
+
+    except Exception as e:
+        LOGS.erro(request.path, e)
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+
+### endpoint de entrada do gestor em lote ###
+@app.route('/gestor/lote', methods=['POST'])
+def call_manager_lote():
+    # Processa requisição POST com dados de vários alunos e retorna um relatório por aluno. #
+    try:
+        # Obtém os dados do request POST
+        """ Formato:
+        {
+            "alunos": [
+                {"imagem": {"acertos": 90, "erros": 10}, "video": {"acertos": 80, "erros": 20},
+                 "texto": {"acertos": 75, "erros": 25}},
+                ...
+            ]
+        }
+        ou colunar, com os mesmos campos do /tutor/lote ("nu_acertos_texto": [...], ...)
+        Também aceita application/msgpack e application/x-agents-contagens, como o /tutor/lote.
+        """
+        data = ler_corpo(aceita_contagens=True)
+        if not data:
+            return jsonify({"error": "Dados inválidos no request POST"}), 400
+        if isinstance(data, dict) and "alunos" in data:
+            data = data["alunos"]
+
+        # Calcula as métricas de todos os alunos
+        reports = GESTOR.process_lote(data, em_pedacos=True)
+        if isinstance(reports, dict) and "erro" in reports:
+            return jsonify({"error": f"Falha ao calcular métricas: {reports['erro']}"}), 500
+
+        # Retorna os relatórios na mesma ordem de entrada, pedaço a pedaço
+        return resposta_lote(reports), 200
+
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
+
+    except Exception as e:
+        LOGS.erro(request.path, e)
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+
+### endpoint de consulta das turmas ###
+@app.route('/gestor/turma', methods=['GET'])
+def call_manager_turma():
+    # Retorna o resumo de uma ou mais turmas (?id_turma=a&id_turma=b) ou da escola inteira (sem parâmetros). #
+    try:
+        return jsonify(TURMAS.consultar(request.args.getlist("id_turma"))), 200
+    except Exception as e:
+        LOGS.erro(request.path, e)
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+
+### endpoint de consulta do historico ###
+@app.route('/historico', methods=['GET'])
+def call_history():
+    # Retorna as avaliações de um aluno e o relatório do gestor sobre o período (?id_aluno=&desde=&ate=). #
+    try:
+        if HISTORICO is None:
+            return jsonify({"error": "Histórico desativado (defina AGENTS_HISTORICO_DIR)"}), 503
+        id_aluno = request.args.get("id_aluno")
+        if id_aluno is None:
+            return jsonify({"error": "Informe o id_aluno"}), 400
+        desde = request.args.get("desde", type=float)
+        ate = request.args.get("ate", type=float)
+
+        dados = HISTORICO.consultar_aluno(id_aluno, ["prova", "acertos", "erros", "nota", "aprovado", "timestamp"], desde, ate)
+        avaliacoes = []
+        for prova, acertos, erros, nota, aprovado, instante in zip(*(dados[nome].tolist() for nome in dados)):
+            avaliacoes.append({
+                "id_prova": HISTORICO.provas[prova] if prova >= 0 else None,
+                "acertos": dict(zip(TIPOS_CONTEUDO, acertos)),
+                "erros": dict(zip(TIPOS_CONTEUDO, erros)),
+                "nota": nota,
+                "aprovado": bool(aprovado),
+                "timestamp": instante
+            })
+
+        return jsonify({
+            "id_aluno": id_aluno,
+            "avaliacoes": avaliacoes,
+            "gestor": relatorio_de_contagens(HISTORICO.contagens_aluno(id_aluno, desde, ate))
+        }), 200
+    except Exception as e:
+        LOGS.erro(request.path, e)
+        return jsonify({"error": f"Erro interno: {str(e)}"}), 500
+
+
+### endpoint do pipeline completo (avaliador -> tutor -> gestor) ###
+@app.route('/pipeline', methods=['POST'])
+def call_pipeline():
+    # Executa os três agentes sobre um mesmo quadro negro, calculando cada grandeza uma única vez. #
+    try:
+        # Obtém os dados do request POST (mesmo formato do /avaliador)
+        data = ler_corpo()
+        if not data or ("questoes" not in data and "respostas" not in data):
             return jsonify({"error": "Dados inválidos no request POST"}), 400
+        prova = None
+        if "respostas" in data and "gabarito" not in data:
+            prova = PROVAS.obter(data.get("id_prova"))
+            if prova is None:
+                return jsonify({"error": f"Prova não registrada: {data.get('id_prova')}"}), 404
+
+        quadro = Blackboard(submissao=data)
+
+        # O avaliador corrige e escreve contagens e taxas (e aciona o tutor, se necessário)
+        avaliacao = AVALIADOR.processar_quadro(quadro, prova)
+        if "erro" in avaliacao:
+            return jsonify({"error": f"Falha ao calcular métricas: {avaliacao['erro']}"}), 500
+        registrar_avaliacao(avaliacao, data)
 
-        # Inicializa o agente
-        agent = ManagerAgent()
+        # O tutor e o gestor leem o que já está no quadro
+        if not quadro.tem("recomendacao"):
+            TUTOR.processar_quadro(quadro)
+        GESTOR.processar_quadro(quadro)
 
-        # Define os dados recebidos e processa
-        if not agent.set_data(data):
-            return jsonify({"error": "Falha ao definir os dados recebidos"}), 500
+        return jsonify({
+            "avaliacao": avaliacao,
+            "tutor": quadro.ler("recomendacao"),
+            "gestor": quadro.ler("relatorio")
+        }), 200
 
-        # Calcula as métricas
-        report = agent.calculate_metrics()
-        if not report:
-            return jsonify({"error": "Falha ao calcular métricas"}), 500
+    except CorpoInvalido as e:
+        return jsonify({"error": str(e)}), 400
 
-        # Retorna o relatório como resposta ao cliente
-        return jsonify(report), 200
+    except FormatoNaoSuportado as e:
+        return jsonify({"error": str(e)}), 415
 
     except Exception as e:
-        print(f"Erro ao processar requisição: {e}")
+        LOGS.erro(request.path, e)
         return jsonify({"error": f"Erro interno: {str(e)}"}), 500
 
 
+### metricas no formato do prometheus ###
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Retorna contadores e histogramas de latência das rotas e das etapas dos agentes. #
+    if METRICAS is None:
+        return jsonify({"error": "Métricas desativadas (AGENTS_METRICAS=0)"}), 503
+    return Response(
+        METRICAS.exportar({"tutor": CACHE_TUTOR, "gestor": CACHE_GESTOR, "respostas": RESPOSTAS_ETAG}),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+### estatisticas dos caches de resultados ###
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    # Retorna tamanho, hits e misses dos caches do tutor, do gestor e das respostas com ETag. #
+    return jsonify({
+        "tutor": CACHE_TUTOR.estatisticas(),
+        "gestor": CACHE_GESTOR.estatisticas(),
+        "respostas": RESPOSTAS_ETAG.estatisticas()
+    }), 200
+
+
+############## Servidor assincrono (ASGI) ##############
+class AsgiApp:
+    """
+    aplicacao ASGI nativa com as rotas /tutor, /avaliador e /gestor, com o mesmo contrato JSON
+    e o mesmo CORS (qualquer origem) das rotas flask.
+    o trabalho dos agentes usa CPU, entao roda em um pool de threads limitado e o loop de eventos
+    fica livre apenas para as conexoes; o numero de requisicoes esperando pelo pool tambem e limitado.
+
+    exemplo: uvicorn --app-dir . "agents-api:asgi_app"
+    """
+
+    ROTAS = {
+        "/tutor": processar_tutor,
+        "/avaliador": processar_avaliador,
+        "/gestor": processar_gestor
+    }
+    METODOS_CORS = "DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+    def __init__(self, threads=None, max_pendentes=None):
+        self.threads = threads or os.cpu_count() or 1
+        self.max_pendentes = max_pendentes or self.threads * 64
+        self.executor = ThreadPoolExecutor(self.threads, thread_name_prefix="agentes")
+        self.vagas = None  # semaforo criado no loop de eventos em uso
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        # preflight de CORS
+        if scope["method"] == "OPTIONS":
+            cabecalhos = [(b"access-control-allow-methods", self.METODOS_CORS.encode())]
+            for nome, valor in scope["headers"]:
+                if nome == b"access-control-request-headers":
+                    cabecalhos.append((b"access-control-allow-headers", valor))
+            await self.responder(send, 200, b"", cabecalhos)
+            return
+
+        rota = self.ROTAS.get(scope["path"])
+        if rota is None:
+            await self.responder(send, 404, self.serializar({"error": "Rota não encontrada"}))
+            return
+        if scope["method"] != "POST":
+            await self.responder(send, 405, self.serializar({"error": "Método não permitido"}))
+            return
+
+        inicio = time.perf_counter()
+        corpo = await self.ler_corpo(receive)
+        tipo = next((valor for nome, valor in scope["headers"] if nome == b"content-type"), b"")
+        tipo = tipo.split(b";")[0].strip().decode("latin-1").lower()
+        if_none_match = next((valor.decode("latin-1") for nome, valor in scope["headers"] if nome == b"if-none-match"), None)
+
+        # executa o agente fora do loop de eventos
+        if self.vagas is None:
+            self.vagas = asyncio.Semaphore(self.max_pendentes)
+        async with self.vagas:
+            loop = asyncio.get_running_loop()
+            status, resposta, cabecalhos = await loop.run_in_executor(
+                self.executor, self.executar, scope["path"], rota, tipo, corpo, if_none_match
+            )
+
+        duracao = time.perf_counter() - inicio
+        if METRICAS is not None:
+            METRICAS.observar_requisicao(scope["path"], "POST", status, duracao)
+        if LOGS.amostrar_acesso(scope["path"]):
+            LOGS.logger(scope["path"]).info(
+                "requisicao", extra={"campos": {"rota": scope["path"], "metodo": "POST", "status": status, "duracao_ms": round(duracao * 1000, 3)}}
+            )
+
+        await self.responder(send, status, resposta, cabecalhos)
+
+    def executar(self, caminho, rota, tipo, corpo, if_none_match=None):
+        # Decodifica o corpo, executa o agente e serializa a resposta (roda no pool de threads). #
+        etag = None
+        try:
+            data = decodificar_corpo(tipo, corpo)
+            if LOGS.amostrar_payload(caminho):
+                LOGS.logger(caminho).info("payload", extra={"campos": {"rota": caminho, "corpo": data}})
+            status, body, etag = executar_com_etag(caminho, rota, data, if_none_match)
+        except CorpoInvalido as e:
+            body, status = {"error": str(e)}, 400
+        except FormatoNaoSuportado as e:
+            body, status = {"error": str(e)}, 415
+        except Exception as e:
+            LOGS.erro(caminho, e)
+            body, status = {"error": f"Erro interno: {str(e)}"}, 500
+
+        if etag is None:
+            return status, self.serializar(body), []
+        cabecalhos = [(b"etag", etag.encode()), (b"access-control-expose-headers", b"ETag")]
+        return status, body if body is not None else b"", cabecalhos
+
+    @staticmethod
+    def serializar(body):
+        # mesmo JSON compacto das respostas do flask
+        return app.json.codificar(body)
+
+    @staticmethod
+    async def ler_corpo(receive):
+        partes = []
+        while True:
+            mensagem = await receive()
+            partes.append(mensagem.get("body", b""))
+            if not mensagem.get("more_body"):
+                return b"".join(partes)
+
+    @staticmethod
+    async def responder(send, status, corpo, cabecalhos=()):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"access-control-allow-origin", b"*"),
+                *cabecalhos
+            ]
+        })
+        await send({"type": "http.response.body", "body": corpo})
+
+    async def lifespan(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] == "lifespan.startup":
+                create_app()
+                await send({"type": "lifespan.startup.complete"})
+            elif mensagem["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+# aplicacao ASGI (threads do pool configuraveis pela variavel de ambiente AGENTS_ASGI_THREADS)
+asgi_app = AsgiApp(threads=int(os.environ.get("AGENTS_ASGI_THREADS", 0)) or None)
+
+
+############## Relatorio offline (linha de comando) ##############
+def contagens_validas(valores):
+    # as 6 contagens de uma linha como numeros finitos e nao negativos (ValueError com o motivo)
+    contagens = []
+    for campo, valor in zip(CAMPOS_TUTOR, valores):
+        try:
+            numero = float(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"{campo} nao numerico: {valor!r}")
+        if not np.isfinite(numero) or numero < 0:
+            raise ValueError(f"{campo} invalido: {valor!r}")
+        contagens.append(numero)
+    return contagens
+
+
+def ler_contagens_em_chunks(caminho, tamanho_chunk):
+    """
+    le um arquivo grande de contagens por aluno em pedacos, sem carrega-lo inteiro na memoria.
+
+    formatos aceitos (pela extensao):
+        .csv: cabecalho com as colunas de CAMPOS_TUTOR (e, opcionalmente, id_aluno)
+        .ndjson/.jsonl: um aluno por linha, no formato do /tutor ou do /gestor
+                        ({"texto": {"acertos": .., "erros": ..}, ...} ou {"dados": {...}})
+        .npy: matriz (N, 6) na ordem de CAMPOS_TUTOR
+        diretorio: um arquivo .npy por campo de CAMPOS_TUTOR (ex: nu_acertos_texto.npy)
+
+    yields:
+        tuple: (ids dos alunos ou None, matriz (n, 6) de contagens)
+    """
+    if os.path.isdir(caminho) or caminho.endswith(".npy"):
+        # os arquivos .npy sao mapeados em memoria e lidos um pedaco por vez
+        if os.path.isdir(caminho):
+            colunas = [np.load(os.path.join(caminho, f"{campo}.npy"), mmap_mode="r") for campo in CAMPOS_TUTOR]
+            total = len(colunas[0])
+            ler = lambda inicio, fim: np.column_stack([coluna[inicio:fim] for coluna in colunas])
+        else:
+            matriz = np.load(caminho, mmap_mode="r")
+            if matriz.ndim != 2 or matriz.shape[1] != len(CAMPOS_TUTOR):
+                raise ValueError(f"o arquivo .npy deve ter forma (N, {len(CAMPOS_TUTOR)})")
+            total = len(matriz)
+            ler = lambda inicio, fim: matriz[inicio:fim]
+        for inicio in range(0, total, tamanho_chunk):
+            yield None, np.asarray(ler(inicio, inicio + tamanho_chunk), dtype=float)
+        return
+
+    # linhas invalidas (celula vazia, valor nao numerico, json quebrado...) sao ignoradas e o numero
+    # da linha vai para a saida de erros; um csv sem as colunas esperadas falha antes de qualquer saida
+    def ler_ndjson(linha):
+        registro = json.loads(linha)
+        if CAMPOS_TUTOR[0] in registro:
+            return registro.get("id_aluno"), [registro[campo] for campo in CAMPOS_TUTOR]
+        performance = registro.get("dados", registro)
+        return registro.get("id_aluno"), [performance[tipo][campo] for tipo in TIPOS_CONTEUDO for campo in ["acertos", "erros"]]
+
+    with open(caminho, newline="", encoding="utf-8") as entrada:
+        if caminho.endswith(".csv"):
+            leitor = csv.DictReader(entrada)
+            faltando = [campo for campo in CAMPOS_TUTOR if campo not in (leitor.fieldnames or [])]
+            if faltando:
+                raise ValueError(f"colunas ausentes no csv: {', '.join(faltando)}")
+            registros = ((leitor.line_num, registro) for registro in leitor)
+            ler = lambda registro: (registro.get("id_aluno"), [registro[campo] for campo in CAMPOS_TUTOR])
+        else:
+            registros = ((numero, linha) for numero, linha in enumerate(entrada, 1) if linha.strip())
+            ler = ler_ndjson
+
+        ids, linhas = [], []
+        for numero, registro in registros:
+            try:
+                id_aluno, valores = ler(registro)
+                contagens = contagens_validas(valores)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"{caminho}:{numero}: linha ignorada ({e})", file=sys.stderr)
+                continue
+            ids.append(id_aluno)
+            linhas.append(contagens)
+            if len(linhas) == tamanho_chunk:
+                yield ids, np.array(linhas, dtype=float)
+                ids, linhas = [], []
+        if linhas:
+            yield ids, np.array(linhas, dtype=float)
+
+
+def gerar_relatorio_offline(caminho_entrada, saida, agentes=("tutor", "gestor"), tamanho_chunk=50000):
+    """
+    executa o tutor e/ou o gestor sobre um arquivo inteiro de contagens, sem passar pelo http,
+    e escreve um resultado por aluno (ndjson) a medida que cada pedaco e processado.
+    cada pedaco usa a inferencia vetorizada (e o pool de processos, se for grande o suficiente).
+
+    args:
+        caminho_entrada: arquivo de entrada (ver ler_contagens_em_chunks)
+        saida: arquivo de texto aberto para escrita
+        agentes: agentes a executar ("tutor", "gestor" ou ambos)
+        tamanho_chunk: alunos lidos e processados por vez
+
+    returns:
+        int: numero de alunos processados
+    """
+    total = 0
+    for ids, contagens in ler_contagens_em_chunks(caminho_entrada, tamanho_chunk):
+        resultados = {}
+        if "tutor" in agentes:
+            resultados["tutor"] = executar_em_lote(_recomendar_lote, contagens)
+        if "gestor" in agentes:
+            resultados["gestor"] = executar_em_lote(_analisar_lote, contagens)
+
+        linhas = []
+        for i in range(len(contagens)):
+            if len(agentes) == 1:
+                linha = dict(resultados[agentes[0]][i])
+            else:
+                linha = {agente: resultados[agente][i] for agente in agentes}
+            if ids is not None and ids[i] is not None:
+                linha["id_aluno"] = ids[i]
+            linhas.append(app.json.codificar(linha))
+        saida.write((b"\n".join(linhas) + b"\n").decode())
+        total += len(contagens)
+    return total
+
+
+############## Execucao ##############
+def create_app():
+    """
+    fabrica da aplicacao WSGI para servidores de producao.
+    aquece os agentes antes de devolver o app, para que com --preload (gunicorn) o motor fuzzy
+    e os caminhos de codigo ja estejam prontos no processo mestre e sejam herdados pelos workers.
+
+    exemplo: gunicorn -w 4 --threads 8 --preload "agents-api:create_app()"
+    """
+    TUTOR.recomendar({"texto": 0.5, "imagem": 0.5, "video": 0.5})
+    GESTOR.analisar({tipo: {"acertos": 1, "erros": 1} for tipo in TIPOS_CONTEUDO})
+    return app
+
+
+def servir_producao(host, port, workers, threads):
+    """
+    executa o servidor com varios processos e threads.
+    usa o gunicorn quando disponivel (pip install gunicorn); caso contrario, cai no servidor
+    do werkzeug, que aceita varias threads ou varios processos, mas nao os dois juntos.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is None:
+        LOGS.raiz.warning("gunicorn nao instalado; usando o servidor do werkzeug")
+        if workers > 1:
+            create_app().run(host=host, port=port, threaded=False, processes=workers)
+        else:
+            create_app().run(host=host, port=port, threaded=threads > 1)
+        return
+
+    class ServidorGunicorn(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("preload_app", True)
+
+        def load(self):
+            return create_app()
+
+    ServidorGunicorn().run()
+
+
 # Executa o servidor Flask
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="API do sistema multiagente (tutor, avaliador e gestor)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=0, help="processos de trabalho (modo de producao)")
+    parser.add_argument("--threads", type=int, default=0, help="threads por processo (modo de producao)")
+    parser.add_argument("--asgi", action="store_true", help="servidor assincrono com uvicorn (pip install uvicorn)")
+    comandos = parser.add_subparsers(dest="comando")
+    parser_relatorio = comandos.add_parser("relatorio", help="gera relatorios de um arquivo de contagens, sem o servidor")
+    parser_relatorio.add_argument("entrada", help="arquivo .csv, .ndjson ou .npy (ou diretorio com um .npy por campo)")
+    parser_relatorio.add_argument("saida", nargs="?", default="-", help="arquivo ndjson de saida (padrao: saida padrao)")
+    parser_relatorio.add_argument("--agentes", nargs="+", choices=["tutor", "gestor"], default=["tutor", "gestor"])
+    parser_relatorio.add_argument("--chunk", type=int, default=50000, help="alunos processados por vez")
+    args = parser.parse_args()
+
+    # os workers dividem as CPUs do host entre os seus pools (ver processos_lote_padrao)
+    if args.workers > 1:
+        os.environ.setdefault("AGENTS_WORKERS", str(args.workers))
+        if not int(os.environ.get("AGENTS_PROCESSOS", 0)):
+            PROCESSOS_LOTE = processos_lote_padrao()
+
+    if args.comando == "relatorio":
+        inicio = time.perf_counter()
+        if args.saida == "-":
+            total = gerar_relatorio_offline(args.entrada, sys.stdout, args.agentes, args.chunk)
+        else:
+            with open(args.saida, "w", encoding="utf-8") as saida:
+                total = gerar_relatorio_offline(args.entrada, saida, args.agentes, args.chunk)
+        print(f"{total} alunos processados em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+    elif args.asgi:
+        import uvicorn
+
+        # com varios workers o uvicorn precisa importar o app pelo nome do modulo
+        uvicorn.run(
+            "agents-api:asgi_app" if args.workers > 1 else asgi_app,
+            host=args.host,
+            port=args.port,
+            workers=max(args.workers, 1),
+            app_dir=os.path.dirname(os.path.abspath(__file__))
+        )
+    elif args.workers or args.threads:
+        servir_producao(args.host, args.port, max(args.workers, 1), max(args.threads, 1))
+    else:
+        # modo de desenvolvimento, como antes
+        app.run(host=args.host, port=args.port, debug=True)
@@ -0,0 +1,344 @@
+"""
+benchmarks dos agentes e dos endpoints da API do sistema multiagente.
+
+mede as funcoes principais de cada agente (com dados sinteticos gerados a partir de uma semente fixa)
+e a latencia/vazao dos endpoints pelo cliente de teste do flask, sem abrir portas.
+os caches de resultados e de respostas ficam desligados, para que as repeticoes medam sempre a
+inferencia; os casos marcados com [cache] ligam os caches e medem o caminho das consultas repetidas.
+os resultados podem ser salvos em json e comparados com uma execucao anterior (linha de base)
+para apontar regressoes.
+
+a lista inteira roda --rodadas vezes, de forma intercalada, e cada benchmark fica com a mediana
+entre as rodadas; a variacao entre elas (ruido) e guardada junto. na comparacao, uma piora so e
+regressao se passar da tolerancia e do ruido medido na linha de base e na execucao atual, ja que
+duas execucoes identicas chegam a diferir em dezenas de por cento em maquinas compartilhadas.
+
+exemplos:
+    python benchmark.py                                   # executa tudo e mostra a tabela
+    python benchmark.py --salvar base.json                # guarda a linha de base
+    python benchmark.py --comparar base.json              # compara (sai com codigo 1 se houver regressao)
+    python benchmark.py --rodadas 5 --salvar base.json    # mais rodadas, ruido menor
+    python benchmark.py --filtro avaliador --rapido       # apenas parte dos benchmarks, menos repeticoes
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# caches desligados antes de carregar o modulo (ver com_caches)
+os.environ["AGENTS_CACHE_TAMANHO"] = "0"
+os.environ["AGENTS_ETAG_TAMANHO"] = "0"
+
+
+def carregar_api():
+    # o modulo tem hifen no nome, entao e carregado pelo caminho do arquivo
+    caminho = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents-api.py")
+    spec = importlib.util.spec_from_file_location("agents_api", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+api = carregar_api()
+
+
+@contextmanager
+def com_caches(tamanho=10000):
+    # liga caches novos (vazios) durante um benchmark [cache] e volta a desliga-los no final
+    originais = api.CACHE_TUTOR, api.CACHE_GESTOR, api.RESPOSTAS_ETAG
+    api.CACHE_TUTOR, api.CACHE_GESTOR = api.CacheResultados(tamanho), api.CacheResultados(tamanho)
+    api.RESPOSTAS_ETAG = api.CacheRespostas(tamanho, 16 * 2 ** 20)
+    try:
+        yield
+    finally:
+        api.CACHE_TUTOR, api.CACHE_GESTOR, api.RESPOSTAS_ETAG = originais
+
+
+def em_cache(executar):
+    # benchmark executado com os caches ligados
+    def executar_com_caches():
+        with com_caches():
+            return executar()
+    return executar_com_caches
+
+
+############## Geradores de dados sinteticos ##############
+def gerar_contagens(rng, n, maximo=12):
+    # matriz (n, 6) de contagens na ordem de CAMPOS_TUTOR
+    return rng.integers(0, maximo, (n, len(api.CAMPOS_TUTOR)))
+
+
+def gerar_alunos_tutor(rng, n):
+    # registros no formato do /tutor
+    return [dict(zip(api.CAMPOS_TUTOR, linha)) for linha in gerar_contagens(rng, n).tolist()]
+
+
+def gerar_alunos_gestor(rng, n):
+    # registros no formato do /gestor
+    return [
+        {"dados": {tipo: {"acertos": linha[2 * i], "erros": linha[2 * i + 1]} for i, tipo in enumerate(api.TIPOS_CONTEUDO)}}
+        for linha in gerar_contagens(rng, n).tolist()
+    ]
+
+
+def gerar_prova(rng, n_questoes, taxa_acerto=0.7):
+    # submissao no formato do /avaliador, com a proporcao de acertos indicada
+    alternativas = ["a", "b", "c", "d"]
+    questoes = []
+    for _ in range(n_questoes):
+        correta = alternativas[rng.integers(len(alternativas))]
+        aluno = correta if rng.random() < taxa_acerto else alternativas[rng.integers(len(alternativas))]
+        questoes.append({
+            "tipo": api.TIPOS_CONTEUDO[rng.integers(len(api.TIPOS_CONTEUDO))],
+            "resposta_correta": correta,
+            "resposta_aluno": aluno
+        })
+    return {"questoes": questoes}
+
+
+############## Medicao ##############
+def medir(funcao, entradas, repeticoes):
+    """
+    executa a funcao sobre cada entrada, varias vezes, e retorna estatisticas do tempo por chamada.
+    o tempo de cada repeticao e dividido pelo numero de entradas; a mediana entre as repeticoes
+    e a medida principal (menos sensivel a ruido do que a media).
+    """
+    por_chamada = []
+    funcao(entradas[0])  # aquecimento
+    for _ in range(repeticoes):
+        inicio = time.perf_counter_ns()
+        for entrada in entradas:
+            funcao(entrada)
+        por_chamada.append((time.perf_counter_ns() - inicio) / len(entradas) / 1000)
+    return {
+        "mediana_us": round(float(np.median(por_chamada)), 3),
+        "min_us": round(min(por_chamada), 3),
+        "chamadas": len(entradas) * repeticoes
+    }
+
+
+def medir_endpoint(cliente, rota, corpos, repeticoes):
+    # latencia de cada requisicao pelo cliente de teste e vazao total
+    latencias = []
+    erros = 0
+    cliente.post(rota, json=corpos[0])  # aquecimento
+    inicio_total = time.perf_counter_ns()
+    for _ in range(repeticoes):
+        for corpo in corpos:
+            inicio = time.perf_counter_ns()
+            resposta = cliente.post(rota, json=corpo)
+            latencias.append((time.perf_counter_ns() - inicio) / 1000)
+            erros += resposta.status_code >= 400
+    total_s = (time.perf_counter_ns() - inicio_total) / 1e9
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+    return {
+        "mediana_us": round(float(p50), 3),
+        "p95_us": round(float(p95), 3),
+        "p99_us": round(float(p99), 3),
+        "req_por_s": round(len(latencias) / total_s, 1),
+        "erros": erros,
+        "chamadas": len(latencias)
+    }
+
+
+############## Benchmarks ##############
+def benchmarks(semente, rapido):
+    """
+    retorna a lista de benchmarks como (nome, funcao sem argumentos que retorna as estatisticas).
+    cada benchmark cria seu proprio gerador com a mesma semente, entao os dados nao dependem
+    de quais benchmarks foram selecionados.
+    """
+    repeticoes = 3 if rapido else 7
+    n = 200 if rapido else 1000
+    rng = lambda: np.random.default_rng(semente)
+    tutor = api.TutorAgent()
+    gestor = api.ManagerAgent()
+    avaliador = api.EvaluatorAgent()
+
+    def taxas_tutor():
+        return [tutor.calcular_taxas_acerto(aluno) for aluno in gerar_alunos_tutor(rng(), n)]
+
+    def avaliador_calculate_metrics(prova):
+        avaliador.set_data(prova)
+        return avaliador.calculate_metrics()
+
+    def gestor_calculate_metrics(dados):
+        gestor.set_data(dados)
+        return gestor.calculate_metrics()
+
+    lista = [
+        ("tutor.calcular_taxas_acerto",
+         lambda: medir(tutor.calcular_taxas_acerto, gerar_alunos_tutor(rng(), n), repeticoes)),
+        ("tutor.avaliar_preferencia_conteudo",
+         lambda: medir(tutor.avaliar_preferencia_conteudo, taxas_tutor(), repeticoes)),
+        ("tutor.distribuir_partes",
+         lambda: medir(lambda entrada: tutor.distribuir_partes(*entrada),
+                       [(tutor.avaliar_preferencia_conteudo(taxas), taxas) for taxas in taxas_tutor()], repeticoes)),
+        ("gestor.calculate_metrics",
+         lambda: medir(gestor_calculate_metrics, gerar_alunos_gestor(rng(), n), repeticoes)),
+        ("gestor.calculate_metrics[cache]",
+         em_cache(lambda: medir(gestor_calculate_metrics, gerar_alunos_gestor(rng(), n), repeticoes))),
+    ]
+
+    # o avaliador em provas de varios tamanhos
+    for n_questoes in [10, 100, 1000]:
+        quantidade = max(n * 10 // n_questoes, 5)
+        lista.append((
+            f"avaliador.calculate_metrics[{n_questoes} questoes]",
+            lambda n_questoes=n_questoes, quantidade=quantidade: medir(
+                avaliador_calculate_metrics, [gerar_prova(rng(), n_questoes) for _ in range(quantidade)], repeticoes
+            )
+        ))
+
+    # caminhos vetorizados, por aluno
+    lista += [
+        ("tutor.recomendar_lote[10000 alunos]",
+         lambda: medir_lote(tutor.recomendar_lote, gerar_contagens(rng(), 10000), repeticoes)),
+        ("tutor.planejar_lote[10000 alunos, 200 partes, intercalado]",
+         lambda: medir_lote(lambda contagens: tutor.planejar_lote(contagens, 200, "intercalado"), gerar_contagens(rng(), 10000), repeticoes)),
+        ("gestor.analisar_lote[10000 alunos]",
+         lambda: medir_lote(gestor.analisar_lote, gerar_contagens(rng(), 10000), repeticoes)),
+    ]
+
+    # endpoints pelo cliente de teste do flask
+    cliente = api.app.test_client()
+    n_requisicoes = n // 5
+    lista += [
+        ("POST /tutor", lambda: medir_endpoint(cliente, "/tutor", gerar_alunos_tutor(rng(), n_requisicoes), repeticoes)),
+        ("POST /gestor", lambda: medir_endpoint(cliente, "/gestor", gerar_alunos_gestor(rng(), n_requisicoes), repeticoes)),
+        ("POST /tutor[cache]",
+         em_cache(lambda: medir_endpoint(cliente, "/tutor", gerar_alunos_tutor(rng(), n_requisicoes), repeticoes))),
+        # painel repetindo a mesma consulta (resposta guardada pelo ETag)
+        ("POST /gestor[cache, consulta repetida]",
+         em_cache(lambda: medir_endpoint(cliente, "/gestor", gerar_alunos_gestor(rng(), 1) * n_requisicoes, repeticoes))),
+        ("POST /avaliador[20 questoes]",
+         lambda: medir_endpoint(cliente, "/avaliador", [gerar_prova(rng(), 20) for _ in range(n_requisicoes)], repeticoes)),
+        ("POST /avaliador[20 questoes, reprovado]",
+         lambda: medir_endpoint(cliente, "/avaliador", [gerar_prova(rng(), 20, 0.2) for _ in range(n_requisicoes)], repeticoes)),
+        ("POST /tutor/lote[1000 alunos]",
+         lambda: medir_endpoint(cliente, "/tutor/lote", [{"alunos": gerar_alunos_tutor(rng(), 1000)}], repeticoes * 3)),
+        ("POST /gestor/lote[1000 alunos]",
+         lambda: medir_endpoint(cliente, "/gestor/lote", [{"alunos": gerar_alunos_gestor(rng(), 1000)}], repeticoes * 3)),
+    ]
+    return lista
+
+
+def medir_lote(funcao, contagens, repeticoes):
+    # tempo por aluno de uma funcao que recebe a matriz inteira
+    resultado = medir(funcao, [contagens], repeticoes)
+    for chave in ["mediana_us", "min_us"]:
+        resultado[chave] = round(resultado[chave] / len(contagens), 3)
+    resultado["chamadas"] *= len(contagens)
+    return resultado
+
+
+def combinar(medidas):
+    """
+    junta as medidas de um benchmark em varias rodadas: cada estatistica fica com a mediana entre
+    as rodadas (o minimo fica com o menor e as contagens sao somadas) e "ruido" e a variacao
+    relativa da mediana entre as rodadas ((maior - menor) / mediana).
+    """
+    resultado = {}
+    for chave in medidas[0]:
+        valores = [medida[chave] for medida in medidas]
+        if chave in ("chamadas", "erros"):
+            resultado[chave] = sum(valores)
+        elif chave == "min_us":
+            resultado[chave] = min(valores)
+        else:
+            resultado[chave] = round(float(np.median(valores)), 3)
+    medianas = [medida["mediana_us"] for medida in medidas]
+    resultado["rodadas_us"] = medianas
+    resultado["ruido"] = round((max(medianas) - min(medianas)) / resultado["mediana_us"], 4) if resultado["mediana_us"] else 0.0
+    return resultado
+
+
+############## Comparacao com a linha de base ##############
+def comparar(resultados, base, tolerancia):
+    """
+    compara a mediana de cada benchmark com a da linha de base.
+    o limiar de cada benchmark e o maior entre a tolerancia e o ruido entre rodadas da linha de base
+    e da execucao atual (linhas de base sem ruido, de uma unica rodada, usam so a tolerancia).
+
+    returns:
+        list: (nome, mediana da base, mediana atual, variacao, limiar) dos benchmarks que pioraram alem do limiar
+    """
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = base.get(nome)
+        if anterior is None:
+            continue
+        variacao = atual["mediana_us"] / anterior["mediana_us"] - 1
+        limiar = max(tolerancia, anterior.get("ruido", 0.0), atual.get("ruido", 0.0))
+        atual["variacao"] = round(variacao, 4)
+        atual["limiar"] = round(limiar, 4)
+        if variacao > limiar:
+            regressoes.append((nome, anterior["mediana_us"], atual["mediana_us"], variacao, limiar))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks do sistema multiagente")
+    parser.add_argument("--semente", type=int, default=42, help="semente dos dados sinteticos")
+    parser.add_argument("--filtro", default="", help="executa apenas benchmarks cujo nome contem este texto")
+    parser.add_argument("--rapido", action="store_true", help="menos dados e repeticoes")
+    parser.add_argument("--salvar", help="arquivo json onde salvar os resultados")
+    parser.add_argument("--comparar", help="arquivo json de uma execucao anterior (linha de base)")
+    parser.add_argument("--tolerancia", type=float, default=0.10,
+                        help="piora relativa tolerada, alem do ruido entre rodadas (padrao: 10%%)")
+    parser.add_argument("--rodadas", type=int, default=3, help="execucoes de toda a lista; vale a mediana entre elas (padrao: 3)")
+    args = parser.parse_args()
+
+    # rodadas intercaladas: uma mudanca lenta na carga da maquina atinge todos os benchmarks
+    selecionados = [(nome, executar) for nome, executar in benchmarks(args.semente, args.rapido) if args.filtro in nome]
+    medidas = {nome: [] for nome, _ in selecionados}
+    for rodada in range(args.rodadas):
+        print(f"rodada {rodada + 1}/{args.rodadas}", file=sys.stderr)
+        for nome, executar in selecionados:
+            medidas[nome].append(executar())
+
+    resultados = {}
+    for nome, _ in selecionados:
+        resultados[nome] = combinar(medidas[nome])
+        extra = f"  p99 {resultados[nome]['p99_us']:.1f} us  {resultados[nome]['req_por_s']:.0f} req/s" if "p99_us" in resultados[nome] else ""
+        print(f"{nome:<45} {resultados[nome]['mediana_us']:>12.3f} us  ruido {resultados[nome]['ruido']:>6.1%}{extra}")
+
+    regressoes = []
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)["resultados"]
+        regressoes = comparar(resultados, base, args.tolerancia)
+        for nome, anterior, atual, variacao, limiar in regressoes:
+            print(f"REGRESSAO {nome}: {anterior:.3f} us -> {atual:.3f} us ({variacao:+.1%}, limiar {limiar:.1%})")
+        if not regressoes:
+            print(f"nenhuma regressao acima de {args.tolerancia:.0%} e do ruido entre rodadas")
+        if args.rodadas < 3:
+            print("aviso: com menos de 3 rodadas o ruido quase nao e medido; use --rodadas 3 ou mais", file=sys.stderr)
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "metadados": {
+                    "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "semente": args.semente,
+                    "rapido": args.rapido,
+                    "rodadas": args.rodadas,
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "plataforma": platform.platform(),
+                    "cpus": os.cpu_count()
+                },
+                "resultados": resultados
+            }, arquivo, indent=2, ensure_ascii=False)
+
+    sys.exit(1 if regressoes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+gerador de carga para a API do sistema multiagente.
+
+envia requisicoes concorrentes de /tutor, /avaliador e /gestor (com provas pequenas, grandes e de
+alunos reprovados) segundo uma mistura configuravel e mostra, por endpoint, a vazao, a latencia
+(p50/p95/p99) e a taxa de erros. usa apenas a biblioteca padrao no lado do cliente.
+
+por padrao inicia o servidor localmente (python agents-api.py <args>) e o encerra no final;
+com --url usa um servidor ja em execucao.
+
+os corpos sao sorteados de um conjunto fixo, entao com os caches ligados quase toda requisicao
+repetida e um acerto de cache. por isso o servidor local sobe, por padrao, com os caches de
+resultados e de respostas (ETag) desligados (cenario sem_cache); o cenario com_cache mede os
+mesmos corpos com os caches ligados e aparece separado no resultado. com --url os caches sao
+os do servidor em execucao.
+
+exemplos:
+    python loadgen.py --concorrencia 16 --duracao 30
+    python loadgen.py --cenarios sem_cache com_cache
+    python loadgen.py --servidor-args "--workers 4 --threads 8" --mix tutor=5,gestor=3,avaliador_grande=1
+    python loadgen.py --url http://10.0.0.5:5000 --json resultado.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+TIPOS_CONTEUDO = ["texto", "imagem", "video"]
+ALTERNATIVAS = ["a", "b", "c", "d"]
+
+
+############## Cargas ##############
+def carga_tutor(rng):
+    return "/tutor", {f"nu_{campo}_{tipo}": rng.randint(0, 12) for tipo in TIPOS_CONTEUDO for campo in ["acertos", "erros"]}
+
+
+def carga_gestor(rng):
+    return "/gestor", {"dados": {tipo: {"acertos": rng.randint(0, 12), "erros": rng.randint(0, 12)} for tipo in TIPOS_CONTEUDO}}
+
+
+def prova(rng, n_questoes, taxa_acerto):
+    questoes = []
+    for _ in range(n_questoes):
+        correta = rng.choice(ALTERNATIVAS)
+        questoes.append({
+            "tipo": rng.choice(TIPOS_CONTEUDO),
+            "resposta_correta": correta,
+            "resposta_aluno": correta if rng.random() < taxa_acerto else rng.choice(ALTERNATIVAS)
+        })
+    return "/avaliador", {"questoes": questoes}
+
+
+# nome na mistura -> gerador de (rota, corpo)
+CARGAS = {
+    "tutor": carga_tutor,
+    "gestor": carga_gestor,
+    "avaliador": lambda rng: prova(rng, 10, 0.8),
+    "avaliador_grande": lambda rng: prova(rng, 200, 0.75),
+    "avaliador_reprovado": lambda rng: prova(rng, 10, 0.2),  # aciona o tutor
+}
+
+MIX_PADRAO = "tutor=4,gestor=3,avaliador=2,avaliador_grande=1,avaliador_reprovado=1"
+
+# variaveis de ambiente do servidor local em cada cenario
+CENARIOS = {
+    "sem_cache": {"AGENTS_CACHE_TAMANHO": "0", "AGENTS_ETAG_TAMANHO": "0"},
+    "com_cache": {},
+}
+
+
+def ler_mix(texto):
+    # "tutor=4,gestor=3" -> {"tutor": 4.0, "gestor": 3.0}
+    mix = {}
+    for item in texto.split(","):
+        nome, _, peso = item.partition("=")
+        if nome.strip() not in CARGAS:
+            raise SystemExit(f"carga desconhecida: {nome} (opcoes: {', '.join(CARGAS)})")
+        mix[nome.strip()] = float(peso or 1)
+    return mix
+
+
+############## Execucao ##############
+def trabalhador(host, porta, mix, corpos, fim, inicio_medicao, semente, amostras):
+    """
+    envia requisicoes ate o instante fim, reaproveitando a conexao (keep-alive) quando o servidor permite.
+    grava (carga, latencia em segundos, sucesso) em amostras; as respostas anteriores a
+    inicio_medicao (aquecimento) sao descartadas.
+    """
+    rng = random.Random(semente)
+    nomes = list(mix)
+    pesos = [mix[nome] for nome in nomes]
+    conexao = http.client.HTTPConnection(host, porta, timeout=30)
+    cabecalhos = {"Content-Type": "application/json"}
+
+    while True:
+        agora = time.perf_counter()
+        if agora >= fim:
+            break
+        nome = rng.choices(nomes, pesos)[0]
+        rota, corpo = rng.choice(corpos[nome])
+        try:
+            conexao.request("POST", rota, corpo, cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            sucesso = resposta.status < 400
+        except (OSError, http.client.HTTPException):
+            conexao.close()
+            sucesso = False
+        latencia = time.perf_counter() - agora
+        if agora >= inicio_medicao:
+            amostras.append((nome, latencia, sucesso))
+
+    conexao.close()
+
+
+def percentil(valores_ordenados, p):
+    # percentil por interpolacao linear (mesmo criterio do numpy)
+    if not valores_ordenados:
+        return 0.0
+    posicao = (len(valores_ordenados) - 1) * p / 100
+    abaixo = int(posicao)
+    acima = min(abaixo + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[abaixo] + (valores_ordenados[acima] - valores_ordenados[abaixo]) * (posicao - abaixo)
+
+
+def resumir(amostras, duracao):
+    # estatisticas por carga e no total
+    grupos = {}
+    for nome, latencia, sucesso in amostras:
+        grupos.setdefault(nome, []).append((latencia, sucesso))
+    grupos["total"] = [(latencia, sucesso) for _, latencia, sucesso in amostras]
+
+    resumo = {}
+    for nome, valores in grupos.items():
+        latencias = sorted(latencia * 1000 for latencia, _ in valores)
+        erros = sum(1 for _, sucesso in valores if not sucesso)
+        resumo[nome] = {
+            "requisicoes": len(valores),
+            "req_por_s": round(len(valores) / duracao, 1),
+            "p50_ms": round(percentil(latencias, 50), 3),
+            "p95_ms": round(percentil(latencias, 95), 3),
+            "p99_ms": round(percentil(latencias, 99), 3),
+            "max_ms": round(latencias[-1], 3) if latencias else 0.0,
+            "taxa_erros": round(erros / len(valores), 4) if valores else 0.0
+        }
+    return resumo
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(porta, argumentos, ambiente=None):
+    # sobe o agents-api.py em segundo plano e espera a porta aceitar conexoes
+    caminho = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents-api.py")
+    processo = subprocess.Popen(
+        [sys.executable, caminho, "--host", "127.0.0.1", "--port", str(porta)] + shlex.split(argumentos),
+        stdout=subprocess.DEVNULL, env={**os.environ, **(ambiente or {})}
+    )
+    limite = time.time() + 30
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise SystemExit(f"o servidor terminou com codigo {processo.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", porta), timeout=0.5).close()
+            return processo
+        except OSError:
+            time.sleep(0.1)
+    processo.terminate()
+    raise SystemExit("o servidor nao respondeu em 30s")
+
+
+def medir(host, porta, mix, corpos, args):
+    # executa os clientes durante o aquecimento e a medicao e devolve as amostras
+    inicio = time.perf_counter()
+    inicio_medicao = inicio + args.aquecimento
+    fim = inicio_medicao + args.duracao
+    amostras = []  # list.append e seguro entre threads
+    threads = [
+        threading.Thread(target=trabalhador, args=(host, porta, mix, corpos, fim, inicio_medicao, args.semente + i, amostras))
+        for i in range(args.concorrencia)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return amostras
+
+
+def imprimir(cenario, resumo):
+    print(f"== {cenario} ==")
+    print(f"{'carga':<22}{'req':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'erros':>8}")
+    for nome, estatisticas in resumo.items():
+        print(
+            f"{nome:<22}{estatisticas['requisicoes']:>8}{estatisticas['req_por_s']:>10.1f}"
+            f"{estatisticas['p50_ms']:>10.2f}{estatisticas['p95_ms']:>10.2f}{estatisticas['p99_ms']:>10.2f}"
+            f"{estatisticas['max_ms']:>10.2f}{estatisticas['taxa_erros']:>8.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gerador de carga da API do sistema multiagente")
+    parser.add_argument("--url", help="servidor ja em execucao (padrao: inicia um localmente)")
+    parser.add_argument("--servidor-args", default="--threads 8",
+                        help="argumentos do agents-api.py ao iniciar localmente (padrao: --threads 8)")
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=["sem_cache"],
+                        help="cenarios medidos com o servidor local, um servidor novo por cenario (padrao: sem_cache)")
+    parser.add_argument("--concorrencia", type=int, default=8, help="clientes simultaneos")
+    parser.add_argument("--duracao", type=float, default=10, help="segundos de medicao")
+    parser.add_argument("--aquecimento", type=float, default=2, help="segundos iniciais descartados")
+    parser.add_argument("--mix", default=MIX_PADRAO, help=f"pesos das cargas (padrao: {MIX_PADRAO})")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--json", help="arquivo onde salvar o resumo")
+    args = parser.parse_args()
+
+    mix = ler_mix(args.mix)
+
+    # corpos gerados e serializados antes da medicao, para nao pesar no cliente
+    rng = random.Random(args.semente)
+    corpos = {nome: [] for nome in mix}
+    for nome in mix:
+        for _ in range(200):
+            rota, corpo = CARGAS[nome](rng)
+            corpos[nome].append((rota, json.dumps(corpo).encode()))
+
+    resumos = {}
+    if args.url:
+        # os caches sao os do servidor em execucao
+        url = urlparse(args.url)
+        amostras = medir(url.hostname, url.port or 80, mix, corpos, args)
+        resumos["servidor_externo"] = resumir(amostras, args.duracao)
+    else:
+        for cenario in args.cenarios:
+            porta = porta_livre()
+            processo = iniciar_servidor(porta, args.servidor_args, CENARIOS[cenario])
+            try:
+                amostras = medir("127.0.0.1", porta, mix, corpos, args)
+            finally:
+                processo.terminate()
+                processo.wait()
+            resumos[cenario] = resumir(amostras, args.duracao)
+
+    for cenario, resumo in resumos.items():
+        imprimir(cenario, resumo)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "configuracao": {
+                    "url": args.url, "servidor_args": None if args.url else args.servidor_args,
+                    "cenarios": {cenario: CENARIOS.get(cenario) for cenario in resumos},
+                    "concorrencia": args.concorrencia, "duracao": args.duracao, "mix": mix, "semente": args.semente
+                },
+                "cenarios": resumos
+            }, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+configuracao dos testes. o modulo tem hifen no nome, entao e importado pelo nome "agents-api"
+a partir da raiz do repositorio, do mesmo jeito que os processos do pool o importam.
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+os.environ.setdefault("AGENTS_LOG_NIVEL", "WARNING")
+
+
+@pytest.fixture(scope="session")
+def api():
+    return importlib.import_module("agents-api")
+
+
+@pytest.fixture
+def cliente(api):
+    return api.app.test_client()
+
+
+@pytest.fixture
+def pool(api, monkeypatch):
+    # forca o pool de processos mesmo em lotes pequenos e o encerra no final do teste
+    monkeypatch.setattr(api, "PROCESSOS_LOTE", 2)
+    yield
+    if api._pool_processos is not None:
+        api._pool_processos.shutdown()
+        api._pool_processos = None
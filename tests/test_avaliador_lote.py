@@ -0,0 +1,85 @@
+"""
+testes do /avaliador/lote: cada resultado do lote e igual ao do /avaliador (inclusive nos tipos
+numericos do json), e falhas do tutor ou do registro viram um registro de erro por aluno.
+"""
+import json
+
+import numpy as np
+import pytest
+
+
+def prova_aleatoria(n_questoes, n_alunos, semente=0):
+    rng = np.random.default_rng(semente)
+    questoes = [
+        {"tipo": ["texto", "imagem", "video", "Video"][rng.integers(4)], "resposta_correta": "ABCD"[rng.integers(4)]}
+        for _ in range(n_questoes)
+    ]
+    alunos = [
+        [[q["resposta_correta"], q["resposta_correta"].lower(), "x"][rng.integers(3)] for q in questoes][:rng.integers(n_questoes + 1)]
+        for _ in range(n_alunos)
+    ]
+    return questoes, alunos
+
+
+def resultados_brutos(resposta):
+    # json de cada resultado como texto, para que 0 e 0.0 nao sejam considerados iguais
+    return [json.dumps(resultado, sort_keys=True) for resultado in json.loads(resposta.get_data())["resultados"]]
+
+
+@pytest.mark.parametrize("n_questoes", [3, 15])
+def test_avaliador_lote_igual_ao_avaliador(cliente, n_questoes):
+    questoes, alunos = prova_aleatoria(n_questoes, 40, n_questoes)
+
+    lote = resultados_brutos(cliente.post("/avaliador/lote", json={"questoes": questoes, "alunos": alunos}))
+
+    esperado = []
+    for respostas in alunos:
+        completas = [dict(q, resposta_aluno=respostas[i] if i < len(respostas) else "") for i, q in enumerate(questoes)]
+        esperado.append(json.dumps(cliente.post("/avaliador", json={"questoes": completas}).get_json(), sort_keys=True))
+    assert lote == esperado
+
+
+def test_avaliador_lote_colunar_igual_ao_de_questoes(cliente):
+    questoes, alunos = prova_aleatoria(12, 30, 1)
+    colunar = {"tipos": [q["tipo"] for q in questoes], "gabarito": [q["resposta_correta"] for q in questoes]}
+
+    por_questoes = cliente.post("/avaliador/lote", json={"questoes": questoes, "alunos": alunos})
+    por_colunas = cliente.post("/avaliador/lote", json={**colunar, "alunos": alunos})
+
+    assert resultados_brutos(por_colunas) == resultados_brutos(por_questoes)
+
+
+def test_falha_do_tutor_vira_erro_dos_reprovados(api, cliente, monkeypatch):
+    monkeypatch.setattr(api.TUTOR, "calculate_metrics_lote", lambda *args, **kwargs: {"erro": "sem motor"})
+    questoes = [{"tipo": "texto", "resposta_correta": "A"}, {"tipo": "video", "resposta_correta": "B"}]
+    alunos = [["A", "B"], {"id_aluno": "r", "respostas": ["X", "X"]}]
+
+    resultados = cliente.post("/avaliador/lote", json={"questoes": questoes, "alunos": alunos}).get_json()["resultados"]
+
+    assert resultados[0]["aprovado"] is True
+    assert resultados[1] == {"id_aluno": "r", "erro": "falha ao calcular as partes: sem motor"}
+
+
+def test_falha_ao_registrar_nao_corta_a_resposta(api, cliente, monkeypatch):
+    registrar = api.registrar_avaliacao
+
+    def registrar_falhando(avaliacao, submissao):
+        if submissao.get("id_aluno") in ("a3", "a1200"):
+            raise OSError("disco cheio")
+        registrar(avaliacao, submissao)
+
+    monkeypatch.setattr(api, "registrar_avaliacao", registrar_falhando)
+    monkeypatch.setattr(api, "ESTADO", api.EstadoAlunos(":memory:"))
+    questoes, respostas = prova_aleatoria(5, 1500, 4)
+    alunos = [{"id_aluno": f"a{i}", "respostas": r} for i, r in enumerate(respostas)]
+
+    # mais de um pedaco de resposta: a falha do segundo acontece com a resposta ja em andamento
+    resposta = cliente.post("/avaliador/lote", json={"questoes": questoes, "alunos": alunos})
+    resultados = json.loads(resposta.get_data())["resultados"]
+
+    assert resposta.status_code == 200
+    assert len(resultados) == 1500
+    for i in (3, 1200):
+        assert resultados[i] == {"id_aluno": f"a{i}", "erro": "falha ao registrar a avaliacao: disco cheio"}
+    assert resultados[4]["id_aluno"] == "a4" and "nota" in resultados[4]
+    assert api.ESTADO.obter("a4") is not None and api.ESTADO.obter("a3") is None
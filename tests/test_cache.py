@@ -0,0 +1,81 @@
+"""
+testes do cache LRU de resultados do tutor e do gestor (CacheResultados e /cache).
+"""
+import pytest
+
+ALUNO = {
+    "nu_acertos_texto": 25, "nu_erros_texto": 5, "nu_acertos_imagem": 10,
+    "nu_erros_imagem": 10, "nu_acertos_video": 8, "nu_erros_video": 12
+}
+
+
+@pytest.fixture
+def caches(api, monkeypatch):
+    tutor, gestor = api.CacheResultados(8), api.CacheResultados(8)
+    monkeypatch.setattr(api, "CACHE_TUTOR", tutor)
+    monkeypatch.setattr(api, "CACHE_GESTOR", gestor)
+    # sem respostas guardadas pelo ETag, toda requisicao chega aos agentes
+    monkeypatch.setattr(api, "RESPOSTAS_ETAG", api.CacheRespostas(0, 0))
+    return tutor, gestor
+
+
+def test_lru_descarta_o_mais_antigo(api):
+    cache = api.CacheResultados(2)
+    cache.guardar((1,), "a")
+    cache.guardar((2,), "b")
+    assert cache.obter((1,)) == "a"  # (1,) passa a ser o mais recente
+
+    cache.guardar((3,), "c")
+
+    assert cache.obter((2,)) is None
+    assert cache.obter((1,)) == "a" and cache.obter((3,)) == "c"
+    assert cache.estatisticas() == {"tamanho": 2, "tamanho_maximo": 2, "hits": 3, "misses": 1}
+
+
+def test_chave_apenas_de_inteiros(api):
+    assert api.CacheResultados.chave([1, 2, 3]) == (1, 2, 3)
+    assert api.CacheResultados.chave([1, 2.0, 3]) is None
+    assert api.CacheResultados.chave([1, True, 3]) is None
+
+    cache = api.CacheResultados(4)
+    cache.guardar(None, "x")
+    assert cache.obter(None) is None
+    assert cache.estatisticas()["tamanho"] == 0
+
+
+def test_tamanho_zero_desliga(api):
+    cache = api.CacheResultados(0)
+    cache.guardar((1,), "a")
+
+    assert cache.obter((1,)) is None
+    assert cache.estatisticas()["tamanho"] == 0
+
+
+def test_tutor_e_gestor_usam_o_cache(api, cliente, caches):
+    tutor, gestor = caches
+    dados = {"dados": {"texto": {"acertos": 3, "erros": 1}, "imagem": {"acertos": 0, "erros": 2}, "video": {"acertos": 5, "erros": 0}}}
+
+    respostas_tutor = [cliente.post("/tutor", json=ALUNO).get_json() for _ in range(3)]
+    respostas_gestor = [cliente.post("/gestor", json=dados).get_json() for _ in range(3)]
+
+    assert respostas_tutor[0] == respostas_tutor[1] == respostas_tutor[2]
+    assert respostas_gestor[0] == respostas_gestor[1] == respostas_gestor[2]
+    assert (tutor.estatisticas()["hits"], tutor.estatisticas()["misses"]) == (2, 1)
+    assert (gestor.estatisticas()["hits"], gestor.estatisticas()["misses"]) == (2, 1)
+
+
+def test_contagens_nao_inteiras_nao_passam_pelo_cache(api, cliente, caches):
+    tutor, _ = caches
+
+    assert cliente.post("/tutor", json={**ALUNO, "nu_acertos_texto": 25.5}).status_code == 200
+    assert tutor.estatisticas()["tamanho"] == 0
+
+
+def test_rota_cache(cliente, caches):
+    cliente.post("/tutor", json=ALUNO)
+
+    estatisticas = cliente.get("/cache").get_json()
+
+    assert set(estatisticas) == {"tutor", "gestor", "respostas"}
+    assert estatisticas["tutor"]["tamanho"] == 1
+    assert estatisticas["tutor"]["tamanho_maximo"] == 8
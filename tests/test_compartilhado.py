@@ -0,0 +1,217 @@
+"""
+testes da memoria compartilhada entre processos: o cache de resultados (seqlock e checksum por slot)
+e os resumos das turmas (uma linha de contadores por processo).
+"""
+import multiprocessing
+import struct
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+def contagens_aleatorias(n, semente=0):
+    rng = np.random.default_rng(semente)
+    return rng.integers(0, 20, (n, 6)).tolist()
+
+
+### cache compartilhado ###
+def test_cache_guarda_e_obtem(api, tmp_path):
+    cache = api.CacheCompartilhado(str(tmp_path / "cache"), 64)
+    chave = (1, 2, 3, 4, 5, 6)
+    resultado = {"partes": {"parte1": "texto"}, "taxa": 0.5}
+
+    assert cache.obter(chave) is None
+    cache.guardar(chave, resultado)
+
+    assert cache.obter(chave) == resultado
+    assert cache.estatisticas() == {"slots": 64, "hits": 1, "misses": 1}
+
+
+def test_cache_visto_por_outra_instancia(api, tmp_path):
+    # outra instancia no mesmo arquivo faz o papel de outro worker do host
+    caminho = str(tmp_path / "cache")
+    api.CacheCompartilhado(caminho, 64).guardar((1, 1, 1, 1, 1, 1), [1, 2, 3])
+
+    assert api.CacheCompartilhado(caminho, 64).obter((1, 1, 1, 1, 1, 1)) == [1, 2, 3]
+
+
+def test_cache_colisao_substitui_o_anterior(api, tmp_path):
+    cache = api.CacheCompartilhado(str(tmp_path / "cache"), 4)
+    chaves = [(i, 0, 0, 0, 0, 0) for i in range(100)]
+    primeira = chaves[0]
+    colisao = next(chave for chave in chaves[1:] if hash(chave) % 4 == hash(primeira) % 4)
+
+    cache.guardar(primeira, "a")
+    cache.guardar(colisao, "b")
+
+    assert cache.obter(primeira) is None
+    assert cache.obter(colisao) == "b"
+
+
+def test_cache_descarta_slot_em_escrita(api, tmp_path):
+    cache = api.CacheCompartilhado(str(tmp_path / "cache"), 64)
+    chave = (6, 5, 4, 3, 2, 1)
+    cache.guardar(chave, {"a": 1})
+    posicao = (hash(chave) % cache.slots) * cache.TAMANHO_SLOT
+    seq = struct.unpack_from("<I", cache.regiao.dados, posicao)[0]
+
+    # seq impar: um escritor esta no meio do slot
+    struct.pack_into("<I", cache.regiao.dados, posicao, seq + 1)
+    assert cache.obter(chave) is None
+
+    # a proxima escrita recupera o slot abandonado
+    cache.guardar(chave, {"a": 2})
+    assert struct.unpack_from("<I", cache.regiao.dados, posicao)[0] % 2 == 0
+    assert cache.obter(chave) == {"a": 2}
+
+
+def test_cache_descarta_slot_corrompido(api, tmp_path):
+    cache = api.CacheCompartilhado(str(tmp_path / "cache"), 64)
+    chave = (0, 1, 0, 1, 0, 1)
+    cache.guardar(chave, {"partes": "texto"})
+    posicao = (hash(chave) % cache.slots) * cache.TAMANHO_SLOT
+
+    cache.regiao.dados[posicao + cache.SLOT.size + 2] ^= 0xFF
+
+    assert cache.obter(chave) is None
+
+
+def test_cache_ignora_resultados_grandes_e_chaves_fora_de_int32(api, tmp_path):
+    cache = api.CacheCompartilhado(str(tmp_path / "cache"), 64)
+
+    cache.guardar((1, 0, 0, 0, 0, 0), "x" * cache.TAMANHO_SLOT)
+    cache.guardar((2 ** 31, 0, 0, 0, 0, 0), "y")
+
+    assert cache.obter((1, 0, 0, 0, 0, 0)) is None
+    assert cache.obter((2 ** 31, 0, 0, 0, 0, 0)) is None
+
+
+def test_cache_recusa_arquivo_de_outra_configuracao(api, tmp_path):
+    caminho = str(tmp_path / "cache")
+    api.CacheCompartilhado(caminho, 64)
+
+    with pytest.raises(RuntimeError):
+        api.CacheCompartilhado(caminho, 128)
+
+
+def test_cache_leitor_nunca_ve_escrita_pela_metade(api, tmp_path):
+    cache = api.CacheCompartilhado(str(tmp_path / "cache"), 1)
+    valores = [{"n": n, "texto": "x" * (n % 300)} for n in range(50)]
+    chave = (1, 2, 3, 4, 5, 6)
+    parar = threading.Event()
+
+    def escrever():
+        while not parar.is_set():
+            for valor in valores:
+                cache.guardar(chave, valor)
+
+    escritor = threading.Thread(target=escrever)
+    escritor.start()
+    try:
+        lidos = [cache.obter(chave) for _ in range(20000)]
+    finally:
+        parar.set()
+        escritor.join()
+
+    assert all(lido is None or lido in valores for lido in lidos)
+
+
+### turmas compartilhadas ###
+def aplicar_nos_dois(api, compartilhadas, agregador, operacoes):
+    for operacao, id_turma, contagens, anteriores in operacoes:
+        relatorio = api.relatorio_turma(contagens)
+        anterior = api.relatorio_turma(anteriores) if anteriores else None
+        if operacao == "atualizar":
+            compartilhadas.atualizar(id_turma, relatorio, anterior)
+            agregador.atualizar(id_turma, relatorio, anterior)
+        else:
+            compartilhadas.retirar(id_turma, relatorio)
+            agregador.retirar(id_turma, relatorio)
+
+
+def operacoes_aleatorias(n, semente=0):
+    # alunos entram, refazem provas (retirando o relatorio anterior) e mudam de turma
+    rng = np.random.default_rng(semente)
+    contagens = contagens_aleatorias(n, semente)
+    for linha in contagens[::5]:
+        linha[2:4] = [0, 0]  # alunos sem questoes de imagem
+    operacoes = []
+    for i, linha in enumerate(contagens):
+        turma = f"t{rng.integers(3)}"
+        operacoes.append(("atualizar", turma, linha, None))
+        if i % 4 == 1:
+            nova = [valor + 1 for valor in linha]
+            operacoes.append(("atualizar", turma, nova, linha))
+        elif i % 4 == 2:
+            operacoes.append(("retirar", turma, linha, None))
+            operacoes.append(("atualizar", "outra", linha, None))
+    return operacoes
+
+
+def test_turmas_compartilhadas_iguais_ao_agregador(api, tmp_path):
+    compartilhadas = api.TurmasCompartilhadas(str(tmp_path / "turmas"), max_turmas=8, max_processos=4)
+    agregador = api.AgregadorTurmas()
+
+    aplicar_nos_dois(api, compartilhadas, agregador, operacoes_aleatorias(200))
+
+    assert compartilhadas.consultar() == agregador.consultar()
+    for turmas in (["t0"], ["t1", "t2"], ["outra"], ["inexistente"]):
+        assert compartilhadas.consultar(turmas) == agregador.consultar(turmas)
+    # outra instancia no mesmo arquivo ve as mesmas turmas
+    assert api.TurmasCompartilhadas(str(tmp_path / "turmas"), max_turmas=8, max_processos=4).consultar() == agregador.consultar()
+
+
+def test_turmas_consulta_espera_escrita_em_andamento(api, tmp_path):
+    compartilhadas = api.TurmasCompartilhadas(str(tmp_path / "turmas"), max_turmas=8, max_processos=4)
+    compartilhadas.atualizar("t", api.relatorio_turma([5, 5, 5, 5, 5, 5]))
+    esperado = compartilhadas.consultar(["t"])
+    linha = compartilhadas.linhas[compartilhadas.linha_processo, compartilhadas.indices["t"]]
+
+    # seq impar com os contadores pela metade, terminados por outra thread logo depois
+    linha["seq"] += 1
+    linha["alunos"] += 1
+
+    def terminar():
+        time.sleep(0.05)
+        linha["alunos"] -= 1
+        linha["seq"] += 1
+
+    threading.Thread(target=terminar).start()
+    assert compartilhadas.consultar(["t"]) == esperado
+
+
+def test_turmas_limite(api, tmp_path):
+    compartilhadas = api.TurmasCompartilhadas(str(tmp_path / "turmas"), max_turmas=2, max_processos=4)
+    relatorio = api.relatorio_turma([1, 1, 1, 1, 1, 1])
+    compartilhadas.atualizar("a", relatorio)
+    compartilhadas.atualizar("b", relatorio)
+
+    with pytest.raises(RuntimeError):
+        compartilhadas.atualizar("c", relatorio)
+    with pytest.raises(ValueError):
+        compartilhadas.indice("x" * compartilhadas.TAMANHO_NOME, criar=True)
+
+
+def atualizar_em_outro_processo(caminho, semente):
+    import importlib
+    api = importlib.import_module("agents-api")
+    compartilhadas = api.TurmasCompartilhadas(caminho, max_turmas=8, max_processos=4)
+    for linha in contagens_aleatorias(100, semente):
+        compartilhadas.atualizar(f"t{linha[0] % 3}", api.relatorio_turma(linha))
+
+
+def test_turmas_varios_processos(api, tmp_path):
+    caminho = str(tmp_path / "turmas")
+    api.TurmasCompartilhadas(caminho, max_turmas=8, max_processos=4)
+    contexto = multiprocessing.get_context("spawn")
+
+    with contexto.Pool(2) as processos:
+        processos.starmap(atualizar_em_outro_processo, [(caminho, 1), (caminho, 2)])
+
+    agregador = api.AgregadorTurmas()
+    for semente in (1, 2):
+        for linha in contagens_aleatorias(100, semente):
+            agregador.atualizar(f"t{linha[0] % 3}", api.relatorio_turma(linha))
+    assert api.TurmasCompartilhadas(caminho, max_turmas=8, max_processos=4).consultar() == agregador.consultar()
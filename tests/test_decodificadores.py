@@ -0,0 +1,143 @@
+"""
+testes dos formatos de entrada: json colunar, matriz de contagens empacotada e messagepack.
+cada formato tem de dar a mesma resposta que o json equivalente.
+"""
+import numpy as np
+import pytest
+
+
+def matriz_contagens(api, n=50, semente=0):
+    return np.random.default_rng(semente).integers(0, 30, (n, len(api.CAMPOS_TUTOR)))
+
+
+def test_decodificar_contagens(api):
+    matriz = matriz_contagens(api)
+
+    dados = api.decodificar_corpo(api.TIPO_CONTAGENS, matriz.astype("<i4").tobytes(), aceita_contagens=True)
+
+    assert dados["alunos"].shape == matriz.shape
+    assert (dados["alunos"] == matriz).all()
+
+
+def test_decodificar_contagens_tamanho_invalido(api):
+    with pytest.raises(api.CorpoInvalido):
+        api.decodificar_corpo(api.TIPO_CONTAGENS, b"\0" * 25, aceita_contagens=True)
+
+
+def test_decodificar_contagens_fora_do_lote(api):
+    with pytest.raises(api.FormatoNaoSuportado):
+        api.decodificar_corpo(api.TIPO_CONTAGENS, b"\0" * 24)
+
+
+def test_decodificar_json(api):
+    assert api.decodificar_corpo("application/json", b'{"a": [1, 2]}') == {"a": [1, 2]}
+    assert api.decodificar_corpo("application/json", b"") is None
+
+
+@pytest.mark.parametrize("rota", ["/tutor/lote", "/gestor/lote"])
+def test_contagens_empacotadas_iguais_ao_colunar(api, cliente, rota):
+    matriz = matriz_contagens(api)
+    colunar = {campo: coluna for campo, coluna in zip(api.CAMPOS_TUTOR, matriz.T.tolist())}
+
+    empacotada = cliente.post(rota, data=matriz.astype("<i4").tobytes(), content_type=api.TIPO_CONTAGENS)
+
+    assert empacotada.status_code == 200
+    assert empacotada.get_json() == cliente.post(rota, json=colunar).get_json()
+
+
+@pytest.mark.parametrize("rota", ["/tutor/lote", "/gestor/lote"])
+def test_contagens_empacotadas_tamanho_invalido(api, cliente, rota):
+    resposta = cliente.post(rota, data=b"\0" * 25, content_type=api.TIPO_CONTAGENS)
+
+    assert resposta.status_code == 400
+
+
+def test_contagens_empacotadas_em_outra_rota(api, cliente):
+    resposta = cliente.post("/avaliador", data=b"\0" * 24, content_type=api.TIPO_CONTAGENS)
+
+    assert resposta.status_code == 415
+
+
+def test_tutor_lote_colunar_igual_a_lista(api, cliente):
+    alunos = [dict(zip(api.CAMPOS_TUTOR, linha)) for linha in matriz_contagens(api, 20, 1).tolist()]
+    colunar = {campo: [aluno[campo] for aluno in alunos] for campo in api.CAMPOS_TUTOR}
+
+    assert cliente.post("/tutor/lote", json=colunar).get_json() == cliente.post("/tutor/lote", json={"alunos": alunos}).get_json()
+
+
+def test_avaliador_colunar_igual_a_questoes(cliente):
+    tipos = ["texto", "imagem", "video", "texto"]
+    gabarito = ["A", "B", "C", "D"]
+    respostas = ["a", "X", "C", ""]
+    questoes = [
+        {"tipo": tipo, "resposta_correta": correta, "resposta_aluno": resposta}
+        for tipo, correta, resposta in zip(tipos, gabarito, respostas)
+    ]
+
+    colunar = cliente.post("/avaliador", json={"tipos": tipos, "gabarito": gabarito, "respostas": respostas})
+    indices = cliente.post("/avaliador", json={"tipos": [0, 1, 2, 0], "gabarito": gabarito, "respostas": respostas})
+
+    assert colunar.status_code == 200
+    assert colunar.get_json() == cliente.post("/avaliador", json={"questoes": questoes}).get_json()
+    assert indices.get_json() == colunar.get_json()
+
+
+def test_pipeline_aceita_prova_colunar(cliente):
+    corpo = {"tipos": ["texto", "imagem"], "gabarito": ["A", "B"], "respostas": ["A", "X"]}
+
+    resposta = cliente.post("/pipeline", json=corpo)
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()["avaliacao"] == cliente.post("/avaliador", json=corpo).get_json()
+
+
+def test_messagepack_igual_ao_json(api, cliente):
+    msgpack = pytest.importorskip("msgpack")
+    alunos = [dict(zip(api.CAMPOS_TUTOR, linha)) for linha in matriz_contagens(api, 10, 2).tolist()]
+    prova = {"tipos": b"\x00\x01\x02", "gabarito": ["A", "B", "C"], "respostas": ["A", "B", "X"]}
+
+    for rota, corpo, json_equivalente in [
+        ("/tutor", alunos[0], alunos[0]),
+        ("/tutor/lote", {"alunos": alunos}, {"alunos": alunos}),
+        ("/avaliador", prova, {**prova, "tipos": [0, 1, 2]}),
+    ]:
+        resposta = cliente.post(rota, data=msgpack.packb(corpo), content_type="application/msgpack")
+        assert resposta.status_code == 200
+        assert resposta.get_json() == cliente.post(rota, json=json_equivalente).get_json()
+
+
+def test_messagepack_colunas_empacotadas(api, cliente):
+    msgpack = pytest.importorskip("msgpack")
+    matriz = matriz_contagens(api, 30, 3)
+    colunar = {campo: coluna for campo, coluna in zip(api.CAMPOS_TUTOR, matriz.T.tolist())}
+    empacotado = {campo: np.asarray(coluna, "<i4").tobytes() for campo, coluna in colunar.items()}
+
+    dados = api.decodificar_corpo("application/msgpack", msgpack.packb({"alunos": empacotado}))
+    assert isinstance(dados["alunos"][api.CAMPOS_TUTOR[0]], np.ndarray)
+
+    for rota in ["/tutor/lote", "/gestor/lote"]:
+        resposta = cliente.post(rota, data=msgpack.packb(empacotado), content_type="application/msgpack")
+        assert resposta.status_code == 200
+        assert resposta.get_json() == cliente.post(rota, json=colunar).get_json()
+
+
+@pytest.mark.parametrize("rota", ["/tutor", "/tutor/lote", "/avaliador", "/avaliador/lote", "/avaliador/provas", "/gestor", "/gestor/lote", "/pipeline"])
+def test_messagepack_invalido_da_400(cliente, rota):
+    msgpack = pytest.importorskip("msgpack")
+    corpos = [
+        msgpack.packb({"a": 1}) + b"\x01",  # ExtraData
+        b"\xc1",  # FormatError
+        b"\x91" * 2000 + b"\x90",  # StackError
+        b"\x93\x01",  # incompleto
+        b"\x81\x91\x01\x02",  # lista como chave
+        b"\xa2\xff\xfe",  # utf-8 invalido
+    ]
+    for corpo in corpos:
+        assert cliente.post(rota, data=corpo, content_type="application/msgpack").status_code == 400
+
+
+def test_asgi_corpo_invalido_da_400(api):
+    executar = api.asgi_app.executar
+
+    assert executar("/tutor", api.processar_tutor, "application/msgpack", b"\xc1")[0] == 400
+    assert executar("/gestor", api.processar_gestor, "application/json", b"{nao e json")[0] == 400
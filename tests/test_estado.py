@@ -0,0 +1,83 @@
+"""
+testes do estado acumulado dos alunos (EstadoAlunos) e das rotas chamadas apenas com o id do aluno.
+"""
+import multiprocessing
+
+import pytest
+
+QUESTOES = [
+    {"tipo": "texto", "resposta_correta": "A", "resposta_aluno": "A"},
+    {"tipo": "imagem", "resposta_correta": "B", "resposta_aluno": "X"},
+]
+
+# estado herdado pelos processos filhos em test_somas_exatas_entre_processos
+_estado = None
+
+
+def _somar_varias(vezes):
+    vistos = []
+    for _ in range(vezes):
+        anterior, _ = _estado.somar("x", [1, 0, 0, 0, 0, 0])
+        vistos.append(anterior[0] if anterior else 0)
+    return vistos, id(_estado._conexao)
+
+
+@pytest.fixture
+def estado(api, monkeypatch):
+    estado = api.EstadoAlunos(":memory:")
+    monkeypatch.setattr(api, "ESTADO", estado)
+    return estado
+
+
+def test_somar_e_obter(api, estado):
+    assert estado.obter("a") is None
+    assert estado.somar("a", [1, 2, 3, 4, 5, 6], "t1") == (None, None)
+
+    assert estado.somar("a", [1, 1, 1, 1, 1, 1]) == ([1, 2, 3, 4, 5, 6], "t1")
+    assert estado.somar("a", [0] * 6, "t2") == ([2, 3, 4, 5, 6, 7], "t1")
+    assert estado.obter("a") == dict(zip(api.CAMPOS_TUTOR, [2, 3, 4, 5, 6, 7]))
+    assert estado.somar(7, [0] * 6)[0] is None and estado.obter("7") is not None
+
+
+def test_banco_antigo_sem_turma(api, tmp_path):
+    import sqlite3
+
+    caminho = str(tmp_path / "estado.db")
+    antigo = sqlite3.connect(caminho)
+    campos = ", ".join(f"{campo} INTEGER NOT NULL DEFAULT 0" for campo in api.CAMPOS_TUTOR)
+    antigo.execute(f"CREATE TABLE alunos (id_aluno TEXT PRIMARY KEY, {campos}) WITHOUT ROWID")
+    antigo.execute("INSERT INTO alunos VALUES ('a', 1, 0, 0, 0, 0, 0)")
+    antigo.commit()
+    antigo.close()
+
+    assert api.EstadoAlunos(caminho).somar("a", [1, 0, 0, 0, 0, 0], "t") == ([1, 0, 0, 0, 0, 0], None)
+
+
+def test_tutor_e_gestor_pelo_id_do_aluno(api, cliente, estado):
+    for _ in range(2):
+        assert cliente.post("/avaliador", json={"id_aluno": "a1", "questoes": QUESTOES}).status_code == 200
+    contagens = dict(zip(api.CAMPOS_TUTOR, [2, 0, 0, 2, 0, 0]))
+
+    assert estado.obter("a1") == contagens
+    assert cliente.post("/tutor", json={"id_aluno": "a1"}).get_json() == cliente.post("/tutor", json=contagens).get_json()
+    assert cliente.post("/gestor", json={"id_aluno": "a1"}).status_code == 200
+    assert cliente.post("/tutor", json={"id_aluno": "ninguem"}).status_code == 404
+
+
+def test_somas_exatas_entre_processos(api, tmp_path):
+    # como no gunicorn --preload: o estado e criado (e usado) antes do fork dos workers
+    global _estado
+    _estado = api.EstadoAlunos(str(tmp_path / "estado.db"))
+    _estado.somar("x", [0] * 6)
+    conexao_pai = id(_estado._conexao)
+
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        resultados = pool.map(_somar_varias, [100] * 4)
+    vistos = sum((vistos for vistos, _ in resultados), [])
+
+    # cada filho abriu a sua conexao em vez de usar a herdada
+    assert all(conexao != conexao_pai for _, conexao in resultados)
+
+    # cada soma viu um "anterior" diferente: nenhuma leitura ficou entre a leitura e a soma de outra
+    assert sorted(vistos) == list(range(400))
+    assert _estado.obter("x")["nu_acertos_texto"] == 400
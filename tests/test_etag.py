@@ -0,0 +1,117 @@
+"""
+testes das respostas com ETag/304 do /tutor e do /gestor e do armazenamento das respostas.
+"""
+import pytest
+
+ALUNO = {
+    "nu_acertos_texto": 25, "nu_erros_texto": 5, "nu_acertos_imagem": 10,
+    "nu_erros_imagem": 10, "nu_acertos_video": 8, "nu_erros_video": 12
+}
+GESTOR = {"dados": {"imagem": {"acertos": 9, "erros": 11}, "video": {"acertos": 16, "erros": 17}, "texto": {"acertos": 20, "erros": 0}}}
+
+
+@pytest.fixture
+def respostas(api, monkeypatch):
+    # armazenamento vazio em cada teste
+    respostas = api.CacheRespostas(16, 2 ** 20)
+    monkeypatch.setattr(api, "RESPOSTAS_ETAG", respostas)
+    return respostas
+
+
+@pytest.mark.parametrize("rota, corpo", [("/tutor", ALUNO), ("/gestor", GESTOR)])
+def test_304_com_o_etag_da_resposta(cliente, respostas, rota, corpo):
+    primeira = cliente.post(rota, json=corpo)
+    etag = primeira.headers["ETag"]
+
+    assert primeira.status_code == 200
+    for if_none_match in (etag, f"W/{etag}", f'"outro", {etag}'):
+        repetida = cliente.post(rota, json=corpo, headers={"If-None-Match": if_none_match})
+        assert repetida.status_code == 304
+        assert repetida.data == b""
+        assert repetida.headers["ETag"] == etag
+    assert cliente.post(rota, json=corpo, headers={"If-None-Match": '"outro"'}).get_json() == primeira.get_json()
+
+
+def test_etag_independe_da_ordem_das_chaves(cliente, respostas):
+    invertido = dict(reversed(list(ALUNO.items())))
+
+    assert cliente.post("/tutor", json=ALUNO).headers["ETag"] == cliente.post("/tutor", json=invertido).headers["ETag"]
+    assert cliente.post("/tutor", json={**ALUNO, "nu_erros_video": 13}).headers["ETag"] != cliente.post("/tutor", json=ALUNO).headers["ETag"]
+
+
+def test_etag_muda_com_a_versao_das_regras(api, monkeypatch):
+    etag = api.etag_requisicao("/tutor", ALUNO)
+    monkeypatch.setattr(api, "VERSAO_REGRAS", "outra")
+
+    assert api.etag_requisicao("/tutor", ALUNO) != etag
+
+
+def test_asterisco_nao_conta_como_resposta_conhecida(cliente, respostas):
+    assert cliente.post("/tutor", json={"foo": 1}, headers={"If-None-Match": "*"}).status_code == 400
+    resposta = cliente.post("/tutor", json=ALUNO, headers={"If-None-Match": "*"})
+    assert resposta.status_code == 200
+    assert resposta.get_json()["partes"]
+
+
+def test_corpo_invalido_nunca_recebe_304(api, cliente, respostas):
+    corpo = {"foo": 1}
+    etag = api.etag_requisicao("/tutor", corpo)
+
+    resposta = cliente.post("/tutor", json=corpo, headers={"If-None-Match": etag})
+
+    assert resposta.status_code == 400
+    assert "ETag" not in resposta.headers
+    assert respostas.estatisticas()["tamanho"] == 0
+
+
+def test_304_sem_resposta_guardada_valida_antes(api, cliente, monkeypatch):
+    # sem armazenamento (ou com a resposta descartada) o corpo e validado e recalculado antes do 304
+    monkeypatch.setattr(api, "RESPOSTAS_ETAG", api.CacheRespostas(0, 0))
+    etag = api.etag_requisicao("/gestor", GESTOR)
+
+    assert cliente.post("/gestor", json=GESTOR, headers={"If-None-Match": etag}).status_code == 304
+    assert cliente.post("/gestor", json={"dados": None}, headers={"If-None-Match": api.etag_requisicao("/gestor", {"dados": None})}).status_code != 304
+
+
+def test_corpo_com_id_aluno_nao_tem_etag(api, cliente, respostas):
+    cliente.post("/avaliador", json={"id_aluno": "etag", "questoes": [{"tipo": "texto", "resposta_correta": "a", "resposta_aluno": "a"}]})
+
+    resposta = cliente.post("/tutor", json={"id_aluno": "etag"})
+
+    assert resposta.status_code == 200
+    assert "ETag" not in resposta.headers
+
+
+def test_respostas_limitadas_pelo_total_de_bytes(api):
+    respostas = api.CacheRespostas(100, 1000)
+    for i in range(10):
+        respostas.guardar(f'"{i}"', bytes(300))
+
+    # cabem 3 respostas de 300 bytes; ficam as mais recentes
+    assert respostas.estatisticas()["bytes"] == 900
+    assert [respostas.obter(f'"{i}"') is not None for i in range(10)] == [False] * 7 + [True] * 3
+
+    respostas.guardar('"9"', bytes(100))
+    assert respostas.estatisticas()["bytes"] == 700
+    respostas.guardar('"grande"', bytes(2000))
+    assert respostas.estatisticas()["bytes"] == 0
+
+
+def test_respostas_limitadas_pelo_numero_de_itens(api):
+    respostas = api.CacheRespostas(2, 2 ** 20)
+    for i in range(3):
+        respostas.guardar(f'"{i}"', b"x")
+
+    assert respostas.obter('"0"') is None
+    assert respostas.estatisticas()["tamanho"] == 2
+
+
+def test_asgi_responde_304(api, respostas):
+    corpo = api.app.json.codificar(ALUNO)
+    executar = api.asgi_app.executar
+    status, _, cabecalhos = executar("/tutor", api.processar_tutor, "application/json", corpo)
+    etag = dict(cabecalhos)[b"etag"].decode()
+
+    assert status == 200
+    assert executar("/tutor", api.processar_tutor, "application/json", corpo, if_none_match=etag)[0] == 304
+    assert executar("/tutor", api.processar_tutor, "application/json", b'{"foo": 1}', if_none_match="*")[0] == 400
@@ -0,0 +1,119 @@
+"""
+testes do historico colunar de avaliacoes (HistoricoAvaliacoes e /historico).
+"""
+import os
+
+import numpy as np
+import pytest
+
+IDS_ESTRANHOS = ["123", "a\nb", "x\u2028y", "c\r", "\x85", "acao \u00e7", '"entre aspas"', ""]
+
+
+@pytest.fixture
+def historico(api, tmp_path, monkeypatch):
+    historico = api.HistoricoAvaliacoes(str(tmp_path / "historico"))
+    monkeypatch.setattr(api, "HISTORICO", historico)
+    return historico
+
+
+def test_ids_com_quebras_de_linha_voltam_iguais(api, historico, tmp_path):
+    for i, id_aluno in enumerate(IDS_ESTRANHOS):
+        historico.acrescentar(id_aluno, None, [i, 1, 0, 0, 0, 0], 50.0, False)
+
+    # outra instancia le os mesmos arquivos, como outro worker ou depois de reiniciar
+    relido = api.HistoricoAvaliacoes(str(tmp_path / "historico"))
+
+    assert relido.alunos == IDS_ESTRANHOS
+    for i, id_aluno in enumerate(IDS_ESTRANHOS):
+        assert relido.consultar_aluno(id_aluno, ["acertos"])["acertos"].tolist() == [[i, 0, 0]]
+
+
+def test_id_repetido_nao_cresce_o_arquivo_de_ids(api, historico, tmp_path):
+    for _ in range(3):
+        historico.acrescentar("x\u2028y", None, [1, 0, 0, 0, 0, 0], 100.0, True)
+
+    with open(tmp_path / "historico" / "alunos.txt", "rb") as ids:
+        assert ids.read().count(b"\n") == 1
+    assert len(historico.consultar_aluno("x\u2028y", ["nota"])["nota"]) == 3
+
+
+def test_ids_gravados_sem_json_ainda_sao_lidos(api, tmp_path):
+    diretorio = tmp_path / "historico"
+    diretorio.mkdir()
+    (diretorio / "alunos.txt").write_bytes("antigo\nacao \u00e7\n".encode())
+
+    historico = api.HistoricoAvaliacoes(str(diretorio))
+    historico.acrescentar("novo", None, [0] * 6, 0.0, False)
+
+    assert historico.alunos == ["antigo", "acao \u00e7", "novo"]
+    assert api.HistoricoAvaliacoes(str(diretorio)).codigos_alunos == {"antigo": 0, "acao \u00e7": 1, "novo": 2}
+
+
+def test_varias_instancias_veem_as_linhas_umas_das_outras(api, tmp_path):
+    caminho = str(tmp_path / "historico")
+    primeira, segunda = api.HistoricoAvaliacoes(caminho), api.HistoricoAvaliacoes(caminho)
+
+    primeira.acrescentar("a", "p1", [1, 0, 0, 0, 0, 0], 100.0, True)
+    segunda.acrescentar("b", "p1", [0, 1, 0, 0, 0, 0], 0.0, False)
+    primeira.acrescentar("b", "p2", [2, 0, 0, 0, 0, 0], 100.0, True)
+
+    for historico in (primeira, segunda):
+        assert historico.contagens_aluno("b") == [2, 1, 0, 0, 0, 0]
+        assert historico.provas[historico.consultar_aluno("b", ["prova"])["prova"][-1]] == "p2"
+        assert historico.consultar_aluno("a", ["nota"])["nota"].tolist() == [100.0]
+
+
+def test_linha_e_id_pela_metade_sao_descartados_ao_abrir(api, tmp_path):
+    caminho = str(tmp_path / "historico")
+    historico = api.HistoricoAvaliacoes(caminho)
+    historico.acrescentar("a", None, [1, 0, 0, 0, 0, 0], 100.0, True)
+
+    # processo que parou no meio de um acrescimo
+    with open(os.path.join(caminho, "nota.bin"), "ab") as coluna:
+        coluna.write(np.float64(7.0).tobytes())
+    with open(os.path.join(caminho, "alunos.txt"), "ab") as ids:
+        ids.write(b'"meio')
+
+    reaberto = api.HistoricoAvaliacoes(caminho)
+    reaberto.acrescentar("b", None, [0, 1, 0, 0, 0, 0], 0.0, False)
+
+    assert reaberto.alunos == ["a", "b"]
+    assert reaberto.linhas == 2
+    assert reaberto.coluna("nota").tolist() == [100.0, 0.0]
+
+
+def test_consulta_por_periodo(api, historico, monkeypatch):
+    for instante in (10.0, 20.0, 30.0):
+        monkeypatch.setattr(api.time, "time", lambda instante=instante: instante)
+        historico.acrescentar("a", None, [int(instante), 0, 0, 0, 0, 0], 100.0, True)
+
+    assert historico.consultar_aluno("a", ["timestamp"], desde=15)["timestamp"].tolist() == [20.0, 30.0]
+    assert historico.consultar_aluno("a", ["timestamp"], ate=20)["timestamp"].tolist() == [10.0, 20.0]
+    assert historico.contagens_aluno("a", 15, 25) == [20, 0, 0, 0, 0, 0]
+    assert historico.consultar_aluno("ninguem", ["nota"])["nota"].tolist() == []
+
+
+def test_rota_historico(api, cliente, historico):
+    questoes = [
+        {"tipo": "texto", "resposta_correta": "A", "resposta_aluno": "A"},
+        {"tipo": "video", "resposta_correta": "B", "resposta_aluno": "X"},
+    ]
+    id_aluno = "historico\u2028rota"
+    for _ in range(2):
+        assert cliente.post("/avaliador", json={"id_aluno": id_aluno, "questoes": questoes}).status_code == 200
+
+    resposta = cliente.get("/historico", query_string={"id_aluno": id_aluno})
+
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert len(corpo["avaliacoes"]) == 2
+    assert corpo["avaliacoes"][0]["acertos"] == {"texto": 1, "imagem": 0, "video": 0}
+    assert corpo["avaliacoes"][0]["id_prova"] is None
+    assert corpo["gestor"] == api.relatorio_de_contagens([2, 0, 0, 0, 0, 2])
+    assert cliente.get("/historico").status_code == 400
+
+
+def test_rota_historico_desativada(api, cliente, monkeypatch):
+    monkeypatch.setattr(api, "HISTORICO", None)
+
+    assert cliente.get("/historico", query_string={"id_aluno": "a"}).status_code == 503
@@ -0,0 +1,100 @@
+"""
+testes dos logs estruturados: formato json, configuracao por rota, amostragem e fila sem bloqueio.
+"""
+import json
+import logging
+import queue
+
+import pytest
+
+ALUNO = {
+    "nu_acertos_texto": 25, "nu_erros_texto": 5, "nu_acertos_imagem": 10,
+    "nu_erros_imagem": 10, "nu_acertos_video": 8, "nu_erros_video": 12
+}
+
+
+@pytest.fixture
+def registros(api, monkeypatch):
+    # desvia os registros da thread de escrita para uma fila lida pelo teste, com nivel INFO
+    fila = queue.Queue()
+    monkeypatch.setattr(api.LOGS.manipulador, "queue", fila)
+    nivel = api.LOGS.raiz.level
+    api.LOGS.raiz.setLevel(logging.INFO)
+    formatador = api.FormatadorJson()
+
+    def ler():
+        linhas = []
+        while not fila.empty():
+            linhas.append(json.loads(formatador.format(fila.get_nowait())))
+        return linhas
+
+    yield ler
+    api.LOGS.raiz.setLevel(nivel)
+
+
+def test_formatador_uma_linha_json(api):
+    registro = logging.LogRecord("agents.tutor", logging.INFO, __file__, 1, "requisicao %s", ("ok",), None)
+    registro.campos = {"rota": "/tutor", "duracao_ms": 1.5}
+
+    linha = api.FormatadorJson().format(registro)
+
+    assert "\n" not in linha
+    dados = json.loads(linha)
+    assert set(dados) == {"ts", "nivel", "logger", "msg", "rota", "duracao_ms"}
+    assert (dados["nivel"], dados["logger"], dados["msg"]) == ("INFO", "agents.tutor", "requisicao ok")
+
+
+def test_config_por_rota(api):
+    assert api.ler_config_por_rota("0.01, /gestor=0.1,/tutor/lote=1", float) == (0.01, {"/gestor": 0.1, "/tutor/lote": 1.0})
+    assert api.ler_config_por_rota("/avaliador=debug", str.upper) == (None, {"/avaliador": "DEBUG"})
+    assert api.ler_config_por_rota("", float) == (None, {})
+
+
+def test_logger_por_rota(api):
+    assert api.LOGS.logger("/avaliador/lote").name == "agents.avaliador.lote"
+    assert api.LOGS.logger("/").name == "agents.raiz"
+    assert api.LOGS.logger("/tutor") is api.LOGS.logger("/tutor")
+
+
+def test_erro_com_traceback(api, registros):
+    try:
+        raise KeyError("campo")
+    except KeyError as e:
+        api.LOGS.erro("/tutor", e)
+
+    [linha] = registros()
+    assert linha["nivel"] == "ERROR"
+    assert linha["logger"] == "agents.tutor"
+    assert linha["rota"] == "/tutor"
+    assert "KeyError" in linha["excecao"]
+
+
+def test_amostragem_por_rota(api, cliente, registros, monkeypatch):
+    monkeypatch.setattr(api.LOGS, "acesso_ativo", True)
+    monkeypatch.setattr(api.LOGS, "amostragem_padrao", 0.0)
+    monkeypatch.setattr(api.LOGS, "amostragem", {"/tutor": 1.0})
+
+    cliente.post("/tutor", json=ALUNO)
+    cliente.post("/gestor", json={"dados": {tipo: {"acertos": 1, "erros": 1} for tipo in ["texto", "imagem", "video"]}})
+
+    [linha] = registros()
+    assert linha["msg"] == "requisicao"
+    assert (linha["rota"], linha["metodo"], linha["status"]) == ("/tutor", "POST", 200)
+    assert linha["duracao_ms"] >= 0
+
+
+def test_sorteio(api):
+    assert not api.Logs.sortear(0)
+    assert api.Logs.sortear(1)
+    assert sum(api.Logs.sortear(0.5) for _ in range(2000)) in range(800, 1200)
+
+
+def test_fila_cheia_descarta_sem_bloquear(api):
+    manipulador = api.ManipuladorFila(queue.Queue(1))
+    registro = logging.LogRecord("agents", logging.INFO, __file__, 1, "x", None, None)
+
+    manipulador.emit(registro)
+    manipulador.emit(registro)
+
+    assert manipulador.queue.qsize() == 1
+    assert manipulador.descartados == 1
@@ -0,0 +1,62 @@
+"""
+testes das rotas em lote do tutor e do gestor: cada resultado do lote e igual ao da rota de um aluno
+(comparando o json de cada resultado como texto, para que 0 e 0.0 nao sejam considerados iguais).
+"""
+import json
+
+import numpy as np
+
+
+def contagens_aleatorias(api, n, semente=0):
+    # inclui alunos sem nenhuma resposta em algum tipo (taxa 0)
+    rng = np.random.default_rng(semente)
+    contagens = rng.integers(0, 30, (n, len(api.CAMPOS_TUTOR)))
+    contagens[rng.random((n, len(api.CAMPOS_TUTOR))) < 0.2] = 0
+    return contagens
+
+
+def registros_gestor(n, semente=0):
+    rng = np.random.default_rng(semente)
+    return [
+        {"dados": {tipo: {"acertos": int(rng.integers(0, 30)), "erros": int(rng.integers(0, 30))}
+                   for tipo in ["imagem", "video", "texto"]}}
+        for _ in range(n)
+    ]
+
+
+def brutos(resultados):
+    return [json.dumps(resultado, sort_keys=True) for resultado in resultados]
+
+
+def test_tutor_lote_igual_ao_tutor(api, cliente):
+    alunos = [dict(zip(api.CAMPOS_TUTOR, linha)) for linha in contagens_aleatorias(api, 60).tolist()]
+    colunar = {campo: [aluno[campo] for aluno in alunos] for campo in api.CAMPOS_TUTOR}
+
+    lote = cliente.post("/tutor/lote", json={"alunos": alunos}).get_json()["resultados"]
+
+    assert brutos(lote) == brutos(cliente.post("/tutor", json=aluno).get_json() for aluno in alunos)
+    assert cliente.post("/tutor/lote", json=colunar).get_json()["resultados"] == lote
+
+
+def test_tutor_lote_repete_perfis_iguais(api, cliente):
+    aluno = dict(zip(api.CAMPOS_TUTOR, [3, 1, 0, 0, 2, 2]))
+
+    lote = cliente.post("/tutor/lote", json={"alunos": [aluno] * 5}).get_json()["resultados"]
+
+    assert brutos(lote) == brutos([cliente.post("/tutor", json=aluno).get_json()] * 5)
+
+
+def test_gestor_lote_igual_ao_gestor(cliente):
+    registros = registros_gestor(80)
+
+    lote = cliente.post("/gestor/lote", json={"alunos": registros}).get_json()["resultados"]
+
+    assert brutos(lote) == brutos(cliente.post("/gestor", json=registro).get_json() for registro in registros)
+    # registros sem o envelope "dados" tambem sao aceitos
+    assert cliente.post("/gestor/lote", json={"alunos": [r["dados"] for r in registros]}).get_json()["resultados"] == lote
+
+
+def test_lote_vazio_ou_invalido(cliente):
+    for rota in ["/tutor/lote", "/gestor/lote"]:
+        assert cliente.post(rota, json={}).status_code == 400
+        assert cliente.post(rota, json={"alunos": []}).get_json() == {"resultados": []}
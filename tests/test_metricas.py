@@ -0,0 +1,95 @@
+"""
+testes das metricas no formato do prometheus (Histograma, Metricas, etapa e /metrics).
+"""
+import pytest
+
+ALUNO = {
+    "nu_acertos_texto": 25, "nu_erros_texto": 5, "nu_acertos_imagem": 10,
+    "nu_erros_imagem": 10, "nu_acertos_video": 8, "nu_erros_video": 12
+}
+
+
+@pytest.fixture
+def metricas(api, monkeypatch):
+    metricas = api.Metricas()
+    monkeypatch.setattr(api, "METRICAS", metricas)
+    return metricas
+
+
+def valor(texto, linha):
+    # valor da amostra cujo nome e rotulos sao exatamente "linha"
+    for atual in texto.splitlines():
+        nome, _, numero = atual.rpartition(" ")
+        if nome == linha:
+            return float(numero)
+    raise AssertionError(f"metrica ausente: {linha}")
+
+
+def test_histograma_acumula_os_buckets(api):
+    histograma = api.Histograma()
+    for segundos in [0.00005, 0.003, 0.003, 20.0]:
+        histograma.observar(segundos)
+
+    texto = "\n".join(histograma.exportar("x", 'rota="/r"'))
+
+    assert valor(texto, 'x_bucket{rota="/r",le="0.0001"}') == 1
+    assert valor(texto, 'x_bucket{rota="/r",le="0.0025"}') == 1
+    assert valor(texto, 'x_bucket{rota="/r",le="0.005"}') == 3
+    assert valor(texto, 'x_bucket{rota="/r",le="10.0"}') == 3
+    assert valor(texto, 'x_bucket{rota="/r",le="+Inf"}') == 4
+    assert valor(texto, 'x_count{rota="/r"}') == 4
+    assert valor(texto, 'x_sum{rota="/r"}') == pytest.approx(20.00605)
+
+
+def test_requisicoes_contadas_por_rota_metodo_e_status(cliente, metricas):
+    cliente.post("/tutor", json=ALUNO)
+    cliente.post("/tutor", json=ALUNO)
+    cliente.post("/tutor", json={})
+
+    texto = cliente.get("/metrics").get_data(as_text=True)
+
+    assert valor(texto, 'agents_requisicoes_total{rota="/tutor",metodo="POST",status="200"}') == 2
+    assert valor(texto, 'agents_requisicoes_total{rota="/tutor",metodo="POST",status="400"}') == 1
+    assert valor(texto, 'agents_requisicao_segundos_count{rota="/tutor"}') == 3
+    assert valor(texto, 'agents_requisicao_segundos_bucket{rota="/tutor",le="+Inf"}') == 3
+
+
+def test_etapas_e_caches_exportados(api, cliente):
+    cliente.post("/tutor", json=ALUNO)
+
+    resposta = cliente.get("/metrics")
+    texto = resposta.get_data(as_text=True)
+
+    assert resposta.status_code == 200
+    assert resposta.mimetype == "text/plain"
+    # as etapas sao medidas pelas metricas do modulo, criadas na importacao
+    assert valor(texto, 'agents_etapa_segundos_count{etapa="json.serializacao"}') >= 1
+    for cache in ["tutor", "gestor", "respostas"]:
+        assert f'agents_cache_hits_total{{cache="{cache}"}}' in texto
+        assert f'agents_cache_misses_total{{cache="{cache}"}}' in texto
+
+
+def test_etapa_mede_cada_chamada_mesmo_com_erro(api, metricas):
+    @api.etapa("teste.falha")
+    def falhar(x):
+        if x:
+            raise ValueError(x)
+        return x
+
+    assert falhar(0) == 0
+    with pytest.raises(ValueError):
+        falhar(1)
+
+    assert valor(metricas.exportar({}), 'agents_etapa_segundos_count{etapa="teste.falha"}') == 2
+
+
+def test_metricas_desligadas(api, cliente, monkeypatch):
+    monkeypatch.setattr(api, "METRICAS", None)
+
+    def funcao():
+        pass
+
+    # sem metricas o decorador devolve a propria funcao
+    assert api.etapa("qualquer")(funcao) is funcao
+    assert cliente.post("/tutor", json=ALUNO).status_code == 200
+    assert cliente.get("/metrics").status_code == 503
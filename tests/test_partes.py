@@ -0,0 +1,122 @@
+"""
+testes do planejamento de partes do tutor (repartir_lote, intercalar_lote e planejar_lote),
+das opcoes total_partes e formato_partes e dos seus limites.
+"""
+import numpy as np
+import pytest
+
+
+def contagens_aleatorias(api, n, semente=0):
+    # inclui alunos sem nenhuma resposta em algum tipo (taxa 0 e preferencia 0)
+    rng = np.random.default_rng(semente)
+    contagens = rng.integers(0, 30, (n, len(api.CAMPOS_TUTOR)))
+    contagens[rng.random((n, len(api.CAMPOS_TUTOR))) < 0.2] = 0
+    return contagens
+
+
+@pytest.mark.parametrize("total_partes", [1, 2, 3, 7, 100, 1001])
+def test_repartir_lote_soma_total_partes(api, total_partes):
+    rng = np.random.default_rng(total_partes)
+    preferencias = rng.random((500, 3))
+    preferencias[rng.random((500, 3)) < 0.3] = 0
+    preferencias[:5] = 0  # linhas sem nenhuma preferencia
+
+    repartidas = api.TUTOR.repartir_lote(preferencias, total_partes)
+
+    assert repartidas.dtype.kind == "i"
+    assert (repartidas >= 0).all()
+    assert (repartidas.sum(axis=1) == total_partes).all()
+
+    # maiores restos: cada metodo fica a menos de uma parte da sua cota
+    pesos = np.where(preferencias.sum(axis=1, keepdims=True) > 0, preferencias, 1.0)
+    cotas = pesos / pesos.sum(axis=1, keepdims=True) * total_partes
+    assert (np.abs(repartidas - cotas) < 1).all()
+
+    # sem preferencias, as partes sao divididas igualmente
+    assert (repartidas[:5].max(axis=1) - repartidas[:5].min(axis=1) <= 1).all()
+
+
+def test_repartir_lote_empate_vai_para_maior_preferencia(api):
+    repartidas = api.TUTOR.repartir_lote(np.array([[0.2, 0.5, 0.3]]), 1)
+    assert repartidas.tolist() == [[0, 1, 0]]
+
+
+@pytest.mark.parametrize("total_partes", [1, 3, 10, 257])
+def test_intercalar_lote_preserva_contagens(api, total_partes):
+    rng = np.random.default_rng(total_partes)
+    repartidas = api.TUTOR.repartir_lote(rng.random((200, 3)), total_partes)
+
+    sequencias = api.TUTOR.intercalar_lote(repartidas)
+
+    assert sequencias.shape == (200, total_partes)
+    for sequencia, linha in zip(sequencias, repartidas):
+        assert np.bincount(sequencia, minlength=3).tolist() == linha.tolist()
+
+
+def test_intercalar_lote_espalha_metodos(api):
+    sequencia = api.TUTOR.intercalar_lote(np.array([[2, 2, 0]]))[0]
+    assert api.TUTOR.blocos(sequencia) == [["texto", 1], ["imagem", 1], ["texto", 1], ["imagem", 1]]
+
+
+@pytest.mark.parametrize("total_partes", [3, 8, 100])
+def test_planejar_lote_formatos_concordam(api, total_partes):
+    contagens = contagens_aleatorias(api, 300).astype(float)
+
+    por_formato = {
+        formato: [resultado["partes"] for resultado in api.TUTOR.planejar_lote(contagens, total_partes, formato)]
+        for formato in api.FORMATOS_PARTES
+    }
+
+    for i, plano in enumerate(por_formato["contagens"]):
+        assert sum(plano.values()) == total_partes
+        for formato in ("rle", "intercalado"):
+            somas = dict.fromkeys(api.TIPOS_CONTEUDO, 0)
+            for metodo, quantidade in por_formato[formato][i]:
+                somas[metodo] += quantidade
+            assert somas == plano
+        partes = por_formato["partes"][i]
+        assert list(partes) == [f"parte{k}" for k in range(1, total_partes + 1)]
+        assert {tipo: list(partes.values()).count(tipo) for tipo in api.TIPOS_CONTEUDO} == plano
+
+
+@pytest.mark.parametrize("formato", ["partes", "contagens", "rle", "intercalado"])
+def test_tutor_lote_igual_ao_tutor_com_total_partes(api, cliente, formato):
+    alunos = [dict(zip(api.CAMPOS_TUTOR, linha)) for linha in contagens_aleatorias(api, 30, 1).tolist()]
+    opcoes = {"total_partes": 12, "formato_partes": formato}
+
+    lote = cliente.post("/tutor/lote", json={"alunos": alunos, **opcoes}).get_json()["resultados"]
+
+    assert lote == [cliente.post("/tutor", json={**aluno, **opcoes}).get_json() for aluno in alunos]
+
+
+@pytest.mark.parametrize("opcoes", [
+    {"total_partes": 0},
+    {"total_partes": "3a"},
+    {"total_partes": 10 ** 6, "formato_partes": "contagens"},
+    {"total_partes": 101},
+    {"formato_partes": "xml"},
+])
+def test_opcoes_partes_invalidas(api, cliente, opcoes):
+    aluno = dict(zip(api.CAMPOS_TUTOR, [1] * len(api.CAMPOS_TUTOR)))
+
+    assert cliente.post("/tutor", json={**aluno, **opcoes}).status_code == 400
+    assert cliente.post("/tutor/lote", json={"alunos": [aluno], **opcoes}).status_code == 400
+
+
+def test_limite_de_partes_no_lote(api, cliente, monkeypatch):
+    monkeypatch.setattr(api, "MAXIMO_PARTES_LOTE", 1000)
+    corpo = contagens_aleatorias(api, 20).astype("<i4").tobytes()
+
+    def enviar(total_partes, formato):
+        return cliente.post(
+            "/tutor/lote", query_string={"total_partes": total_partes, "formato_partes": formato},
+            data=corpo, content_type=api.TIPO_CONTAGENS
+        ).status_code
+
+    # 20 alunos x 50 partes cabem no limite, 20 x 51 nao
+    assert enviar(50, "intercalado") == 200
+    assert enviar(51, "intercalado") == 400
+    assert enviar(51, "partes") == 400
+    # contagens e rle tem tamanho fixo por aluno
+    assert enviar(100000, "contagens") == 200
+    assert enviar(100000, "rle") == 200
@@ -0,0 +1,69 @@
+"""
+testes da execucao em lote no pool de processos: os resultados sao iguais aos da execucao serial,
+na mesma ordem, e lotes pequenos nao passam pelo pool.
+"""
+import functools
+import json
+
+import numpy as np
+import pytest
+
+
+def contagens_aleatorias(n, semente=0):
+    rng = np.random.default_rng(semente)
+    contagens = rng.integers(0, 30, (n, 6))
+    contagens[rng.random((n, 6)) < 0.2] = 0
+    return contagens.astype(float)
+
+
+def test_tutor_pool_igual_ao_serial(api, pool):
+    contagens = contagens_aleatorias(500, 2)
+
+    serial = api.TUTOR.recomendar_lote(contagens)
+    em_processos = api.executar_em_lote(api._recomendar_lote, contagens, tamanho_chunk=64, minimo_processos=0)
+
+    assert em_processos == serial
+
+
+def test_gestor_pool_igual_ao_serial(api, pool):
+    contagens = contagens_aleatorias(300, 1)
+
+    serial = api.GESTOR.analisar_lote(contagens)
+    em_processos = api.executar_em_lote(api._analisar_lote, contagens, tamanho_chunk=50, minimo_processos=0)
+
+    assert json.loads(api.app.json.codificar(em_processos)) == json.loads(api.app.json.codificar(serial))
+
+
+def test_planejar_pool_igual_ao_serial(api, pool):
+    contagens = contagens_aleatorias(200, 3)
+    funcao = functools.partial(api._planejar_lote, total_partes=20, formato="intercalado")
+
+    em_processos = api.executar_em_lote(funcao, contagens, tamanho_chunk=30, minimo_processos=0)
+
+    assert em_processos == api.TUTOR.planejar_lote(contagens, 20, "intercalado")
+
+
+def test_lote_pequeno_roda_no_proprio_processo(api, pool):
+    contagens = contagens_aleatorias(10)
+
+    pedacos = list(api.executar_em_pedacos(api._recomendar_lote, contagens, minimo_processos=100))
+
+    assert len(pedacos) == 1
+    assert api._pool_processos is None
+
+
+@pytest.mark.parametrize("cpus, workers, esperado", [(8, 1, 8), (8, 4, 2), (8, 16, 1), (None, 2, 1)])
+def test_processos_divididos_entre_os_workers(api, monkeypatch, cpus, workers, esperado):
+    monkeypatch.setattr(api.os, "cpu_count", lambda: cpus)
+
+    assert api.processos_lote_padrao(workers) == esperado
+
+
+def test_workers_pelo_ambiente(api, monkeypatch):
+    monkeypatch.setattr(api.os, "cpu_count", lambda: 12)
+    monkeypatch.delenv("AGENTS_WORKERS", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+
+    assert api.processos_lote_padrao() == 4
+    monkeypatch.setenv("AGENTS_WORKERS", "6")
+    assert api.processos_lote_padrao() == 2
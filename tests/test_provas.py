@@ -0,0 +1,97 @@
+"""
+testes do registro de provas (RegistroProvas, /avaliador/provas) e da correcao pelo id da prova.
+"""
+import os
+
+import pytest
+
+PROVA = {"id_prova": "p1", "tipos": ["texto", "imagem", "video"], "gabarito": ["A", "B", "C"]}
+QUESTOES = [
+    {"tipo": "texto", "resposta_correta": "A", "resposta_aluno": "a"},
+    {"tipo": "imagem", "resposta_correta": "B", "resposta_aluno": "X"},
+    {"tipo": "video", "resposta_correta": "C", "resposta_aluno": "C"},
+]
+
+
+@pytest.fixture
+def provas(api, monkeypatch):
+    provas = api.RegistroProvas(":memory:")
+    monkeypatch.setattr(api, "PROVAS", provas)
+    return provas
+
+
+@pytest.fixture
+def leituras(api, provas, monkeypatch):
+    # conta as leituras do registro feitas por requisicao
+    contador = []
+    obter = provas.obter
+    monkeypatch.setattr(provas, "obter", lambda id_prova: contador.append(id_prova) or obter(id_prova))
+    return contador
+
+
+def test_registrar_e_corrigir_pelo_id(cliente, provas):
+    registro = cliente.post("/avaliador/provas", json=PROVA)
+
+    assert registro.status_code == 201
+    assert registro.get_json() == {"id_prova": "p1", "total_questoes": 3}
+    pelo_id = cliente.post("/avaliador", json={"id_prova": "p1", "respostas": ["a", "X", "C"]})
+    assert pelo_id.status_code == 200
+    assert pelo_id.get_json() == cliente.post("/avaliador", json={"questoes": QUESTOES}).get_json()
+
+
+def test_prova_nao_registrada(cliente, provas):
+    assert cliente.post("/avaliador", json={"id_prova": "nenhuma", "respostas": ["a"]}).status_code == 404
+    assert cliente.post("/avaliador/lote", json={"id_prova": "nenhuma", "alunos": [["a"]]}).status_code == 404
+    assert cliente.post("/pipeline", json={"id_prova": "nenhuma", "respostas": ["a"]}).status_code == 404
+    assert cliente.post("/avaliador/provas", json={"id_prova": "x", "tipos": ["outro"], "gabarito": ["A"]}).status_code == 400
+
+
+@pytest.mark.parametrize("rota, corpo", [
+    ("/avaliador", {"id_prova": "p1", "respostas": ["a", "X", "C"]}),
+    ("/avaliador/lote", {"id_prova": "p1", "alunos": [["a", "X", "C"], ["b", "B", "c"]]}),
+    ("/pipeline", {"id_prova": "p1", "respostas": ["a", "X", "C"]}),
+])
+def test_uma_leitura_do_registro_por_requisicao(api, cliente, provas, leituras, rota, corpo):
+    api.PROVAS.registrar("p1", api.AVALIADOR.preparar_prova_colunar(PROVA["tipos"], PROVA["gabarito"]))
+
+    assert cliente.post(rota, json=corpo).status_code == 200
+    assert leituras == ["p1"]
+
+
+def test_registrar_de_novo_invalida_outros_processos(api, tmp_path):
+    caminho = str(tmp_path / "estado.db")
+    # duas instancias no mesmo arquivo fazem o papel de dois workers
+    primeira, segunda = api.RegistroProvas(caminho), api.RegistroProvas(caminho)
+
+    primeira.registrar("p", api.AVALIADOR.preparar_prova_colunar(["texto"], ["A"]))
+    assert segunda.obter("p").gabarito.tolist() == ["a"]
+
+    primeira.registrar("p", api.AVALIADOR.preparar_prova_colunar(["video", "texto"], ["B", "C"]))
+    prova = segunda.obter("p")
+    assert prova.gabarito.tolist() == ["b", "c"]
+    assert prova.totais.tolist() == [1, 0, 1]
+    assert segunda.obter("outra") is None
+
+
+def test_conexao_aberta_no_primeiro_uso_de_cada_processo(api, tmp_path):
+    provas = api.RegistroProvas(str(tmp_path / "estado.db"))
+    assert provas._conexao is None
+
+    provas.registrar("p", api.AVALIADOR.preparar_prova_colunar(["texto"], ["A"]))
+    conexao_pai = provas._conexao
+
+    leitura, escrita = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            ok = provas.obter("p").gabarito.tolist() == ["a"] and provas._conexao is not conexao_pai
+            provas.registrar("q", api.AVALIADOR.preparar_prova_colunar(["imagem"], ["B"]))
+            os.write(escrita, b"1" if ok else b"0")
+        finally:
+            os._exit(0)
+    os.close(escrita)
+    os.waitpid(pid, 0)
+
+    assert os.read(leitura, 1) == b"1"
+    assert provas._conexao is conexao_pai
+    assert provas.obter("q").gabarito.tolist() == ["b"]
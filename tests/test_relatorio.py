@@ -0,0 +1,74 @@
+"""
+testes do relatorio offline (ler_contagens_em_chunks e gerar_relatorio_offline).
+"""
+import io
+import json
+
+import numpy as np
+import pytest
+
+
+def escrever_csv(caminho, campos, linhas):
+    caminho.write_text("\n".join([",".join(campos)] + linhas) + "\n", encoding="utf-8")
+    return str(caminho)
+
+
+def test_csv_ignora_linhas_invalidas(api, tmp_path, capsys):
+    caminho = escrever_csv(tmp_path / "contagens.csv", ["id_aluno"] + api.CAMPOS_TUTOR, [
+        "a,1,2,3,4,5,6",
+        "b,1,,3,4,5,6",
+        "c,1,x,3,4,5,6",
+        "d,1,2,3",
+        "e,1,2,3,4,5,-1",
+        "f,1,2,3,4,5,nan",
+        "g,6,5,4,3,2,1",
+    ])
+
+    blocos = list(api.ler_contagens_em_chunks(caminho, 1000))
+
+    assert [ids for ids, _ in blocos] == [["a", "g"]]
+    assert blocos[0][1].tolist() == [[1, 2, 3, 4, 5, 6], [6, 5, 4, 3, 2, 1]]
+    erros = capsys.readouterr().err
+    assert [f"{caminho}:{numero}:" in erros for numero in range(2, 9)] == [False, True, True, True, True, True, False]
+
+
+def test_csv_sem_colunas_falha_antes_da_saida(api, tmp_path):
+    caminho = escrever_csv(tmp_path / "contagens.csv", api.CAMPOS_TUTOR[:-1], ["1,2,3,4,5"])
+    saida = io.StringIO()
+
+    with pytest.raises(ValueError, match="nu_erros_video"):
+        api.gerar_relatorio_offline(caminho, saida)
+    assert saida.getvalue() == ""
+
+
+def test_ndjson_ignora_linhas_invalidas(api, tmp_path, capsys):
+    gestor = {"texto": {"acertos": 1, "erros": 1}, "imagem": {"acertos": 2, "erros": 0}, "video": {"acertos": 0, "erros": 3}}
+    caminho = tmp_path / "contagens.ndjson"
+    caminho.write_text("\n".join([
+        json.dumps(dict(zip(api.CAMPOS_TUTOR, [1, 1, 2, 0, 0, 3]))),
+        "{quebrado",
+        "",
+        json.dumps({"dados": gestor, "id_aluno": "x"}),
+        json.dumps({"dados": {"texto": {"acertos": 1}}}),
+        "[1, 2]",
+    ]) + "\n", encoding="utf-8")
+
+    saida = io.StringIO()
+    total = api.gerar_relatorio_offline(str(caminho), saida, ["gestor"], tamanho_chunk=1)
+
+    assert total == 2
+    linhas = [json.loads(linha) for linha in saida.getvalue().splitlines()]
+    assert linhas[1]["id_aluno"] == "x"
+    assert linhas[0] == {chave: valor for chave, valor in linhas[1].items() if chave != "id_aluno"}
+    erros = capsys.readouterr().err
+    assert [f"{caminho}:{numero}:" in erros for numero in range(1, 7)] == [False, True, False, False, True, True]
+
+
+def test_npy_em_pedacos(api, tmp_path):
+    matriz = np.arange(30).reshape(5, 6)
+    np.save(tmp_path / "contagens.npy", matriz)
+
+    blocos = list(api.ler_contagens_em_chunks(str(tmp_path / "contagens.npy"), 2))
+
+    assert [len(contagens) for _, contagens in blocos] == [2, 2, 1]
+    assert np.vstack([contagens for _, contagens in blocos]).tolist() == matriz.tolist()
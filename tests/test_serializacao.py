@@ -0,0 +1,102 @@
+"""
+testes da serializacao das respostas: ProvedorJson com orjson ou json padrao (tipos numpy, mesmo
+corpo do provedor original do flask) e resposta_lote, que envia lotes grandes em pedacos.
+"""
+import importlib.util
+import json
+
+import numpy as np
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+CODIFICADORES = ["json", pytest.param("orjson", marks=pytest.mark.skipif(
+    importlib.util.find_spec("orjson") is None, reason="orjson nao instalado"
+))]
+
+
+def prova_aleatoria(n_questoes, n_alunos, semente=0):
+    rng = np.random.default_rng(semente)
+    questoes = [
+        {"tipo": ["texto", "imagem", "video", "Video"][rng.integers(4)], "resposta_correta": "ABCD"[rng.integers(4)]}
+        for _ in range(n_questoes)
+    ]
+    alunos = [
+        [[q["resposta_correta"], q["resposta_correta"].lower(), "x"][rng.integers(3)] for q in questoes][:rng.integers(n_questoes + 1)]
+        for _ in range(n_alunos)
+    ]
+    return questoes, alunos
+
+
+def em_streaming(resposta):
+    # o cliente de testes envolve todo corpo num iterador; so respostas em streaming nao tem Content-Length
+    return "Content-Length" not in resposta.headers
+
+
+@pytest.mark.parametrize("codificador", CODIFICADORES)
+def test_tipos_numpy(api, codificador):
+    provedor = api.ProvedorJson(api.app, codificador)
+    obj = {"b": np.float64(0.5), "a": [np.int32(3), np.bool_(True)], "c": np.arange(3), "d": 1.0}
+
+    assert json.loads(provedor.codificar(obj)) == {"a": [3, True], "b": 0.5, "c": [0, 1, 2], "d": 1.0}
+    # chaves ordenadas e formato compacto, como o provedor original do flask
+    assert provedor.codificar({"b": 1, "a": 0}) == b'{"a":0,"b":1}'
+    assert b"\n" in provedor.codificar({"a": [1]}, indentar=True)
+
+
+@pytest.mark.parametrize("codificador", CODIFICADORES)
+def test_mesmo_corpo_do_provedor_do_flask(api, codificador):
+    provedor = api.ProvedorJson(api.app, codificador)
+    obj = {"nome": "avaliação", "nota": 72.5, "zero": 0, "lista": [0.1, None, False], "aninhado": {"z": 1, "y": "2"}}
+
+    assert json.loads(provedor.dumps(obj)) == json.loads(DefaultJSONProvider(api.app).dumps(obj))
+    assert provedor.loads(provedor.dumps(obj)) == obj
+
+
+def test_lote_pequeno_sem_streaming(api, cliente):
+    contagens = np.random.default_rng(0).integers(0, 30, (20, len(api.CAMPOS_TUTOR)))
+
+    resposta = cliente.post("/tutor/lote", data=contagens.astype("<i4").tobytes(), content_type=api.TIPO_CONTAGENS)
+
+    assert not em_streaming(resposta)
+    assert len(resposta.get_json()["resultados"]) == 20
+
+
+def test_resposta_lote_igual_ao_jsonify(api):
+    pedacos = [[{"i": i, "x": np.float64(i / 3)} for i in range(inicio, inicio + 7)] for inicio in range(0, 35, 7)]
+    pedacos.insert(2, [])
+
+    with api.app.test_request_context():
+        esperado = api.jsonify({"resultados": [r for pedaco in pedacos for r in pedaco]}).get_data()
+        resposta = api.resposta_lote(pedacos, tamanho_pedaco=3)
+        assert resposta.is_streamed
+        assert b"".join(resposta.response) == esperado
+
+
+@pytest.mark.parametrize("rota", ["/tutor/lote", "/gestor/lote"])
+def test_lote_em_pedacos_igual_ao_lote_inteiro(api, cliente, pool, monkeypatch, rota):
+    # varios pedacos do pool, cada um serializado em varios pedacos da resposta
+    monkeypatch.setattr(api, "CHUNK_LOTE", 700)
+    monkeypatch.setattr(api, "MINIMO_LOTE_PROCESSOS", 0)
+    contagens = np.random.default_rng(2).integers(0, 30, (2500, len(api.CAMPOS_TUTOR)))
+    referencia = api.TUTOR.recomendar_lote(contagens.astype(float)) if rota == "/tutor/lote" else api.GESTOR.analisar_lote(contagens.astype(float))
+
+    resposta = cliente.post(rota, data=contagens.astype("<i4").tobytes(), content_type=api.TIPO_CONTAGENS)
+
+    assert resposta.status_code == 200
+    assert em_streaming(resposta)
+    assert json.loads(resposta.get_data()) == {"resultados": json.loads(api.app.json.codificar(referencia))}
+
+
+def test_avaliador_lote_em_pedacos_igual_ao_lote_inteiro(api, cliente, pool, monkeypatch):
+    monkeypatch.setattr(api, "CHUNK_LOTE", 300)
+    monkeypatch.setattr(api, "MINIMO_LOTE_PROCESSOS", 0)
+    questoes, alunos = prova_aleatoria(10, 1500, 3)
+    dados = {"questoes": questoes, "alunos": alunos}
+
+    pedacos = list(api.AVALIADOR.calculate_metrics_lote(dados, em_pedacos=True))
+    resposta = cliente.post("/avaliador/lote", json=dados)
+
+    assert len(pedacos) > 1
+    assert [saida for pedaco in pedacos for saida in pedaco] == api.AVALIADOR.calculate_metrics_lote(dados)
+    assert em_streaming(resposta)
+    assert json.loads(resposta.get_data())["resultados"] == json.loads(api.app.json.codificar(api.AVALIADOR.calculate_metrics_lote(dados)))
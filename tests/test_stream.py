@@ -0,0 +1,79 @@
+"""
+testes do /avaliador/stream: correcao NDJSON linha a linha, com uma linha de resultado por aluno.
+"""
+import json
+
+import pytest
+
+QUESTOES = [
+    {"tipo": "texto", "resposta_correta": "A", "resposta_aluno": "a"},
+    {"tipo": "imagem", "resposta_correta": "B", "resposta_aluno": "X"},
+    {"tipo": "video", "resposta_correta": "C", "resposta_aluno": "C"},
+    {"tipo": "Video", "resposta_correta": "D", "resposta_aluno": ""},
+]
+
+
+@pytest.fixture
+def isolado(api, monkeypatch):
+    monkeypatch.setattr(api, "ESTADO", api.EstadoAlunos(":memory:"))
+    monkeypatch.setattr(api, "PROVAS", api.RegistroProvas(":memory:"))
+
+
+def enviar(cliente, linhas):
+    corpo = "\n".join(linha if isinstance(linha, str) else json.dumps(linha) for linha in linhas) + "\n"
+    resposta = cliente.post("/avaliador/stream", data=corpo, content_type="application/x-ndjson")
+    assert resposta.status_code == 200
+    assert resposta.mimetype == "application/x-ndjson"
+    return [json.loads(linha) for linha in resposta.get_data().splitlines()]
+
+
+def test_questao_a_questao_igual_ao_avaliador(cliente, isolado):
+    esperado = cliente.post("/avaliador", json={"questoes": QUESTOES}).get_json()
+
+    resultados = enviar(cliente, [{"id_aluno": "1"}, *QUESTOES, {"fim_aluno": True}, *QUESTOES])
+
+    assert resultados == [{"id_aluno": "1", **esperado}, esperado]
+
+
+def test_aluno_completo_em_uma_linha(cliente, isolado):
+    esperado = cliente.post("/avaliador", json={"questoes": QUESTOES}).get_json()
+
+    resultados = enviar(cliente, [{"id_aluno": "1"}, QUESTOES[0], {"id_aluno": "2", "questoes": QUESTOES}])
+
+    assert resultados[1] == {"id_aluno": "2", **esperado}
+    assert resultados[0]["id_aluno"] == "1" and resultados[0]["nota"] == 100.0
+
+
+def test_prova_registrada(api, cliente, isolado):
+    cliente.post("/avaliador/provas", json={"id_prova": "p", "questoes": QUESTOES})
+    esperado = cliente.post("/avaliador", json={"id_prova": "p", "respostas": ["a", "X"]}).get_json()
+
+    resultados = enviar(cliente, [
+        {"id_aluno": "1", "id_prova": "p"}, {"resposta_aluno": "a"}, {"resposta_aluno": "X"},
+        {"id_aluno": "2", "id_prova": "nenhuma"}, {"resposta_aluno": "a"},
+        {"id_aluno": "3", "id_prova": "p"}, *[{"resposta_aluno": "a"}] * 5,
+    ])
+
+    # questoes nao respondidas contam como erro
+    assert resultados[0] == {"id_aluno": "1", **esperado}
+    assert resultados[1] == {"id_aluno": "2", "erro": "prova nao registrada: nenhuma"}
+    assert resultados[2] == {"id_aluno": "3", "erro": "mais respostas que questoes na prova"}
+
+
+def test_linhas_invalidas_nao_interrompem(cliente, isolado):
+    resultados = enviar(cliente, [
+        "{quebrado", "[1, 2]", "",
+        {"id_aluno": "1"}, {"tipo": "audio", "resposta_correta": "A", "resposta_aluno": "A"},
+        {"id_aluno": "2"}, QUESTOES[2],
+    ])
+
+    assert resultados[0] == {"erro": "json invalido na linha 1"}
+    assert resultados[1] == {"erro": "a linha 2 deve ser um objeto json"}
+    assert resultados[2] == {"id_aluno": "1", "erro": "tipo de questao invalido na questao 1: audio"}
+    assert resultados[3]["id_aluno"] == "2" and resultados[3]["aprovado"] is True
+
+
+def test_estado_acumulado_pelo_stream(api, cliente, isolado):
+    enviar(cliente, [{"id_aluno": "s"}, *QUESTOES, {"id_aluno": "s", "questoes": QUESTOES}])
+
+    assert api.ESTADO.obter("s") == dict(zip(api.CAMPOS_TUTOR, [2, 0, 0, 2, 2, 2]))
@@ -0,0 +1,91 @@
+"""
+testes da agregacao por turma (ResumoTurma, AgregadorTurmas) e do /gestor/turma.
+"""
+import numpy as np
+import pytest
+
+
+def relatorios_aleatorios(api, n, semente=0):
+    rng = np.random.default_rng(semente)
+    contagens = rng.integers(0, 20, (n, len(api.CAMPOS_TUTOR)))
+    contagens[rng.random((n, len(api.CAMPOS_TUTOR))) < 0.15] = 0
+    return [api.relatorio_turma(linha) for linha in contagens.tolist()]
+
+
+@pytest.fixture
+def turmas(api, monkeypatch):
+    turmas = api.AgregadorTurmas()
+    monkeypatch.setattr(api, "TURMAS", turmas)
+    monkeypatch.setattr(api, "ESTADO", api.EstadoAlunos(":memory:"))
+    monkeypatch.setattr(api, "HISTORICO", None)
+    return turmas
+
+
+def test_resumo_igual_ao_calculo_direto(api):
+    relatorios = relatorios_aleatorios(api, 400)
+    resumo = api.ResumoTurma()
+    for relatorio in relatorios:
+        resumo.aplicar(relatorio, 1)
+
+    resultado = resumo.resumo()
+    medias = np.array([relatorio["media"] for relatorio in relatorios])
+
+    assert resultado["alunos"] == 400
+    assert resultado["media"] == round(medias.mean(), 2)
+    assert resultado["percentual_ajuda"] == round(sum(r["ajuda"] for r in relatorios) / 4, 2)
+    assert sum(resultado["desempenho"].values()) == 400
+    for p in api.PERCENTIS:
+        # histograma com resolucao de 0,1 ponto
+        assert abs(resultado["percentis"][f"p{p}"] - np.percentile(medias, p, method="inverted_cdf")) <= 0.1
+    for tipo in api.TIPOS_CONTEUDO:
+        com_tipo = [r["media_por_conteudo"][tipo] for r in relatorios if tipo in r["media_por_conteudo"]]
+        assert resultado["alunos_por_conteudo"][tipo] == len(com_tipo)
+        assert resultado["media_por_conteudo"][tipo] == pytest.approx(np.mean(com_tipo), abs=0.01)
+
+
+def test_retirar_e_mesclar(api):
+    relatorios = relatorios_aleatorios(api, 60, 1)
+    inteiro, primeira, segunda = api.ResumoTurma(), api.ResumoTurma(), api.ResumoTurma()
+    for i, relatorio in enumerate(relatorios):
+        inteiro.aplicar(relatorio, 1)
+        (primeira if i % 2 else segunda).aplicar(relatorio, 1)
+
+    assert primeira.mesclar(segunda).resumo() == inteiro.resumo()
+
+    for relatorio in relatorios:
+        inteiro.aplicar(relatorio, -1)
+    assert inteiro.resumo() == {"alunos": 0}
+
+
+def test_aluno_contado_uma_vez_na_turma_atual(api, cliente, turmas):
+    questoes = [{"tipo": "texto", "resposta_correta": "A", "resposta_aluno": "A"},
+                {"tipo": "video", "resposta_correta": "B", "resposta_aluno": "X"}]
+
+    cliente.post("/avaliador", json={"id_aluno": "a", "id_turma": "t1", "questoes": questoes})
+    cliente.post("/avaliador", json={"id_aluno": "a", "questoes": questoes})
+    cliente.post("/avaliador", json={"id_aluno": "b", "id_turma": "t1", "questoes": questoes})
+
+    t1 = cliente.get("/gestor/turma", query_string={"id_turma": "t1"}).get_json()
+    assert t1["alunos"] == 2
+    assert t1["alunos_por_conteudo"] == {"texto": 2, "imagem": 0, "video": 2}
+    assert t1["media_por_conteudo"]["imagem"] is None
+
+    # o aluno muda de turma: sai da anterior com a contribuicao acumulada
+    cliente.post("/avaliador", json={"id_aluno": "a", "id_turma": "t2", "questoes": questoes})
+    assert cliente.get("/gestor/turma", query_string={"id_turma": "t1"}).get_json()["alunos"] == 1
+    t2 = cliente.get("/gestor/turma", query_string={"id_turma": "t2"}).get_json()
+    assert t2["alunos"] == 1
+    assert t2["media"] == api.relatorio_de_contagens([3, 0, 0, 0, 0, 3])["media"]
+
+
+def test_consulta_de_varias_turmas_e_da_escola(api, cliente, turmas):
+    relatorios = relatorios_aleatorios(api, 30, 2)
+    for i, relatorio in enumerate(relatorios):
+        turmas.atualizar(f"t{i % 3}", relatorio)
+
+    escola = cliente.get("/gestor/turma").get_json()
+    duas = cliente.get("/gestor/turma?id_turma=t0&id_turma=t1").get_json()
+
+    assert escola["alunos"] == 30
+    assert duas["alunos"] == 20
+    assert cliente.get("/gestor/turma", query_string={"id_turma": "nenhuma"}).get_json() == {"alunos": 0}